@@ -0,0 +1 @@
+""" The TornadoRPC benchmarks """
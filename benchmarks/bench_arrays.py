@@ -0,0 +1,76 @@
+"""
+Compares sending numpy arrays with the array codecs to the list path.
+
+For each size of float64 array, and each installed encoding, it
+reports the time to encode a result holding the array and to decode
+it back into an array, and the encoded size:
+
+* list -- array.tolist() encoded by the plain codec, and
+  numpy.array() of the decoded list
+* array -- the array codec from tornadorpc.arrays (dtype, shape and
+  the raw buffer; base64 for JSON)
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_arrays
+    python -m benchmarks.bench_arrays --sizes 1000 10000000
+"""
+
+import argparse
+import timeit
+import numpy
+from tornadorpc import arrays, binary
+from tornadorpc.json import JSONCodec
+
+
+def codecs():
+    """ Yields (encoding, plain codec, array codec.) """
+    yield 'json', JSONCodec(), arrays.ArrayJSONCodec()
+    if binary.msgpack is not None:
+        yield 'msgpack', binary.MsgPackCodec(), arrays.ArrayMsgPackCodec()
+    if binary.cbor2 is not None:
+        yield 'cbor', binary.CBORCodec(), arrays.ArrayCBORCodec()
+
+
+def best(function, number):
+    """ Returns the fastest of 3 runs, in seconds per call. """
+    return min(timeit.repeat(function, number=number, repeat=3)) / number
+
+
+def run(sizes):
+    results = []
+    for size in sizes:
+        values = numpy.random.random(size)
+        # Fewer runs of the large arrays
+        number = max(1, 100000 // size)
+        for encoding, plain, codec in codecs():
+            cases = (
+                ('list', lambda: plain.encode_result(
+                    values.tolist(), 1, 2.0),
+                 lambda data: numpy.array(plain.loads(data)[u'result'])),
+                ('array', lambda: codec.encode_result(values, 1, 2.0),
+                 lambda data: codec.loads(data)[u'result']),
+            )
+            for name, encode, decode in cases:
+                data = encode()
+                assert numpy.array_equal(values, decode(data))
+                results.append((
+                    size, encoding, name, best(encode, number) * 1e3,
+                    best(lambda: decode(data), number) * 1e3, len(data)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument(
+        '--sizes', type=int, nargs='*', default=[1000, 100000, 1000000])
+    args = parser.parse_args()
+    print '%-9s %-8s %-6s %12s %12s %12s' % (
+        'elements', 'encoding', 'path', 'encode ms', 'decode ms', 'bytes')
+    for size, encoding, name, encode, decode, length in run(args.sizes):
+        print '%-9d %-8s %-6s %12.3f %12.3f %12d' % (
+            size, encoding, name, encode, decode, length)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Micro-benchmarks for argument binding.
+
+Compares the original per-call getcallargs implementation (which
+inspects the function and scans the argument list on every call)
+to a CallBinder compiled once per method, for methods with 0, 3
+and 20 parameters. Run from the repository root with:
+
+    python -m benchmarks.bench_callargs
+"""
+
+import inspect
+import timeit
+from tornadorpc.utils import CallBinder
+
+
+def legacy_getcallargs(func, *positional, **named):
+    """ The getcallargs implementation prior to CallBinder. """
+    args, varargs, varkw, defaults = inspect.getargspec(func)
+
+    final_kwargs = {}
+    extra_args = []
+    has_self = inspect.ismethod(func) and func.im_self is not None
+    if has_self:
+        args.pop(0)
+
+    if named:
+        for key, value in named.iteritems():
+            try:
+                args[args.index(key)]
+            except ValueError:
+                if not varkw:
+                    raise TypeError("Keyword argument '%s' not valid" % key)
+            if key in final_kwargs.keys():
+                message = "Keyword argument '%s' used more than once" % key
+                raise TypeError(message)
+            final_kwargs[key] = value
+    else:
+        for i in range(len(positional)):
+            value = positional[i]
+            arg_key = None
+            try:
+                arg_key = args[i]
+            except IndexError:
+                if not varargs:
+                    raise TypeError("Too many positional arguments")
+            if arg_key:
+                final_kwargs[arg_key] = value
+            else:
+                extra_args.append(value)
+    if defaults:
+        for kwarg, default in zip(args[-len(defaults):], defaults):
+            final_kwargs.setdefault(kwarg, default)
+    for arg in args:
+        if arg not in final_kwargs:
+            raise TypeError("Not all arguments supplied. (%s)", arg)
+    return final_kwargs, extra_args
+
+
+def make_method(count):
+    """ Builds a bound method with `count` parameters, half defaulted. """
+    names = ['arg%d' % i for i in range(count)]
+    required = names[:count - count // 2]
+    optional = ['%s=None' % name for name in names[len(required):]]
+    source = 'def method(%s): pass' % ', '.join(
+        ['self'] + required + optional)
+    namespace = {}
+    exec source in namespace
+
+    class Handler(object):
+        method = namespace['method']
+
+    return Handler().method, names
+
+
+def run(number=100000):
+    results = []
+    for count in (0, 3, 20):
+        method, names = make_method(count)
+        args = range(count)
+        kwargs = dict(zip(names, args))
+        binder = CallBinder(method)
+        cases = (
+            ('legacy positional', lambda: legacy_getcallargs(method, *args)),
+            ('binder positional', lambda: binder.bind(args)),
+            ('legacy keyword', lambda: legacy_getcallargs(method, **kwargs)),
+            ('binder keyword', lambda: binder.bind((), kwargs)),
+        )
+        for name, case in cases:
+            elapsed = min(timeit.repeat(case, number=number, repeat=3))
+            results.append((count, name, elapsed / number * 1e6))
+    return results
+
+
+def main():
+    print '%6s  %-20s %10s' % ('params', 'case', 'usec/call')
+    for count, name, usec in run():
+        print '%6d  %-20s %10.3f' % (count, name, usec)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Measures the CPU / bandwidth tradeoff of compressing responses.
+
+For each encoding and level (zstd and br only if the zstandard and
+brotli packages are installed) it reports, for a large JSON-RPC and
+XML-RPC result:
+
+* ratio -- the uncompressed size over the compressed size
+* MB/s -- how fast the encoded response is compressed
+* rps / bytes -- requests per second and bytes sent per response,
+  fetching the result end to end from a server in this process
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_compression
+    python -m benchmarks.bench_compression --levels 1 6 --requests 200
+"""
+
+import argparse
+import json
+import time
+import xmlrpclib
+from tornado import gen
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+from tornado.ioloop import IOLoop
+from tornadorpc import compression, config
+from tornadorpc.json import JSONRPCLibraryWrapper
+
+from benchmarks.bench_rpc import (
+    BenchJSONHandler, BenchXMLHandler, LARGE, json_call, percentile,
+    serve, xml_call)
+
+# (name, handler, request body, encoded response)
+CASES = [
+    ('json large result', BenchJSONHandler,
+     json.dumps(json_call('large', [])),
+     JSONRPCLibraryWrapper.encode_result(LARGE, 1, 2.0)),
+    ('xml large result', BenchXMLHandler, xml_call('large', []),
+     xmlrpclib.dumps((LARGE,), methodresponse=True)),
+]
+
+
+def compress_time(encoding, level, data, number):
+    """ Returns (compressed size, seconds per compression.) """
+    start = time.time()
+    for i in range(number):
+        compressor = compression.compressor(encoding, level)
+        size = len(compressor.compress(data)) + len(compressor.flush())
+    return size, (time.time() - start) / number
+
+
+@gen.coroutine
+def load(url, body, encoding, requests, concurrency):
+    """ Returns (elapsed seconds, bytes per response, latencies.) """
+    client = AsyncHTTPClient()
+    headers = {}
+    if encoding is not None:
+        headers['Accept-Encoding'] = encoding
+    latencies = []
+    sizes = []
+    remaining = [requests]
+
+    @gen.coroutine
+    def worker():
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            start = time.time()
+            response = yield client.fetch(HTTPRequest(
+                url, method='POST', body=body, headers=headers,
+                use_gzip=False))
+            latencies.append(time.time() - start)
+            sizes.append(len(response.body))
+
+    start = time.time()
+    yield [worker() for i in range(concurrency)]
+    raise gen.Return((
+        time.time() - start, sum(sizes) / len(sizes), sorted(latencies)))
+
+
+def run_case(case, encoding, level, requests, concurrency):
+    name, handler_class, body, response = case
+    default_level = config.compress_level
+    config.compress = encoding is not None
+    config.compress_level = level or default_level
+    if encoding is None:
+        ratio, speed = 1.0, None
+    else:
+        size, seconds = compress_time(encoding, level, response, 10)
+        ratio = len(response) / float(size)
+        speed = len(response) / seconds / 1e6
+    server, url = serve(handler_class)
+    io_loop = IOLoop.current()
+    try:
+        io_loop.run_sync(lambda: load(
+            url, body, encoding, concurrency, concurrency))
+        elapsed, size, latencies = io_loop.run_sync(lambda: load(
+            url, body, encoding, requests, concurrency))
+    finally:
+        server.stop()
+        config.compress = False
+        config.compress_level = default_level
+    print '%-18s %-8s %5s %7.1f %8s %9.1f %10d %9.3f' % (
+        name, encoding or 'none', level if encoding else '-', ratio,
+        '-' if speed is None else '%.1f' % speed, requests / elapsed,
+        size, percentile(latencies, 50) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--levels', type=int, nargs='*', default=[1, 6, 9])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+    config.verbose = False
+    print '%-18s %-8s %5s %7s %8s %9s %10s %9s' % (
+        'case', 'encoding', 'level', 'ratio', 'MB/s', 'rps', 'bytes',
+        'p50 ms')
+    for case in CASES:
+        run_case(case, None, None, args.requests, args.concurrency)
+        for encoding in compression.available():
+            for level in args.levels:
+                run_case(
+                    case, encoding, level, args.requests, args.concurrency)
+
+
+if __name__ == '__main__':
+    main()
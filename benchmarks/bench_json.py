@@ -0,0 +1,53 @@
+"""
+Benchmarks the JSON-RPC codecs.
+
+Compares jsonrpclib (JSONRPCLibraryWrapper, the default) to JSONCodec
+when encoding small and large results and faults, and when decoding
+requests. JSONCodec uses orjson or ujson if either is installed, so
+run it with and without them. Run from the repository root with:
+
+    python -m benchmarks.bench_json
+"""
+
+import timeit
+import jsonrpclib
+from tornadorpc.json import JSONRPCLibraryWrapper, JSONCodec, json_functions
+
+SMALL = 42
+LARGE = [
+    {'id': i, 'name': 'item %d' % i, 'price': i * 1.5, 'tags': ['a', 'b']}
+    for i in range(1000)
+]
+FAULT = jsonrpclib.Fault(-32601, 'Method not found')
+REQUEST = jsonrpclib.jsonrpc.dumps([5, 'six', {'seven': 7}], 'add')
+
+
+def run(number=2000):
+    codecs = (
+        ('jsonrpclib', JSONRPCLibraryWrapper),
+        ('JSONCodec', JSONCodec()),
+    )
+    results = []
+    for name, codec in codecs:
+        cases = (
+            ('small result', lambda: codec.encode_result(SMALL, 1, 2.0)),
+            ('large result', lambda: codec.encode_result(LARGE, 1, 2.0)),
+            ('fault', lambda: codec.encode_fault(FAULT, 1, 2.0)),
+            ('decode request', lambda: codec.loads(REQUEST)),
+        )
+        for case_name, case in cases:
+            count = number // 100 if case_name == 'large result' else number
+            elapsed = min(timeit.repeat(case, number=count, repeat=3))
+            results.append((name, case_name, elapsed / count * 1e6))
+    return results
+
+
+def main():
+    print 'JSONCodec is using %s' % json_functions()[0].__module__
+    print '%-12s %-16s %12s' % ('codec', 'case', 'usec/call')
+    for name, case_name, usec in run():
+        print '%-12s %-16s %12.2f' % (name, case_name, usec)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+"""
+Benchmarks the JSON-RPC and XML-RPC request pipelines end to end.
+
+Each case starts an HTTP server on a local port in this process and
+sends it requests from an AsyncHTTPClient on the same IOLoop, so it
+runs without any network access. For every case it reports:
+
+* rps -- requests per second (a batch counts as one request)
+* p50 / p99 -- request latency in milliseconds
+* gc/call -- objects left for the cycle collector per call, measured
+  by running the calls directly through the parser with the garbage
+  collector off. Python 2 only counts the objects still alive, so
+  this is the garbage that reference counting can't free (cycles),
+  which is what makes the collector run. Not measured for async
+  methods (or multicalls), which need the IOLoop to finish.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_rpc
+    python -m benchmarks.bench_rpc --output before.json
+    python -m benchmarks.bench_rpc --compare before.json after.json
+
+Use --cases to run only the cases containing the given text, and
+--requests / --concurrency to change the load.
+"""
+
+import argparse
+import gc
+import json
+import platform
+import subprocess
+import sys
+import time
+import xmlrpclib
+from tornado import gen
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+from tornado.httpserver import HTTPServer
+from tornado.ioloop import IOLoop
+from tornado.testing import bind_unused_port
+import tornado
+import tornado.httpserver
+import tornado.web
+from tornadorpc import async, config
+from tornadorpc.json import JSONRPCHandler
+from tornadorpc.xml import XMLRPCHandler
+
+LARGE = [
+    {'id': i, 'name': 'item %d' % i, 'price': i * 1.5, 'tags': ['a', 'b']}
+    for i in range(1000)
+]
+
+
+class Tree(object):
+
+    def power(self, base, power):
+        return pow(base, power)
+
+
+class BenchHandler(object):
+
+    tree = Tree()
+
+    def add(self, x, y):
+        return x + y
+
+    def echo(self, value):
+        return value
+
+    def large(self):
+        return LARGE
+
+    def fail(self):
+        raise ValueError('Failed')
+
+    @async
+    def later(self, value):
+        IOLoop.current().add_callback(self.result, value)
+
+
+class BenchJSONHandler(BenchHandler, JSONRPCHandler):
+    pass
+
+
+class BenchXMLHandler(BenchHandler, XMLRPCHandler):
+    pass
+
+
+def json_call(method, params, rpcid=1):
+    call = {'jsonrpc': '2.0', 'method': method, 'params': params}
+    if rpcid is not None:
+        call['id'] = rpcid
+    return call
+
+
+def json_batch(size):
+    return json.dumps([json_call('add', [i, i], i) for i in range(size)])
+
+
+def xml_call(method, params):
+    return xmlrpclib.dumps(tuple(params), methodname=method)
+
+
+def xml_multicall(size):
+    calls = [{'methodName': 'add', 'params': [i, i]} for i in range(size)]
+    return xmlrpclib.dumps((calls,), methodname='system.multicall')
+
+
+# (name, handler, request body, calls per request, async)
+CASES = [
+    ('json single', BenchJSONHandler,
+     json.dumps(json_call('add', [1, 2])), 1, False),
+    ('json notification', BenchJSONHandler,
+     json.dumps(json_call('add', [1, 2], None)), 1, False),
+    ('json batch 10', BenchJSONHandler, json_batch(10), 10, False),
+    ('json batch 100', BenchJSONHandler, json_batch(100), 100, False),
+    ('json batch 1000', BenchJSONHandler, json_batch(1000), 1000, False),
+    ('json tree', BenchJSONHandler,
+     json.dumps(json_call('tree.power', [2, 6])), 1, False),
+    ('json async', BenchJSONHandler,
+     json.dumps(json_call('later', [1])), 1, True),
+    ('json large result', BenchJSONHandler,
+     json.dumps(json_call('large', [])), 1, False),
+    ('json large request', BenchJSONHandler,
+     json.dumps(json_call('echo', [LARGE])), 1, False),
+    ('json method not found', BenchJSONHandler,
+     json.dumps(json_call('missing', [])), 1, False),
+    ('json internal error', BenchJSONHandler,
+     json.dumps(json_call('fail', [])), 1, False),
+    ('xml single', BenchXMLHandler, xml_call('add', [1, 2]), 1, False),
+    # system.multicall returns a Future, answered on the IOLoop
+    ('xml multicall 10', BenchXMLHandler, xml_multicall(10), 10, True),
+    ('xml multicall 100', BenchXMLHandler, xml_multicall(100), 100, True),
+    ('xml multicall 1000', BenchXMLHandler, xml_multicall(1000), 1000,
+     True),
+    ('xml tree', BenchXMLHandler, xml_call('tree.power', [2, 6]), 1, False),
+    ('xml async', BenchXMLHandler, xml_call('later', [1]), 1, True),
+    ('xml large result', BenchXMLHandler, xml_call('large', []), 1, False),
+    ('xml large request', BenchXMLHandler,
+     xml_call('echo', [LARGE]), 1, False),
+    ('xml method not found', BenchXMLHandler,
+     xml_call('missing', []), 1, False),
+    ('xml internal error', BenchXMLHandler, xml_call('fail', []), 1, False),
+]
+
+
+def percentile(values, percent):
+    """ values must be sorted. """
+    if not values:
+        return None
+    index = int(round((len(values) - 1) * percent / 100.0))
+    return values[index]
+
+
+@gen.coroutine
+def load(url, body, requests, concurrency):
+    """
+    Sends requests POSTs of body to url, concurrency at a time, and
+    returns (elapsed seconds, sorted latencies.)
+    """
+    client = AsyncHTTPClient()
+    latencies = []
+    remaining = [requests]
+
+    @gen.coroutine
+    def worker():
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            start = time.time()
+            response = yield client.fetch(HTTPRequest(
+                url, method='POST', body=body))
+            if response.code != 200:
+                raise Exception('%s: %s' % (url, response.code))
+            latencies.append(time.time() - start)
+
+    start = time.time()
+    yield [worker() for i in range(concurrency)]
+    raise gen.Return((time.time() - start, sorted(latencies)))
+
+
+def serve(handler_class):
+    """ Starts a server for handler_class, returning (server, url.) """
+    sock, port = bind_unused_port()
+    application = tornado.web.Application([('/', handler_class)])
+    server = HTTPServer(application)
+    server.add_sockets([sock])
+    return server, 'http://127.0.0.1:%d/' % port
+
+
+def gc_objects(handler_class, body, number):
+    """
+    Returns the number of objects left for the cycle collector by
+    running the request directly through the parser, per request.
+    """
+    class Direct(handler_class):
+
+        def on_result(self, response_text):
+            pass
+
+    # A handler with a request, as the parser reads its headers
+    handler = Direct(tornado.web.Application(),
+                     tornado.httpserver.HTTPRequest('POST', '/'))
+    parser = Direct._RPC_
+    parser.run(handler, body)
+    handler._RPC_context = None
+    gc.collect()
+    gc.disable()
+    try:
+        before = gc.get_count()[0]
+        for i in range(number):
+            parser.run(handler, body)
+            # Don't count the last request, kept by the handler
+            handler._RPC_context = None
+        return (gc.get_count()[0] - before) / float(number)
+    finally:
+        gc.enable()
+
+
+def run_case(case, requests, concurrency):
+    name, handler_class, body, calls, is_async = case
+    # Large batches take longer, so send fewer of them
+    requests = max(10, requests // max(1, calls // 10))
+    server, url = serve(handler_class)
+    io_loop = IOLoop.current()
+    try:
+        # Warm up the connections and caches
+        io_loop.run_sync(lambda: load(url, body, concurrency, concurrency))
+        elapsed, latencies = io_loop.run_sync(
+            lambda: load(url, body, requests, concurrency))
+    finally:
+        server.stop()
+    result = {
+        'requests': requests,
+        'calls_per_request': calls,
+        'rps': requests / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'gc_per_call': None,
+    }
+    if not is_async:
+        result['gc_per_call'] = gc_objects(
+            handler_class, body, max(10, requests // 10)) / calls
+    return name, result
+
+
+def revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'describe', '--always', '--dirty']).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(cases=None, requests=2000, concurrency=10):
+    config.verbose = False
+    results = {}
+    for case in CASES:
+        if cases and not any(text in case[0] for text in cases):
+            continue
+        name, result = run_case(case, requests, concurrency)
+        results[name] = result
+        print_result(name, result)
+    return {
+        'revision': revision(),
+        'python': platform.python_version(),
+        'tornado': tornado.version,
+        'requests': requests,
+        'concurrency': concurrency,
+        'results': results,
+    }
+
+
+def print_result(name, result):
+    gc_count = result['gc_per_call']
+    print '%-24s %10.1f %9.3f %9.3f %8s' % (
+        name, result['rps'], result['p50_ms'], result['p99_ms'],
+        '-' if gc_count is None else '%.2f' % gc_count)
+
+
+def compare(before_path, after_path):
+    """ Prints the change in each case between two saved runs. """
+    with open(before_path) as before_file:
+        before = json.load(before_file)
+    with open(after_path) as after_file:
+        after = json.load(after_file)
+    print '%s -> %s' % (before['revision'], after['revision'])
+    print '%-24s %10s %10s %10s' % ('case', 'rps', 'p50', 'p99')
+    for name in sorted(after['results']):
+        old = before['results'].get(name)
+        if old is None:
+            continue
+        new = after['results'][name]
+        print '%-24s %+9.1f%% %+9.1f%% %+9.1f%%' % (
+            name,
+            (new['rps'] / old['rps'] - 1) * 100,
+            (new['p50_ms'] / old['p50_ms'] - 1) * 100,
+            (new['p99_ms'] / old['p99_ms'] - 1) * 100)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--cases', nargs='*')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--output')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'))
+    args = parser.parse_args()
+    if args.compare:
+        return compare(*args.compare)
+    print '%-24s %10s %9s %9s %8s' % (
+        'case', 'rps', 'p50 ms', 'p99 ms', 'gc/call')
+    results = run(args.cases, args.requests, args.concurrency)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Compares the TCP transport with HTTP for the same handlers.
+
+Each case calls a server in this process through the matching client
+(JSONRPCClient / XMLRPCClient for HTTP, JSONRPCTCPClient /
+XMLRPCTCPClient for TCP and Unix domain sockets), concurrency calls
+at a time, and reports requests per second and the p50 / p99 latency
+in milliseconds, like bench_rpc.
+
+Run from the repository root with:
+
+    python -m benchmarks.bench_tcp
+    python -m benchmarks.bench_tcp --cases json --requests 5000
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from tornado import gen
+from tornado.ioloop import IOLoop
+from tornado.netutil import bind_unix_socket
+from tornado.testing import bind_unused_port
+from tornadorpc import config
+from tornadorpc.client import JSONRPCClient, XMLRPCClient
+from tornadorpc.tcp import RPCServer, JSONRPCTCPClient, XMLRPCTCPClient
+
+from benchmarks.bench_rpc import (
+    BenchJSONHandler, BenchXMLHandler, percentile, serve)
+
+
+def serve_tcp(handler_class):
+    sock, port = bind_unused_port()
+    server = RPCServer(handler_class)
+    server.add_socket(sock)
+    return server, ('127.0.0.1', port)
+
+
+def serve_unix(handler_class, path):
+    server = RPCServer(handler_class)
+    server.add_socket(bind_unix_socket(path))
+    return server, path
+
+
+def add(client):
+    return client.add(1, 2)
+
+
+def batch(client):
+    batch = client.batch()
+    for i in range(100):
+        batch.add(i, i)
+    return batch.send()
+
+
+def large(client):
+    return client.large()
+
+
+# (name, handler, client class per transport, call, calls per request)
+CASES = [
+    ('json single', BenchJSONHandler, (JSONRPCClient, JSONRPCTCPClient),
+     add, 1),
+    ('json batch 100', BenchJSONHandler, (JSONRPCClient, JSONRPCTCPClient),
+     batch, 100),
+    ('json large result', BenchJSONHandler,
+     (JSONRPCClient, JSONRPCTCPClient), large, 1),
+    ('xml single', BenchXMLHandler, (XMLRPCClient, XMLRPCTCPClient),
+     add, 1),
+    ('xml multicall 100', BenchXMLHandler, (XMLRPCClient, XMLRPCTCPClient),
+     batch, 100),
+]
+
+TRANSPORTS = ('http', 'tcp', 'unix')
+
+
+@gen.coroutine
+def load(client, call, requests, concurrency):
+    """ Returns (elapsed seconds, sorted latencies.) """
+    latencies = []
+    remaining = [requests]
+
+    @gen.coroutine
+    def worker():
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            start = time.time()
+            yield call(client)
+            latencies.append(time.time() - start)
+
+    start = time.time()
+    yield [worker() for i in range(concurrency)]
+    raise gen.Return((time.time() - start, sorted(latencies)))
+
+
+def run_case(case, transport, requests, concurrency, directory):
+    name, handler_class, client_classes, call, calls = case
+    requests = max(10, requests // max(1, calls // 10))
+    http_client_class, tcp_client_class = client_classes
+    if transport == 'http':
+        server, url = serve(handler_class)
+        client = http_client_class(url, max_clients=concurrency)
+    elif transport == 'tcp':
+        server, address = serve_tcp(handler_class)
+        client = tcp_client_class(address)
+    else:
+        server, address = serve_unix(
+            handler_class, os.path.join(directory, 'bench.sock'))
+        client = tcp_client_class(address)
+    io_loop = IOLoop.current()
+    try:
+        io_loop.run_sync(lambda: load(client, call, concurrency, concurrency))
+        elapsed, latencies = io_loop.run_sync(
+            lambda: load(client, call, requests, concurrency))
+    finally:
+        client.close()
+        server.stop()
+    return {
+        'rps': requests / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def run(cases=None, requests=2000, concurrency=10):
+    config.verbose = False
+    directory = tempfile.mkdtemp()
+    try:
+        for case in CASES:
+            if cases and not any(text in case[0] for text in cases):
+                continue
+            for transport in TRANSPORTS:
+                result = run_case(
+                    case, transport, requests, concurrency, directory)
+                print '%-20s %-5s %10.1f %9.3f %9.3f' % (
+                    case[0], transport, result['rps'], result['p50_ms'],
+                    result['p99_ms'])
+                # Each socket path can only be bound once
+                path = os.path.join(directory, 'bench.sock')
+                if os.path.exists(path):
+                    os.remove(path)
+    finally:
+        shutil.rmtree(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--cases', nargs='*')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=10)
+    args = parser.parse_args()
+    print '%-20s %-5s %10s %9s %9s' % (
+        'case', 'via', 'rps', 'p50 ms', 'p99 ms')
+    run(args.cases, args.requests, args.concurrency)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,8 @@
+import json
 import threading
 import time
 from tornadorpc import start_server, private, async
-from tornado.httpclient import AsyncHTTPClient
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest
 
 
 class Tree(object):
@@ -43,6 +44,50 @@ class TestHandler(object):
         self.result(response.code)
 
 
+def json_call(method, params=(), rpcid=1, **members):
+    """
+    Returns a JSON-RPC 2.0 request object, or a notification if rpcid
+    is None. Extra members are added to it.
+    """
+    request = {"jsonrpc": "2.0", "method": method, "params": params}
+    if isinstance(params, tuple):
+        request["params"] = list(params)
+    if rpcid is not None:
+        request["id"] = rpcid
+    request.update(members)
+    return request
+
+
+def json_batch(calls):
+    """ Returns a batch of (method, params) calls, with ids from 0. """
+    return [json_call(method, params, i)
+            for i, (method, params) in enumerate(calls)]
+
+
+class RPCRequests(object):
+    """
+    Mixed into AsyncHTTPTestCase subclasses to post RPC bodies to
+    path. Bodies that aren't strings are sent as JSON.
+    """
+
+    path = "/"
+
+    def request(self, body, path=None, **headers):
+        """ Returns the Future of the response. """
+        if not isinstance(body, basestring):
+            body = json.dumps(body)
+        return self.http_client.fetch(HTTPRequest(
+            self.get_url(path or self.path), method="POST", body=body,
+            headers=headers, use_gzip=False))
+
+    def fetch_batch(self, calls, path=None):
+        """ Sends (method, params) calls and returns the responses. """
+        response = self.fetch(
+            path or self.path, method="POST",
+            body=json.dumps(json_batch(calls)))
+        return json.loads(response.body)
+
+
 class TestServer(object):
 
     threads = {}
@@ -0,0 +1,158 @@
+import json
+import socket
+import time
+from tornado import gen
+from tornado.ioloop import IOLoop
+from tornado.iostream import IOStream
+from tornado.testing import AsyncHTTPTestCase, gen_test
+import tornado.web
+from tornadorpc import async, config, limit
+from tornadorpc.base import BaseRPCHandler
+from tornadorpc.json import JSONRPCHandler
+
+from tests.helpers import RPCRequests, TestHandler, json_call
+
+SERVER_BUSY = -32003
+
+
+class AdmissionHandler(TestHandler, JSONRPCHandler):
+
+    def prepare(self):
+        # Holds the request up before post(), as a busy IOLoop would
+        delay = self.request.headers.get("X-Delay")
+        if delay:
+            time.sleep(float(delay))
+
+    @async
+    def sleep(self, delay):
+        IOLoop.current().add_timeout(
+            time.time() + delay, lambda: self.result(delay))
+
+    @limit(max_in_flight=1)
+    @async
+    def report(self, delay):
+        IOLoop.current().add_timeout(
+            time.time() + delay, lambda: self.result(delay))
+
+    @limit(priority="low")
+    def export(self):
+        return "exported"
+
+    @async
+    def hang(self):
+        pass
+
+    @limit(priority="high")
+    def health(self):
+        return "ok"
+
+
+class AdmissionTests(RPCRequests, AsyncHTTPTestCase):
+
+    def get_app(self):
+        return tornado.web.Application([("/", AdmissionHandler)])
+
+    def tearDown(self):
+        config.max_in_flight = None
+        config.max_queue_time = None
+        config.batch_concurrency = None
+        super(AdmissionTests, self).tearDown()
+
+    @gen.coroutine
+    def wait_in_flight(self, count):
+        while BaseRPCHandler._RPC_in_flight < count:
+            yield gen.Task(IOLoop.current().add_callback)
+
+    @gen_test
+    def test_method_limit(self):
+        response = yield self.request([
+            json_call("report", [0.01], i) for i in range(3)])
+        responses = json.loads(response.body)
+        self.assertEqual(0.01, responses[0]["result"])
+        self.assertEqual(SERVER_BUSY, responses[1]["error"]["code"])
+        self.assertEqual(SERVER_BUSY, responses[2]["error"]["code"])
+        report_limit = AdmissionHandler.report.im_func.limit
+        self.assertEqual(0, report_limit.running)
+        self.assertEqual(2, report_limit.rejected)
+        # The slot is free again
+        response = yield self.request(json_call("report", [0]))
+        self.assertEqual(0, json.loads(response.body)["result"])
+
+    @gen_test
+    def test_max_in_flight(self):
+        config.max_in_flight = 1
+        slow = self.request(json_call("sleep", [0.05]))
+        yield self.wait_in_flight(1)
+        response = yield self.request(json_call("add", [1, 2]))
+        error = json.loads(response.body)["error"]
+        self.assertEqual(SERVER_BUSY, error["code"])
+        self.assertEqual(None, json.loads(response.body)["id"])
+        response = yield slow
+        self.assertEqual(0.05, json.loads(response.body)["result"])
+        response = yield self.request(json_call("add", [1, 2]))
+        self.assertEqual(3, json.loads(response.body)["result"])
+
+    @gen_test
+    def test_priorities(self):
+        config.max_in_flight = 4
+        slow = [self.request(json_call("sleep", [0.05])) for i in range(2)]
+        yield self.wait_in_flight(2)
+        # Three requests in flight -- past the share of 'low' calls
+        response = yield self.request([
+            json_call("export", [], 1), json_call("add", [1, 2], 2),
+            json_call("health", [], 3)])
+        responses = json.loads(response.body)
+        self.assertEqual(SERVER_BUSY, responses[0]["error"]["code"])
+        self.assertEqual(3, responses[1]["result"])
+        self.assertEqual("ok", responses[2]["result"])
+        yield slow
+        response = yield self.request(json_call("export"))
+        self.assertEqual("exported", json.loads(response.body)["result"])
+
+    @gen_test
+    def test_queue_time(self):
+        config.max_queue_time = 0.01
+        response = yield self.request(
+            json_call("add", [1, 2]), **{"X-Delay": "0.02"})
+        error = json.loads(response.body)["error"]
+        self.assertEqual(SERVER_BUSY, error["code"])
+        # Batch entries waiting on batch_concurrency aren't queued
+        config.batch_concurrency = 1
+        response = yield self.request([
+            json_call("sleep", [0.02], 1), json_call("add", [1, 2], 2)])
+        responses = json.loads(response.body)
+        self.assertEqual(0.02, responses[0]["result"])
+        self.assertEqual(3, responses[1]["result"])
+
+    @gen_test
+    def test_slow_upload(self):
+        # The time to receive the body counts
+        config.max_queue_time = 0.02
+        body = json.dumps(json_call("add", [1, 2]))
+        stream = IOStream(socket.socket())
+        yield gen.Task(stream.connect, ("127.0.0.1", self.get_http_port()))
+        stream.write(
+            "POST / HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+            "Content-Length: %d\r\n\r\n" % len(body))
+        yield gen.Task(IOLoop.current().add_timeout, time.time() + 0.05)
+        stream.write(body)
+        response = yield gen.Task(stream.read_until_close)
+        result = json.loads(response.split("\r\n\r\n", 1)[1])
+        self.assertEqual(SERVER_BUSY, result["error"]["code"])
+
+    @gen_test
+    def test_client_gone(self):
+        stream = IOStream(socket.socket())
+        yield gen.Task(stream.connect, ("127.0.0.1", self.get_http_port()))
+        body = json.dumps(json_call("hang"))
+        stream.write(
+            "POST / HTTP/1.1\r\nHost: localhost\r\n"
+            "Content-Length: %d\r\n\r\n%s" % (len(body), body))
+        yield self.wait_in_flight(1)
+        stream.close()
+        # The call never answers, but it no longer counts
+        while BaseRPCHandler._RPC_in_flight:
+            yield gen.Task(IOLoop.current().add_callback)
+
+    def test_unknown_priority(self):
+        self.assertRaises(ValueError, limit, priority="urgent")
@@ -0,0 +1,146 @@
+import json
+import unittest
+from tornado.httpclient import HTTPRequest
+from tornado.testing import AsyncHTTPTestCase, gen_test
+import tornado.web
+from tornadorpc import arrays
+from tornadorpc.client import JSONRPCClient
+
+from tests.helpers import TestHandler
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class ArrayTestHandler(TestHandler, arrays.ArrayRPCHandler):
+
+    def describe(self, values):
+        return [type(values).__name__, values.dtype.str, list(values.shape)]
+
+    def scale(self, values, factor=2):
+        return values * factor
+
+    def total(self, values):
+        return values.sum()
+
+    def objects(self):
+        return numpy.array([object()])
+
+
+def samples():
+    return [
+        numpy.arange(12, dtype=numpy.float64).reshape(3, 4),
+        numpy.arange(5, dtype=">i4"),
+        numpy.array([True, False]),
+        numpy.arange(20, dtype=numpy.int16)[::3],
+        numpy.array(1.5, dtype=numpy.float32),
+        numpy.zeros((0, 3), dtype=numpy.uint8),
+    ]
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class CodecTests(unittest.TestCase):
+
+    def codecs(self):
+        codecs = [arrays.ArrayJSONCodec()]
+        if arrays.msgpack is not None:
+            codecs.append(arrays.ArrayMsgPackCodec())
+        if arrays.cbor2 is not None:
+            codecs.append(arrays.ArrayCBORCodec())
+        return codecs
+
+    def test_round_trip(self):
+        for codec in self.codecs():
+            for array in samples():
+                decoded = codec.loads(codec.dumps({u"value": array}))
+                decoded = decoded[u"value"]
+                self.assertEqual(array.dtype, decoded.dtype)
+                self.assertEqual(array.shape, decoded.shape)
+                self.assertTrue(numpy.array_equal(array, decoded))
+                # A view of the received data, not a copy
+                self.assertFalse(decoded.flags.writeable)
+
+    def test_scalars(self):
+        for codec in self.codecs():
+            value = [numpy.float32(0.5), numpy.int8(3), numpy.bool_(True)]
+            self.assertEqual([0.5, 3, True], codec.loads(codec.dumps(value)))
+
+    def test_json_format(self):
+        codec = arrays.ArrayJSONCodec()
+        value = json.loads(codec.dumps(numpy.array([1, 2], dtype="<u2")))
+        self.assertEqual(
+            {"__ndarray__": "AQACAA==", "dtype": "<u2", "shape": [2]}, value)
+
+    def test_bad_arrays(self):
+        codec = arrays.ArrayJSONCodec()
+        self.assertRaises(
+            TypeError, codec.dumps, numpy.array([object()]))
+        for value in ({"__ndarray__": "AQACAA==", "dtype": "<u2",
+                       "shape": [3]},
+                      {"__ndarray__": "AQACAA==", "dtype": "|O",
+                       "shape": [1]},
+                      {"__ndarray__": "AQACAA==", "dtype": "nothing",
+                       "shape": [2]}):
+            self.assertRaises(ValueError, codec.loads, json.dumps(value))
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class ArrayHandlerTests(AsyncHTTPTestCase):
+
+    def get_app(self):
+        return tornado.web.Application([("/", ArrayTestHandler)])
+
+    def call(self, codec, method, params, content_type):
+        request = {u"jsonrpc": u"2.0", u"method": method,
+                   u"params": params, u"id": 1}
+        return self.http_client.fetch(HTTPRequest(
+            self.get_url("/"), method="POST", body=codec.dumps(request),
+            headers={"Content-Type": content_type}))
+
+    @gen_test
+    def test_encodings(self):
+        codecs = [(arrays.ArrayJSONCodec(), "application/json")]
+        if arrays.msgpack is not None:
+            codecs.append((arrays.ArrayMsgPackCodec(), "application/msgpack"))
+        if arrays.cbor2 is not None:
+            codecs.append((arrays.ArrayCBORCodec(), "application/cbor"))
+        values = numpy.arange(6, dtype=numpy.float32).reshape(2, 3)
+        for codec, content_type in codecs:
+            response = yield self.call(
+                codec, u"describe", [values], content_type)
+            self.assertTrue(
+                response.headers["Content-Type"].startswith(content_type))
+            self.assertEqual(
+                [u"ndarray", u"<f4", [2, 3]],
+                codec.loads(response.body)[u"result"])
+            response = yield self.call(
+                codec, u"scale", {u"values": values, u"factor": 3},
+                content_type)
+            result = codec.loads(response.body)[u"result"]
+            self.assertTrue(numpy.array_equal(values * 3, result))
+            response = yield self.call(
+                codec, u"total", [values], content_type)
+            self.assertEqual(15, codec.loads(response.body)[u"result"])
+
+    @gen_test
+    def test_faults(self):
+        codec = arrays.ArrayJSONCodec()
+        response = yield self.http_client.fetch(
+            self.get_url("/"), method="POST", body=json.dumps({
+                "jsonrpc": "2.0", "method": "total", "id": 1, "params": [
+                    {"__ndarray__": "AQ==", "dtype": "<f8", "shape": [1]}]}))
+        self.assertEqual(-32700, json.loads(response.body)["error"]["code"])
+        response = yield self.call(
+            codec, u"objects", [], "application/json")
+        self.assertEqual(-32603, json.loads(response.body)["error"]["code"])
+
+    @gen_test
+    def test_client(self):
+        codec = arrays.ArrayJSONCodec()
+        client = JSONRPCClient(
+            self.get_url("/"), dumps=codec.dumps, loads=codec.loads)
+        result = yield client.scale(numpy.arange(4, dtype=numpy.int64))
+        self.assertEqual(numpy.int64, result.dtype)
+        self.assertEqual([0, 2, 4, 6], result.tolist())
@@ -1,9 +1,16 @@
 import json
-from tests.helpers import TestHandler
+import time
+from tests.helpers import RPCRequests, TestHandler, json_batch
+from tornado import gen
+from tornado.concurrent import Future
 from tornado.httpclient import AsyncHTTPClient
-from tornado.testing import AsyncHTTPTestCase
+from tornado.ioloop import IOLoop
+from tornado.testing import AsyncHTTPTestCase, gen_test
 import tornado.web
-from tornadorpc import async
+from tornadorpc import async, config
+from tornadorpc.base import GracefulShutdown
+from tornadorpc.client import XMLRPCClient
+from tornadorpc.json import JSONRPCHandler
 from tornadorpc.xml import XMLRPCHandler
 import xmlrpclib
 
@@ -24,43 +31,43 @@ class AsyncHandler(XMLRPCHandler, TestHandler):
     def _handle_response(self, response):
         self.result(json.loads(response.body))
 
+    @gen.coroutine
+    def coroutine_method(self, url):
+        response = yield AsyncHTTPClient().fetch(url)
+        raise gen.Return(json.loads(response.body))
 
-class AsyncXMLRPCClient(object):
+    @gen.coroutine
+    def bad_coroutine_method(self, message):
+        yield gen.Task(IOLoop.current().add_callback)
+        raise Exception(message)
 
-    def __init__(self, url, ioloop, fetcher):
-        self._url = url
-        self._ioloop = ioloop
-        self._fetcher = fetcher
+    def future_method(self, value):
+        future = Future()
+        IOLoop.current().add_callback(future.set_result, value)
+        return future
 
-    def __getattr__(self, attribute):
-        return Caller(attribute, self)
 
-    def execute(self, method, params, keyword_params):
-        if params and keyword_params:
-            raise Exception(
-                "Can't have both keyword and positional arguments.")
-        arguments = params or keyword_params
-        body = xmlrpclib.dumps(arguments, methodname=method)
-        response = self._fetcher(self._url, method="POST", body=body)
-        result, _ = xmlrpclib.loads(response.body)
-        return result[0]
+class AsyncJSONHandler(JSONRPCHandler, TestHandler):
 
+    running = 0
+    max_running = 0
 
-class Caller(object):
-
-    def __init__(self, namespace, client):
-        self._namespace = namespace
-        self._client = client
+    @async
+    def delayed(self, value, delay):
+        AsyncJSONHandler.running += 1
+        AsyncJSONHandler.max_running = max(
+            AsyncJSONHandler.running, AsyncJSONHandler.max_running)
+        IOLoop.current().add_timeout(
+            time.time() + delay, lambda: self._finish_delayed(value))
 
-    def __getattr__(self, namespace):
-        self._namespace += "." + namespace
-        return self
+    def _finish_delayed(self, value):
+        AsyncJSONHandler.running -= 1
+        self.result(value)
 
-    def __call__(self, *args, **kwargs):
-        return self._client.execute(self._namespace, args, kwargs)
 
+class AsyncTests(RPCRequests, AsyncHTTPTestCase):
 
-class AsyncTests(AsyncHTTPTestCase):
+    path = "/JSON"
 
     def get_app(self):
 
@@ -71,24 +78,142 @@ class AsyncTests(AsyncHTTPTestCase):
 
         return tornado.web.Application([
             ("/", IndexHandler),
-            ("/RPC2", AsyncHandler)
+            ("/RPC2", AsyncHandler),
+            ("/JSON", AsyncJSONHandler)
         ])
 
-    def get_client(self):
-        return AsyncXMLRPCClient(
-            url="/RPC2", ioloop=self.io_loop, fetcher=self.fetch)
+    def setUp(self):
+        super(AsyncTests, self).setUp()
+        self.client = XMLRPCClient(self.get_url("/RPC2"))
 
+    def tearDown(self):
+        self.client.close()
+        super(AsyncTests, self).tearDown()
+
+    @gen_test
     def test_async_method(self):
-        client = self.get_client()
-        result = client.async_method(
-            "http://localhost:%d/" % (self.get_http_port()))
+        result = yield self.client.async_method(self.get_url("/"))
         self.assertEqual({"foo": "bar"}, result)
 
+    @gen_test
     def test_async_returns_non_none_raises_internal_error(self):
-        client = self.get_client()
         try:
-            client.bad_async_method(
-                "http://localhost:%d/" % (self.get_http_port()))
+            yield self.client.bad_async_method(self.get_url("/"))
+            self.fail("xmlrpclib.Fault should have been raised.")
+        except xmlrpclib.Fault, fault:
+            self.assertEqual(-32603, fault.faultCode)
+
+    @gen_test
+    def test_coroutine_method(self):
+        result = yield self.client.coroutine_method(self.get_url("/"))
+        self.assertEqual({"foo": "bar"}, result)
+
+    @gen_test
+    def test_future_method(self):
+        result = yield self.client.future_method(5)
+        self.assertEqual(5, result)
+
+    @gen_test
+    def test_coroutine_raises_internal_error(self):
+        try:
+            yield self.client.bad_coroutine_method("Yar matey!")
             self.fail("xmlrpclib.Fault should have been raised.")
         except xmlrpclib.Fault, fault:
             self.assertEqual(-32603, fault.faultCode)
+
+    @gen_test
+    def test_concurrent_async_requests(self):
+        first = json.dumps([
+            {"jsonrpc": "2.0", "method": "add", "params": [1, 2], "id": 1},
+            {"jsonrpc": "2.0", "method": "delayed",
+             "params": ["first", 0.05], "id": 2}
+        ])
+        second = json.dumps({
+            "jsonrpc": "2.0", "method": "delayed",
+            "params": ["second", 0.01], "id": 3})
+        url = self.get_url("/JSON")
+        responses = yield [
+            self.http_client.fetch(url, method="POST", body=first),
+            self.http_client.fetch(url, method="POST", body=second)
+        ]
+        first_result = json.loads(responses[0].body)
+        self.assertEqual([1, 2], [r["id"] for r in first_result])
+        self.assertEqual([3, "first"], [r["result"] for r in first_result])
+        second_result = json.loads(responses[1].body)
+        self.assertEqual(3, second_result["id"])
+        self.assertEqual("second", second_result["result"])
+
+    def test_graceful_shutdown(self):
+        body = json.dumps({
+            "jsonrpc": "2.0", "method": "delayed",
+            "params": ["drained", 0.1], "id": 1})
+        responses = []
+        self.http_client.fetch(
+            self.get_url("/JSON"), callback=responses.append,
+            method="POST", body=body)
+        shutdown = GracefulShutdown(
+            self.http_server, self.io_loop, 5, callback=self.stop)
+        self.io_loop.add_timeout(time.time() + 0.02, shutdown)
+        self.wait()
+        # The call was still allowed to finish
+        self.assertEqual(0, JSONRPCHandler._RPC_in_flight)
+        if not responses:
+            self.wait(condition=lambda: responses)
+        self.assertEqual("drained", json.loads(responses[0].body)["result"])
+
+    def test_batch_async_results_by_index(self):
+        AsyncJSONHandler.max_running = 0
+        results = self.fetch_batch([
+            ("delayed", ["slow", 0.05]),
+            ("add", [1, 2]),
+            ("delayed", ["fast", 0.01]),
+        ])
+        self.assertEqual([0, 1, 2], [r["id"] for r in results])
+        self.assertEqual(["slow", 3, "fast"], [r["result"] for r in results])
+        self.assertEqual(2, AsyncJSONHandler.max_running)
+
+    def fetch_streamed(self, calls, mode):
+        """
+        Sends a batch streamed in mode, and returns the responses and
+        the ones that arrived while a delayed call was still running.
+        """
+        chunks = []
+        AsyncJSONHandler.stream_batches = mode
+        try:
+            self.fetch(
+                self.path, method="POST", body=json.dumps(json_batch(calls)),
+                streaming_callback=lambda chunk: chunks.append(
+                    (chunk, AsyncJSONHandler.running)))
+        finally:
+            AsyncJSONHandler.stream_batches = None
+        early = "".join(chunk for chunk, running in chunks if running)
+        return (json.loads("".join(chunk for chunk, running in chunks)),
+                json.loads(early + "]") if early else [])
+
+    def test_streamed_batch(self):
+        calls = [
+            ("delayed", ["slow", 0.05]),
+            ("add", [1, 2]),
+            ("delayed", ["fast", 0.01]),
+        ]
+        results, early = self.fetch_streamed(calls, "ordered")
+        self.assertEqual(["slow", 3, "fast"], [r["result"] for r in results])
+        # Nothing can be sent before the first entry
+        self.assertEqual([], early)
+        results, early = self.fetch_streamed(calls[1:2] + calls[:1], "ordered")
+        self.assertEqual([3], [r["result"] for r in early])
+        results, early = self.fetch_streamed(calls, "completed")
+        self.assertEqual([1, 2, 0], [r["id"] for r in results])
+        self.assertEqual([3, "fast", "slow"], [r["result"] for r in results])
+        self.assertEqual([3, "fast"], [r["result"] for r in early])
+
+    def test_batch_concurrency_limit(self):
+        AsyncJSONHandler.max_running = 0
+        config.batch_concurrency = 2
+        try:
+            results = self.fetch_batch(
+                [("delayed", [i, 0.01]) for i in range(5)])
+        finally:
+            config.batch_concurrency = None
+        self.assertEqual(range(5), [r["result"] for r in results])
+        self.assertEqual(2, AsyncJSONHandler.max_running)
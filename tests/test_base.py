@@ -0,0 +1,100 @@
+import unittest
+from tests.helpers import TestHandler
+from tornadorpc.base import MethodRegistry, BaseRPCHandler
+
+
+class RegistryHandler(TestHandler, BaseRPCHandler):
+
+    @property
+    def dynamic(self):
+        return self.tree
+
+    @staticmethod
+    def static(x):
+        return x
+
+
+class TestMethodRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = MethodRegistry(RegistryHandler)
+        self.handler = RegistryHandler.__new__(RegistryHandler)
+
+    def test_handler_methods(self):
+        method = self.registry.lookup(self.handler, 'add').get(self.handler)
+        self.assertEqual(method(5, 6), 11)
+        self.assertTrue(method.im_self is self.handler)
+
+    def test_tree_methods(self):
+        self.assertTrue('tree.power' in self.registry.methods)
+        method = self.registry.lookup(
+            self.handler, 'tree.power').get(self.handler)
+        self.assertEqual(method(2, 6), 64)
+
+    def test_static_methods(self):
+        method = self.registry.lookup(self.handler, 'static').get(self.handler)
+        self.assertEqual(method(5), 5)
+
+    def test_async_flag(self):
+        self.assertTrue(self.registry.methods['async'].async)
+        self.assertFalse(self.registry.methods['add'].async)
+
+    def test_binders(self):
+        binder = self.registry.methods['add'].binder
+        self.assertEqual(({'x': 5, 'y': 6}, []), binder.bind([5, 6]))
+        binder = self.registry.methods['tree.power'].binder
+        self.assertEqual(
+            ({'base': 2, 'power': 6, 'modulo': None}, []),
+            binder.bind([2, 6]))
+
+    def test_private_methods(self):
+        for name in ('private', '_private', 'tree._private', 'result',
+                     'post', 'finish', 'missing', 'tree.missing'):
+            self.assertEqual(None, self.registry.lookup(self.handler, name))
+
+    def test_private_tree(self):
+
+        class Tree(object):
+            private = True
+
+            def power(self, x, y):
+                return pow(x, y)
+
+        class Handler(BaseRPCHandler):
+            tree = Tree()
+
+        registry = MethodRegistry(Handler)
+        handler = Handler.__new__(Handler)
+        self.assertEqual(None, registry.lookup(handler, 'tree.power'))
+
+    def test_instance_attributes(self):
+        self.assertFalse('dynamic.power' in self.registry.methods)
+        method = self.registry.lookup(
+            self.handler, 'dynamic.power').get(self.handler)
+        self.assertEqual(method(2, 6), 64)
+        self.handler.instance_tree = self.handler.tree
+        method = self.registry.lookup(
+            self.handler, 'instance_tree.power').get(self.handler)
+        self.assertEqual(method(2, 6), 64)
+
+    def test_instance_overrides_class(self):
+
+        class Injected(object):
+
+            def power(self, base, power):
+                return "injected"
+
+        # As set in initialize(), over the class level tree
+        self.handler.tree = Injected()
+        self.handler.add = lambda x, y: "injected add"
+        method = self.registry.lookup(
+            self.handler, 'tree.power').get(self.handler)
+        self.assertEqual("injected", method(2, 6))
+        method = self.registry.lookup(self.handler, 'add').get(self.handler)
+        self.assertEqual("injected add", method(5, 6))
+        self.assertEqual(
+            None, self.registry.lookup(self.handler, 'tree._private'))
+        # Other handlers still use the class level tree
+        handler = RegistryHandler.__new__(RegistryHandler)
+        method = self.registry.lookup(handler, 'tree.power').get(handler)
+        self.assertEqual(64, method(2, 6))
@@ -0,0 +1,188 @@
+import json
+import unittest
+import xmlrpclib
+from tornado.httpclient import HTTPRequest
+from tornado.testing import AsyncHTTPTestCase, gen_test
+import tornado.web
+from tornadorpc.binary import MsgPackRPCHandler, CBORRPCHandler
+from tornadorpc.binary import MsgPackCodec
+
+from tests.helpers import TestHandler
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+
+class BinaryTestHandler(TestHandler):
+
+    def echo(self, value):
+        return value
+
+    def blob(self):
+        return xmlrpclib.Binary("\x00\xff")
+
+    def numbers(self, count):
+        return [i * 0.5 for i in range(count)]
+
+
+class MsgPackTestHandler(BinaryTestHandler, MsgPackRPCHandler):
+    pass
+
+
+class CBORTestHandler(BinaryTestHandler, CBORRPCHandler):
+    stream_batches = "ordered"
+
+
+def call(method, params, rpcid=1):
+    request = {u"jsonrpc": u"2.0", u"method": method, u"params": params}
+    if rpcid is not None:
+        request[u"id"] = rpcid
+    return request
+
+
+class BinaryTests(AsyncHTTPTestCase):
+
+    path = None
+    content_type = None
+
+    def get_app(self):
+        return tornado.web.Application([
+            ("/msgpack", MsgPackTestHandler),
+            ("/cbor", CBORTestHandler),
+        ])
+
+    def dumps(self, value):
+        raise NotImplementedError()
+
+    def loads(self, data):
+        raise NotImplementedError()
+
+    def request(self, body, content_type=None, path=None):
+        headers = {"Content-Type": content_type or self.content_type}
+        return self.http_client.fetch(HTTPRequest(
+            self.get_url(path or self.path), method="POST", body=body,
+            headers=headers))
+
+    def check_response(self, response):
+        self.assertEqual(
+            self.content_type, response.headers["Content-Type"])
+        return self.loads(response.body)
+
+    @gen_test
+    def test_calls(self):
+        response = yield self.request(self.dumps(call(u"add", [5, 6])))
+        self.assertEqual(
+            {u"jsonrpc": u"2.0", u"id": 1, u"result": 11},
+            self.check_response(response))
+        response = yield self.request(
+            self.dumps(call(u"tree.power", {u"base": 2, u"power": 6})))
+        self.assertEqual(64, self.check_response(response)[u"result"])
+        response = yield self.request(self.dumps(call(u"add", [1, 2], None)))
+        self.assertEqual("", response.body)
+
+    @gen_test
+    def test_batch(self):
+        response = yield self.request(self.dumps([
+            call(u"add", [1, 2], 1), call(u"add", [1, 2], None),
+            call(u"missing", [], 2), call(u"private", [], 3),
+            call(u"numbers", [20], 4)]))
+        responses = self.check_response(response)
+        self.assertEqual(4, len(responses))
+        by_id = dict((entry[u"id"], entry) for entry in responses)
+        self.assertEqual(3, by_id[1][u"result"])
+        self.assertEqual(-32601, by_id[2][u"error"][u"code"])
+        self.assertEqual(-32601, by_id[3][u"error"][u"code"])
+        self.assertEqual([i * 0.5 for i in range(20)], by_id[4][u"result"])
+
+    @gen_test
+    def test_bytes(self):
+        response = yield self.request(
+            self.dumps(call(u"echo", ["\x00\x01\xff"])))
+        self.assertEqual("\x00\x01\xff", self.check_response(response)[
+            u"result"])
+        response = yield self.request(self.dumps(call(u"blob", [])))
+        self.assertEqual("\x00\xff", self.check_response(response)[
+            u"result"])
+
+    @gen_test
+    def test_faults(self):
+        response = yield self.request("\xc1 not valid")
+        error = self.check_response(response)[u"error"]
+        self.assertEqual(-32700, error[u"code"])
+        response = yield self.request(
+            self.dumps(call(u"internal_error", [])))
+        error = self.check_response(response)[u"error"]
+        self.assertEqual(-32603, error[u"code"])
+        self.assertTrue(isinstance(error[u"message"], unicode))
+
+    @gen_test
+    def test_negotiation(self):
+        response = yield self.request(
+            json.dumps(call(u"add", [1, 2])), "application/json")
+        self.assertEqual(3, json.loads(response.body)["result"])
+        # The handler's own encoding without a known Content-Type
+        response = yield self.request(
+            self.dumps(call(u"add", [1, 2])), "text/plain")
+        self.assertEqual(3, self.check_response(response)[u"result"])
+
+
+@unittest.skipIf(msgpack is None, "msgpack is not installed")
+class MsgPackTests(BinaryTests):
+
+    path = "/msgpack"
+    content_type = "application/msgpack"
+
+    def dumps(self, value):
+        return msgpack.packb(value, use_bin_type=True)
+
+    def loads(self, data):
+        return msgpack.unpackb(data, raw=False)
+
+    def test_array_headers(self):
+        codec = MsgPackCodec()
+        # fixarray, array 16 and array 32
+        for size in (3, 300, 70000):
+            items = [codec.dumps(i) for i in range(size)]
+            self.assertEqual(
+                range(size), self.loads(codec.encode_array(items)))
+
+    @unittest.skipIf(cbor2 is None, "cbor2 is not installed")
+    @gen_test
+    def test_other_encoding(self):
+        response = yield self.request(
+            cbor2.dumps(call(u"add", [1, 2])), "application/cbor")
+        self.assertEqual(
+            "application/cbor", response.headers["Content-Type"])
+        self.assertEqual(3, cbor2.loads(response.body)[u"result"])
+
+
+@unittest.skipIf(cbor2 is None, "cbor2 is not installed")
+class CBORTests(BinaryTests):
+
+    path = "/cbor"
+    content_type = "application/cbor"
+
+    def dumps(self, value):
+        return cbor2.dumps(value)
+
+    def loads(self, data):
+        return cbor2.loads(data)
+
+    @gen_test
+    def test_streamed_batch(self):
+        response = yield self.request(self.dumps([
+            call(u"add", [i, i], i) for i in range(30)]))
+        self.assertEqual("\x9f", response.body[0])
+        responses = self.check_response(response)
+        self.assertEqual(range(0, 60, 2),
+                         [entry[u"result"] for entry in responses])
+
+
+del BinaryTests
@@ -0,0 +1,288 @@
+import functools
+import json
+import socket
+import time
+import unittest
+import xmlrpclib
+from tornado import gen
+from tornado.ioloop import IOLoop
+from tornado.iostream import IOStream
+from tornado.testing import AsyncHTTPTestCase, gen_test
+import tornado.web
+from tornadorpc import async, cached, cached_response
+from tornadorpc.cache import ResultCache, MISSING
+from tornadorpc.json import JSONRPCHandler, JSONRPCParser, JSONCodec
+from tornadorpc.xml import XMLRPCHandler
+
+from tests.helpers import RPCRequests, json_call
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class ResultCacheTests(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        cache = ResultCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        self.assertEqual(1, cache.get("a"))
+        cache.set("c", 3)
+        self.assertEqual(MISSING, cache.get("b"))
+        self.assertEqual(1, cache.get("a"))
+        self.assertEqual(3, cache.get("c"))
+        self.assertEqual(1, cache.evictions)
+
+    def test_ttl(self):
+        clock = Clock()
+        cache = ResultCache(ttl=10, clock=clock)
+        cache.set("a", 1)
+        clock.now = 9
+        self.assertEqual(1, cache.get("a"))
+        clock.now = 10
+        self.assertEqual(MISSING, cache.get("a"))
+        stats = cache.stats()
+        self.assertEqual((1, 1, 0), (stats["hits"], stats["misses"],
+                                     stats["size"]))
+
+    def test_make_key(self):
+        cache = ResultCache()
+        self.assertEqual(
+            cache.make_key("m", {"a": [1, {"b": 2}]}, ()),
+            cache.make_key("m", {"a": (1, {"b": 2})}, []))
+        self.assertNotEqual(
+            cache.make_key("m", {"a": 1}, ()),
+            cache.make_key("n", {"a": 1}, ()))
+        self.assertEqual(None, cache.make_key("m", {"a": set()}, ()))
+
+    def test_numbers_keep_their_type(self):
+        cache = ResultCache()
+        key = lambda value: cache.make_key("m", {"a": [value]}, ())
+        cache.set(key(1), "int result")
+        self.assertEqual(MISSING, cache.get(key(True)))
+        self.assertEqual(MISSING, cache.get(key(1.0)))
+        self.assertEqual("int result", cache.get(key(1L)))
+
+    def test_coalescing(self):
+        cache = ResultCache()
+        self.assertFalse(cache.join("a", 1))
+        cache.start("a", 1)
+        self.assertTrue(cache.join("a", 2))
+        self.assertEqual([1, 2], cache.finish("a"))
+        self.assertFalse(cache.join("a", 3))
+        self.assertEqual(1, cache.coalesced)
+
+    def test_byte_limit(self):
+        cache = ResultCache(maxsize=None, maxbytes=10)
+        cache.set("a", "xxxx")
+        cache.set("b", "yyyy")
+        self.assertEqual("xxxx", cache.get("a"))
+        cache.set("c", "zzzz")
+        self.assertEqual(MISSING, cache.get("b"))
+        self.assertEqual(8, cache.bytes)
+        # Larger than the whole cache
+        cache.set("d", "x" * 11)
+        self.assertEqual(MISSING, cache.get("d"))
+        self.assertEqual(2, len(cache.entries))
+        cache.set("a", "x")
+        self.assertEqual(5, cache.bytes)
+
+
+class CachedHandler(JSONRPCHandler):
+
+    calls = 0
+
+    @cached(maxsize=2)
+    def lookup(self, key, suffix="!"):
+        CachedHandler.calls += 1
+        return key + suffix
+
+    @cached
+    def echo(self, value):
+        CachedHandler.calls += 1
+        return value
+
+    @cached
+    @async
+    def slow_lookup(self, key):
+        CachedHandler.calls += 1
+        IOLoop.current().add_timeout(
+            time.time() + 0.02, lambda: self.result(key.upper()))
+
+    @cached
+    @async
+    def stuck(self, key):
+        # The first run never answers
+        CachedHandler.calls += 1
+        if CachedHandler.calls > 1:
+            self.result(key)
+
+    @cached
+    def broken(self):
+        CachedHandler.calls += 1
+        raise ValueError("Not cached")
+
+    @cached_response(maxbytes=40)
+    def document(self, size):
+        CachedHandler.calls += 1
+        return {"data": "x" * size}
+
+    @cached_response
+    def wrapped(self, value):
+        CachedHandler.calls += 1
+        return {"value": value}
+
+    @cached_response
+    def unserializable(self):
+        return float("nan")
+
+
+class CachedXMLHandler(CachedHandler):
+    # The same methods (and caches), in XML-RPC
+    _RPC_ = XMLRPCHandler._RPC_
+
+
+class CachedTests(RPCRequests, AsyncHTTPTestCase):
+
+    def get_app(self):
+        CachedHandler.calls = 0
+        for name in ("lookup", "echo", "slow_lookup", "stuck", "broken"):
+            getattr(CachedHandler, name).cache.clear()
+        CachedHandler.document.response_cache.clear()
+        CachedHandler.wrapped.response_cache.clear()
+        return tornado.web.Application([
+            ("/", CachedHandler), ("/RPC2", CachedXMLHandler)])
+
+    def call(self, *calls):
+        return [r.get("result", r.get("error")) for r in
+                self.fetch_batch(calls)]
+
+    def test_cached_results(self):
+        self.assertEqual(["a!", "a!", "a!"], self.call(
+            ("lookup", ["a"]), ("lookup", {"key": "a"}),
+            ("lookup", ["a", "!"])))
+        self.assertEqual(1, CachedHandler.calls)
+        self.call(("lookup", ["b"]), ("lookup", ["c"]), ("lookup", ["a"]))
+        self.assertEqual(4, CachedHandler.calls)
+        stats = CachedHandler.lookup.cache.stats()
+        self.assertEqual((2, 4, 2), (stats["hits"], stats["misses"],
+                                     stats["evictions"]))
+
+    def test_equal_values_of_other_types(self):
+        results = self.call(
+            ("echo", [1]), ("echo", [True]), ("echo", [1.0]))
+        self.assertEqual([int, bool, float], map(type, results))
+        self.assertEqual(3, CachedHandler.calls)
+
+    def test_concurrent_calls_coalesced(self):
+        self.assertEqual(["A", "A", "B"], self.call(
+            ("slow_lookup", ["a"]), ("slow_lookup", ["a"]),
+            ("slow_lookup", ["b"])))
+        self.assertEqual(2, CachedHandler.calls)
+        self.assertEqual(1, CachedHandler.slow_lookup.cache.coalesced)
+
+    @gen.coroutine
+    def wait_calls(self, count):
+        while CachedHandler.calls < count:
+            yield gen.Task(IOLoop.current().add_callback)
+
+    @gen_test
+    def test_leader_timed_out(self):
+        leader = self.request(json_call("stuck", ["a"]),
+                              **{"X-RPC-Timeout": "0.02"})
+        yield self.wait_calls(1)
+        waiter = self.request(json_call("stuck", ["a"]))
+        response = yield leader
+        self.assertEqual(-32002, json.loads(response.body)["error"]["code"])
+        # Run again for the call still waiting
+        response = yield waiter
+        self.assertEqual("a", json.loads(response.body)["result"])
+        self.assertEqual(2, CachedHandler.calls)
+        self.assertEqual({}, CachedHandler.stuck.cache.in_flight)
+
+    @gen_test
+    def test_leader_gone(self):
+        stream = IOStream(socket.socket())
+        yield gen.Task(stream.connect, ("127.0.0.1", self.get_http_port()))
+        body = json.dumps(json_call("stuck", ["a"]))
+        stream.write(
+            "POST / HTTP/1.1\r\nHost: localhost\r\n"
+            "Content-Length: %d\r\n\r\n%s" % (len(body), body))
+        yield self.wait_calls(1)
+        waiter = self.request(json_call("stuck", ["a"]))
+        while not CachedHandler.stuck.cache.coalesced:
+            yield gen.Task(IOLoop.current().add_callback)
+        stream.close()
+        response = yield waiter
+        self.assertEqual("a", json.loads(response.body)["result"])
+        self.assertEqual(2, CachedHandler.calls)
+
+    def test_cached_response(self):
+        body = json.dumps([
+            {"jsonrpc": "2.0", "method": "document", "params": [5], "id": 1},
+            {"method": "document", "params": [5], "id": "two"},
+            {"jsonrpc": "2.0", "method": "document", "params": [5]},
+        ])
+        response = self.fetch("/", method="POST", body=body)
+        self.assertEqual([
+            {"jsonrpc": "2.0", "id": 1, "result": {"data": "xxxxx"}},
+            {"id": "two", "result": {"data": "xxxxx"}, "error": None},
+        ], json.loads(response.body))
+        self.assertEqual(1, CachedHandler.calls)
+        cache = CachedHandler.document.response_cache
+        self.assertEqual((2, len('{"data": "xxxxx"}')),
+                         (cache.hits, cache.bytes))
+        # Too big to keep, and evicts nothing
+        self.assertEqual([{"data": "x" * 50}],
+                         self.call(("document", [50])))
+        self.assertEqual(1, len(cache.entries))
+        self.call(("document", [6]), ("document", [7]))
+        self.assertEqual((2, 1), (len(cache.entries), cache.evictions))
+
+    def test_cached_response_of_other_types(self):
+        results = self.call(("wrapped", [1]), ("wrapped", [True]),
+                            ("wrapped", [1.0]), ("wrapped", [1]))
+        # 1 == True == 1.0 in Python, so compare the types too
+        self.assertEqual([int, bool, float, int],
+                         [type(result["value"]) for result in results])
+        self.assertEqual(3, CachedHandler.calls)
+
+    def xml_call(self, method, *params):
+        response = self.fetch("/RPC2", method="POST", body=xmlrpclib.dumps(
+            params, methodname=method))
+        return xmlrpclib.loads(response.body)[0][0]
+
+    def test_cached_response_per_protocol(self):
+        self.assertEqual([{"value": 2}], self.call(("wrapped", [2])))
+        self.assertEqual({"value": 2}, self.xml_call("wrapped", 2))
+        self.assertEqual({"value": 2}, self.xml_call("wrapped", 2))
+        self.assertEqual([{"value": 2}], self.call(("wrapped", [2])))
+        self.assertEqual(2, CachedHandler.calls)
+
+    def test_cached_xml_unicode(self):
+        for i in range(2):
+            self.assertEqual({"value": u"caf\xe9"},
+                             self.xml_call("wrapped", u"caf\xe9"))
+        self.assertEqual(1, CachedHandler.calls)
+        self.assertEqual(1, len(CachedHandler.wrapped.response_cache.entries))
+
+    def test_cached_response_unserializable(self):
+        CachedHandler._RPC_ = JSONRPCParser(JSONCodec(
+            functools.partial(json.dumps, allow_nan=False)))
+        try:
+            result = self.call(("unserializable", []))[0]
+        finally:
+            del CachedHandler._RPC_
+        self.assertEqual(-32603, result["code"])
+        self.assertEqual(0, CachedHandler.unserializable.response_cache.bytes)
+
+    def test_faults_not_cached(self):
+        for i in range(2):
+            self.assertEqual(-32603, self.call(("broken", []))[0]["code"])
+        self.assertEqual(2, CachedHandler.calls)
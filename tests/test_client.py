@@ -0,0 +1,219 @@
+import time
+import xmlrpclib
+from tornado import gen
+from tornado.httpclient import HTTPError
+from tornado.ioloop import IOLoop
+from tornado.testing import AsyncHTTPTestCase, gen_test
+import tornado.web
+from tornadorpc import async
+from tornadorpc.client import JSONRPCClient, XMLRPCClient
+from tornadorpc.json import JSONRPCHandler
+from tornadorpc.xml import XMLRPCHandler
+
+from tests.helpers import TestHandler
+
+
+class ClientTestHandler(TestHandler):
+
+    notified = []
+    requests = 0
+
+    def prepare(self):
+        ClientTestHandler.requests += 1
+
+    def subtract(self, x, y=0):
+        return x - y
+
+    def notice(self, message):
+        ClientTestHandler.notified.append(message)
+
+    @async
+    def sleep(self, delay):
+        IOLoop.current().add_timeout(
+            time.time() + delay, lambda: self.result(delay))
+
+
+class JSONClientHandler(ClientTestHandler, JSONRPCHandler):
+    pass
+
+
+class XMLClientHandler(ClientTestHandler, XMLRPCHandler):
+    pass
+
+
+class ClientTests(AsyncHTTPTestCase):
+
+    def get_app(self):
+        return tornado.web.Application([
+            ("/JSON", JSONClientHandler),
+            ("/RPC2", XMLClientHandler),
+        ])
+
+    def setUp(self):
+        super(ClientTests, self).setUp()
+        self.json = JSONRPCClient(self.get_url("/JSON"))
+        self.xml = XMLRPCClient(self.get_url("/RPC2"))
+        ClientTestHandler.notified = []
+        ClientTestHandler.requests = 0
+
+    def tearDown(self):
+        self.json.close()
+        self.xml.close()
+        super(ClientTests, self).tearDown()
+
+    @gen_test
+    def test_calls(self):
+        for client in (self.json, self.xml):
+            result = yield client.add(5, 6)
+            self.assertEqual(11, result)
+            result = yield client.tree.power(2, 6)
+            self.assertEqual(64, result)
+            result = yield client.call("subtract", [5, 6])
+            self.assertEqual(-1, result)
+        result = yield self.json.subtract(y=6, x=5)
+        self.assertEqual(-1, result)
+        result = yield JSONRPCClient(
+            self.get_url("/JSON"), version=1.0).add(1, 2)
+        self.assertEqual(3, result)
+
+    @gen_test
+    def test_faults(self):
+        for client in (self.json, self.xml):
+            try:
+                yield client.private()
+                self.fail("The fault should have been raised.")
+            except xmlrpclib.Fault, fault:
+                self.assertEqual(-32601, fault.faultCode)
+        self.assertRaises(TypeError, self.json.add, 1, y=2)
+        try:
+            yield self.xml.subtract(x=1, y=2)
+            self.fail("TypeError should have been raised.")
+        except TypeError:
+            pass
+
+    @gen_test
+    def test_concurrent_calls(self):
+        start = time.time()
+        results = yield [self.json.sleep(0.05) for i in range(5)]
+        self.assertEqual([0.05] * 5, results)
+        self.assertTrue(time.time() - start < 0.2)
+
+    @gen_test
+    def test_timeout(self):
+        for client in (self.json, self.xml):
+            try:
+                yield client.with_timeout(0.05).sleep(0.5)
+                self.fail("HTTPError should have been raised.")
+            except HTTPError, error:
+                self.assertEqual(599, error.code)
+
+    @gen_test
+    def test_notify(self):
+        yield self.json.notify("notice", ["Sent"])
+        self.assertEqual(["Sent"], ClientTestHandler.notified)
+
+    @gen_test
+    def test_batch(self):
+        batch = self.json.batch()
+        first = batch.add(1, 2)
+        batch.notify("notice", ["Batched"])
+        second = batch.tree.power(2, 3)
+        third = batch.private()
+        self.assertEqual(4, len(batch))
+        results = yield batch.send()
+        self.assertEqual([3, 8], results[:2])
+        self.assertEqual(-32601, results[2].faultCode)
+        self.assertEqual(3, first.result())
+        self.assertEqual(8, second.result())
+        self.assertRaises(xmlrpclib.Fault, third.result)
+        self.assertEqual(["Batched"], ClientTestHandler.notified)
+        self.assertEqual(0, len(batch))
+
+    @gen_test
+    def test_multicall(self):
+        multicall = self.xml.multicall()
+        first = multicall.add(1, 2)
+        multicall.tree.power(2, 3)
+        multicall.private()
+        results = yield multicall.send()
+        self.assertEqual([3, 8], results[:2])
+        self.assertEqual(-32601, results[2].faultCode)
+        self.assertEqual(3, first.result())
+
+
+class CoalescingTests(AsyncHTTPTestCase):
+
+    def get_app(self):
+        return tornado.web.Application([
+            ("/JSON", JSONClientHandler),
+            ("/RPC2", XMLClientHandler),
+        ])
+
+    def setUp(self):
+        super(CoalescingTests, self).setUp()
+        ClientTestHandler.requests = 0
+        self.clients = []
+
+    def tearDown(self):
+        for client in self.clients:
+            client.close()
+        super(CoalescingTests, self).tearDown()
+
+    def get_clients(self, **kwargs):
+        clients = [
+            JSONRPCClient(self.get_url("/JSON"), coalesce=True, **kwargs),
+            XMLRPCClient(self.get_url("/RPC2"), coalesce=True, **kwargs)]
+        self.clients.extend(clients)
+        return clients
+
+    @gen_test
+    def test_same_iteration(self):
+        for client in self.get_clients():
+            ClientTestHandler.requests = 0
+            futures = [client.add(i, i) for i in range(20)]
+            futures.append(client.tree.power(2, 6))
+            private = client.private()
+            results = yield futures
+            self.assertEqual([i * 2 for i in range(20)] + [64], results)
+            try:
+                yield private
+                self.fail("The fault should have been raised.")
+            except xmlrpclib.Fault, fault:
+                self.assertEqual(-32601, fault.faultCode)
+            self.assertEqual(1, ClientTestHandler.requests)
+            self.assertEqual(1, client.coalescer.batches)
+
+    @gen_test
+    def test_limits(self):
+        for client in self.get_clients(max_calls=5):
+            results = yield [client.add(i, i) for i in range(12)]
+            self.assertEqual([i * 2 for i in range(12)], results)
+            self.assertEqual(3, client.coalescer.batches)
+        for client in self.get_clients(max_bytes=1):
+            yield [client.add(i, i) for i in range(3)]
+            self.assertEqual(3, client.coalescer.batches)
+
+    @gen_test
+    def test_window(self):
+        for client in self.get_clients(window=0.05):
+            first = client.add(1, 2)
+            yield gen.Task(IOLoop.current().add_timeout, time.time() + 0.01)
+            second = client.add(3, 4)
+            # Sent on its own
+            third = yield client.with_timeout(5).add(5, 6)
+            self.assertEqual([3, 7, 11], [(yield first), (yield second),
+                                          third])
+            self.assertEqual(1, client.coalescer.batches)
+
+    @gen_test
+    def test_http_error(self):
+        client = JSONRPCClient(
+            self.get_url("/missing"), coalesce=True)
+        self.clients.append(client)
+        futures = [client.add(1, 2), client.add(3, 4)]
+        for future in futures:
+            try:
+                yield future
+                self.fail("HTTPError should have been raised.")
+            except HTTPError, error:
+                self.assertEqual(404, error.code)
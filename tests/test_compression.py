@@ -0,0 +1,179 @@
+import gzip
+import json
+import unittest
+import xmlrpclib
+import zlib
+from cStringIO import StringIO
+from tornado.httpclient import HTTPError
+from tornado.testing import AsyncHTTPTestCase, gen_test
+import tornado.web
+from tornadorpc import compression, config
+from tornadorpc.json import JSONRPCHandler
+from tornadorpc.xml import StreamingXMLRPCHandler
+
+from tests.helpers import RPCRequests, TestHandler, json_call
+
+
+class CompressionTestHandler(TestHandler):
+
+    def repeat(self, text, count):
+        return text * count
+
+
+class JSONCompressionHandler(CompressionTestHandler, JSONRPCHandler):
+    compress_chunk_size = 100
+
+
+class StreamedCompressionHandler(CompressionTestHandler, JSONRPCHandler):
+    stream_batches = "ordered"
+
+
+class XMLCompressionHandler(CompressionTestHandler, StreamingXMLRPCHandler):
+    pass
+
+
+def gzipped(data):
+    buf = StringIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb") as gzip_file:
+        gzip_file.write(data)
+    return buf.getvalue()
+
+
+class CompressionTests(RPCRequests, AsyncHTTPTestCase):
+
+    def get_app(self):
+        return tornado.web.Application([
+            ("/", JSONCompressionHandler),
+            ("/streamed", StreamedCompressionHandler),
+            ("/RPC2", XMLCompressionHandler),
+        ])
+
+    def setUp(self):
+        super(CompressionTests, self).setUp()
+        config.compress = True
+
+    def tearDown(self):
+        config.compress = False
+        config.compress_encodings = ("zstd", "br", "gzip", "deflate")
+        super(CompressionTests, self).tearDown()
+
+    @gen_test
+    def test_compressed_response(self):
+        config.compress_encodings = ("gzip", "deflate")
+        response = yield self.request(
+            json_call("repeat", ["abc", 2000]), **{"Accept-Encoding": "gzip"})
+        self.assertEqual("gzip", response.headers["Content-Encoding"])
+        self.assertEqual("Accept-Encoding", response.headers["Vary"])
+        body = zlib.decompress(response.body, 16 + zlib.MAX_WBITS)
+        self.assertEqual("abc" * 2000, json.loads(body)["result"])
+        self.assertTrue(len(response.body) < len(body) / 10)
+        response = yield self.request(
+            json_call("repeat", ["abc", 2000]),
+            **{"Accept-Encoding": "gzip;q=0.5, deflate"})
+        self.assertEqual("deflate", response.headers["Content-Encoding"])
+        body = zlib.decompress(response.body)
+        self.assertEqual("abc" * 2000, json.loads(body)["result"])
+
+    @gen_test
+    def test_not_compressed(self):
+        # Too small
+        response = yield self.request(
+            json_call("repeat", ["abc", 2]), **{"Accept-Encoding": "gzip"})
+        self.assertFalse("Content-Encoding" in response.headers)
+        self.assertEqual("abcabc", json.loads(response.body)["result"])
+        # Not accepted
+        response = yield self.request(json_call("repeat", ["abc", 2000]))
+        self.assertFalse("Content-Encoding" in response.headers)
+        response = yield self.request(
+            json_call("repeat", ["abc", 2000]),
+            **{"Accept-Encoding": "gzip;q=0, compress"})
+        self.assertFalse("Content-Encoding" in response.headers)
+        config.compress = False
+        response = yield self.request(
+            json_call("repeat", ["abc", 2000]), **{"Accept-Encoding": "gzip"})
+        self.assertFalse("Content-Encoding" in response.headers)
+
+    @gen_test
+    def test_streamed_batch(self):
+        config.compress_encodings = ("gzip",)
+        response = yield self.request(
+            [json_call("repeat", ["x", i], i) for i in range(3)],
+            "/streamed", **{"Accept-Encoding": "gzip"})
+        self.assertEqual("gzip", response.headers["Content-Encoding"])
+        body = zlib.decompress(response.body, 16 + zlib.MAX_WBITS)
+        results = [entry["result"] for entry in json.loads(body)]
+        self.assertEqual(["", "x", "xx"], results)
+
+    @gen_test
+    def test_compressed_request(self):
+        body = json.dumps(json_call("add", [1, 2]))
+        response = yield self.request(
+            gzipped(body), **{"Content-Encoding": "gzip"})
+        self.assertEqual(3, json.loads(response.body)["result"])
+        response = yield self.request(
+            zlib.compress(body), **{"Content-Encoding": "deflate"})
+        self.assertEqual(3, json.loads(response.body)["result"])
+        for encoding, code in (("compress", 415), ("gzip", 400)):
+            try:
+                yield self.request(body, **{"Content-Encoding": encoding})
+            except HTTPError as error:
+                self.assertEqual(code, error.code)
+            else:
+                self.fail("No error for a bad %s body." % encoding)
+
+    @gen_test
+    def test_streaming_xml_request(self):
+        body = xmlrpclib.dumps((1, 2), methodname="add")
+        response = yield self.request(
+            gzipped(body), "/RPC2", **{"Content-Encoding": "gzip"})
+        self.assertEqual(((3,), None), xmlrpclib.loads(response.body))
+
+
+class CodecTests(unittest.TestCase):
+
+    def test_negotiate(self):
+        encodings = ("gzip", "deflate")
+        negotiate = compression.negotiate
+        self.assertEqual("gzip", negotiate("gzip, deflate", encodings))
+        self.assertEqual("deflate", negotiate("deflate", encodings))
+        self.assertEqual(
+            "deflate", negotiate("gzip;q=0.1, deflate;q=0.5", encodings))
+        self.assertEqual("gzip", negotiate("*", encodings))
+        self.assertEqual(None, negotiate("*;q=0", encodings))
+        self.assertEqual(None, negotiate("identity", encodings))
+        self.assertEqual(None, negotiate("", encodings))
+        self.assertEqual(None, negotiate(None, encodings))
+
+    def test_decompress(self):
+        data = "abc" * 1000
+        self.assertEqual(data, compression.decompress("gzip", gzipped(data)))
+        self.assertEqual(
+            data, compression.decompress("deflate", zlib.compress(data)))
+        raw = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+        raw_data = raw.compress(data) + raw.flush()
+        self.assertEqual(data, compression.decompress("deflate", raw_data))
+        self.assertRaises(
+            ValueError, compression.decompress, "gzip", gzipped(data), 100)
+        self.assertRaises(ValueError, compression.decompress, "gzip", data)
+        self.assertRaises(ValueError, compression.decompress, "lzma", data)
+
+    def test_unbounded_encodings(self):
+        for encoding in compression.available():
+            if encoding in compression.BOUNDED:
+                compression.decompressor(encoding, 100)
+                continue
+            # zstd and br can only be decompressed without a limit
+            self.assertRaises(
+                ValueError, compression.decompressor, encoding, 100)
+            compression.decompressor(encoding)
+
+    def test_streaming(self):
+        compressor = compression.compressor("gzip", 1)
+        decompressor = compression.decompressor("gzip")
+        output = []
+        for chunk in ("abc", "def", "ghi"):
+            # Everything so far can be decoded after sync
+            output.append(decompressor.decompress(
+                compressor.compress(chunk) + compressor.sync()))
+            self.assertEqual("abcdefghi"[:3 * len(output)], "".join(output))
+        decompressor.decompress(compressor.flush())
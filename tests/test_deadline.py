@@ -0,0 +1,197 @@
+import json
+import time
+import xmlrpclib
+from tornado import gen
+from tornado.concurrent import Future
+from tornado.ioloop import IOLoop
+from tornado.testing import AsyncHTTPTestCase, gen_test
+import tornado.web
+from tornadorpc import async, config, deadline, limit
+from tornadorpc.json import JSONRPCHandler
+from tornadorpc.xml import XMLRPCHandler
+
+from tests.helpers import RPCRequests, TestHandler, json_call
+
+TIMEOUT = -32002
+
+
+class CancellableFuture(Future):
+
+    cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+        return True
+
+
+class DeadlineTestHandler(TestHandler):
+
+    futures = []
+
+    @async
+    def sleep(self, delay):
+        IOLoop.current().add_timeout(
+            time.time() + delay, lambda: self.result(delay))
+
+    @deadline(0.02)
+    @async
+    def hang(self):
+        pass
+
+    @deadline(0.02)
+    @async
+    def late(self):
+        # Answers after its deadline
+        IOLoop.current().add_timeout(
+            time.time() + 0.04, lambda: self.result("late"))
+
+    @deadline(0.02)
+    def pending(self):
+        future = CancellableFuture()
+        DeadlineTestHandler.futures.append(future)
+        return future
+
+    @limit(max_in_flight=1)
+    @deadline(0.05)
+    @async
+    def limited(self, delay):
+        IOLoop.current().add_timeout(
+            time.time() + delay, lambda: self.result(delay))
+
+    @limit(max_in_flight=1)
+    @deadline(0.02)
+    @async
+    def never(self):
+        pass
+
+
+class JSONDeadlineHandler(DeadlineTestHandler, JSONRPCHandler):
+    pass
+
+
+class XMLDeadlineHandler(DeadlineTestHandler, XMLRPCHandler):
+    pass
+
+
+class DeadlineTests(RPCRequests, AsyncHTTPTestCase):
+
+    path = "/JSON"
+
+    def get_app(self):
+        return tornado.web.Application([
+            ("/JSON", JSONDeadlineHandler),
+            ("/RPC2", XMLDeadlineHandler),
+        ])
+
+    def setUp(self):
+        super(DeadlineTests, self).setUp()
+        DeadlineTestHandler.futures = []
+
+    @gen_test
+    def test_method_deadline(self):
+        start = time.time()
+        response = yield self.request(json_call("hang"))
+        self.assertEqual(TIMEOUT, json.loads(response.body)["error"]["code"])
+        self.assertTrue(time.time() - start < 1)
+        response = yield self.request(json_call("pending"))
+        self.assertEqual(TIMEOUT, json.loads(response.body)["error"]["code"])
+        self.assertTrue(DeadlineTestHandler.futures[0].cancelled)
+
+    @gen_test
+    def test_late_result(self):
+        response = yield self.request([
+            json_call("late", [], 1), json_call("late", [], 2)])
+        for entry in json.loads(response.body):
+            self.assertEqual(TIMEOUT, entry["error"]["code"])
+        response = yield self.request(json_call("late"))
+        self.assertEqual(TIMEOUT, json.loads(response.body)["error"]["code"])
+        # Let the late results arrive -- they are dropped
+        yield self.request(json_call("sleep", [0.05]))
+
+    @gen_test
+    def test_limit_kept_until_done(self):
+        limited = DeadlineTestHandler.limited.im_func.limit
+        for request in (json_call("limited", [0.08]),
+                        [json_call("limited", [0.08], 1)]):
+            response = yield self.request(request)
+            entry = json.loads(response.body)
+            if isinstance(entry, list):
+                entry = entry[0]
+            self.assertEqual(TIMEOUT, entry["error"]["code"])
+            self.assertEqual(1, limited.running)
+            # Still running, so there is no room for another call
+            response = yield self.request(json_call("limited", [0]))
+            self.assertEqual(
+                -32003, json.loads(response.body)["error"]["code"])
+            while limited.running:
+                yield gen.Task(IOLoop.current().add_callback)
+            response = yield self.request(json_call("limited", [0]))
+            self.assertEqual(0, json.loads(response.body)["result"])
+
+    @gen_test
+    def test_limit_released_if_never_done(self):
+        never = DeadlineTestHandler.never.im_func.limit
+        response = yield self.request(json_call("never"))
+        self.assertEqual(TIMEOUT, json.loads(response.body)["error"]["code"])
+        self.assertEqual(1, never.running)
+        start = time.time()
+        while never.running:
+            yield gen.Task(IOLoop.current().add_callback)
+        # Held for at most the deadline again
+        self.assertTrue(time.time() - start < 0.04)
+        response = yield self.request(json_call("never"))
+        self.assertEqual(TIMEOUT, json.loads(response.body)["error"]["code"])
+
+    @gen_test
+    def test_request_deadline(self):
+        start = time.time()
+        response = yield self.request([
+            json_call("add", [1, 2], 1), json_call("sleep", [1], 2),
+            json_call("sleep", [0.01], 3)], **{"X-RPC-Timeout": "0.05"})
+        self.assertTrue(time.time() - start < 0.5)
+        responses = json.loads(response.body)
+        self.assertEqual(3, responses[0]["result"])
+        self.assertEqual(TIMEOUT, responses[1]["error"]["code"])
+        self.assertEqual(0.01, responses[2]["result"])
+        # Ignored unless it is a number of seconds
+        response = yield self.request(
+            json_call("add", [1, 2]), **{"X-RPC-Timeout": "soon"})
+        self.assertEqual(3, json.loads(response.body)["result"])
+
+    @gen_test
+    def test_call_timeout(self):
+        response = yield self.request([
+            json_call("sleep", [1], 1, timeout=0.02),
+            json_call("sleep", [0.01], 2, timeout=1),
+            json_call("pending", [], 3, timeout=5)])
+        responses = json.loads(response.body)
+        self.assertEqual(TIMEOUT, responses[0]["error"]["code"])
+        self.assertEqual(0.01, responses[1]["result"])
+        # The method's deadline is sooner
+        self.assertEqual(TIMEOUT, responses[2]["error"]["code"])
+
+    @gen_test
+    def test_batch_concurrency(self):
+        config.batch_concurrency = 1
+        try:
+            response = yield self.request([
+                json_call("sleep", [1], 1), json_call("add", [1, 2], 2)],
+                **{"X-RPC-Timeout": "0.02"})
+        finally:
+            config.batch_concurrency = None
+        responses = json.loads(response.body)
+        # The second call was never started
+        self.assertEqual(TIMEOUT, responses[0]["error"]["code"])
+        self.assertEqual(TIMEOUT, responses[1]["error"]["code"])
+
+    @gen_test
+    def test_xml(self):
+        response = yield self.request(
+            xmlrpclib.dumps((1,), methodname="sleep"), "/RPC2",
+            **{"X-RPC-Timeout": "0.02"})
+        try:
+            xmlrpclib.loads(response.body)
+        except xmlrpclib.Fault as fault:
+            self.assertEqual(TIMEOUT, fault.faultCode)
+        else:
+            self.fail("The call didn't time out.")
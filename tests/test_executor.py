@@ -0,0 +1,50 @@
+from concurrent import futures
+import os
+import threading
+import time
+from tornado.testing import AsyncHTTPTestCase
+import tornado.web
+from tornadorpc import executor, register_executor
+from tornadorpc.json import JSONRPCHandler
+
+from tests.helpers import RPCRequests
+
+
+class ExecutorHandler(JSONRPCHandler):
+
+    @executor
+    def thread_name(self):
+        return threading.current_thread().name
+
+    @executor(pool="single")
+    def slow(self, delay):
+        time.sleep(delay)
+        return delay
+
+    @executor(pool="processes")
+    def pid(self):
+        return os.getpid()
+
+
+class ExecutorTests(RPCRequests, AsyncHTTPTestCase):
+
+    def get_app(self):
+        register_executor("single", futures.ThreadPoolExecutor(1), 1)
+        register_executor("processes", futures.ProcessPoolExecutor(1))
+        return tornado.web.Application([("/", ExecutorHandler)])
+
+    def test_thread_pool(self):
+        result = self.fetch_batch([("thread_name", [])])[0]["result"]
+        self.assertNotEqual(threading.current_thread().name, result)
+
+    def test_process_pool(self):
+        result = self.fetch_batch([("pid", [])])[0]["result"]
+        self.assertNotEqual(os.getpid(), result)
+
+    def test_pool_saturated(self):
+        results = self.fetch_batch([("slow", [0.05]), ("slow", [0.05])])
+        self.assertEqual(0.05, results[0]["result"])
+        self.assertEqual(-32001, results[1]["error"]["code"])
+        # The slot is released once the first call is done
+        results = self.fetch_batch([("slow", [0.01])])
+        self.assertEqual(0.01, results[0]["result"])
@@ -1,6 +1,10 @@
 from tests.helpers import TestHandler, RPCTests
-from tornadorpc.json import JSONRPCHandler
+from tornadorpc import cached_response
+from tornadorpc.json import JSONRPCHandler, JSONRPCParser, JSONCodec
+from tornado.testing import AsyncHTTPTestCase
+import json
 import jsonrpclib
+import tornado.web
 import unittest
 
 
@@ -33,3 +37,100 @@ class JSONRPCTests(RPCTests, unittest.TestCase):
             client.order(c=10), {'a': 1, 'b': 2, 'c': 10})
         self.assertEqual(
             client.order(a=10, b=11, c=12), {'a': 10, 'b': 11, 'c': 12})
+
+
+class JSONCodecTestHandler(JSONTestHandler):
+
+    _RPC_ = JSONRPCParser(JSONCodec())
+
+
+class JSONCodecRPCTests(AsyncHTTPTestCase):
+
+    def get_app(self):
+        return tornado.web.Application([("/", JSONCodecTestHandler)])
+
+    def call(self, body):
+        response = self.fetch("/", method="POST", body=json.dumps(body))
+        return json.loads(response.body)
+
+    def test_call(self):
+        self.assertEqual(
+            {"jsonrpc": "2.0", "id": 1, "result": 64},
+            self.call({"jsonrpc": "2.0", "method": "tree.power",
+                       "params": [2, 6], "id": 1}))
+        self.assertEqual(
+            {"id": 2, "result": {"a": 10, "b": 2, "c": 3}, "error": None},
+            self.call({"method": "order", "params": {"a": 10}, "id": 2}))
+
+    def test_batch(self):
+        result = self.call([
+            {"jsonrpc": "2.0", "method": "add", "params": [1, 2], "id": 1},
+            {"jsonrpc": "2.0", "method": "add", "params": [1, 2]},
+            {"jsonrpc": "2.0", "method": "private", "id": 3}])
+        self.assertEqual([1, 3], [r["id"] for r in result])
+        self.assertEqual(3, result[0]["result"])
+        self.assertEqual(-32601, result[1]["error"]["code"])
+
+
+class PlainLibrary(object):
+    # A library with only what the RPC libraries provide
+
+    dumps = staticmethod(jsonrpclib.dumps)
+    loads = staticmethod(jsonrpclib.loads)
+    Fault = jsonrpclib.Fault
+
+
+class PlainLibraryTestHandler(JSONTestHandler):
+
+    _RPC_ = JSONRPCParser(PlainLibrary)
+
+    @cached_response
+    def catalog(self):
+        return {"items": [1, 2]}
+
+
+class PlainLibraryRPCTests(JSONCodecRPCTests):
+
+    def get_app(self):
+        return tornado.web.Application([("/", PlainLibraryTestHandler)])
+
+    def test_cached_response(self):
+        for rpcid in (1, 2):
+            self.assertEqual(
+                {"jsonrpc": "2.0", "id": rpcid,
+                 "result": {"items": [1, 2]}},
+                self.call({"jsonrpc": "2.0", "method": "catalog",
+                           "id": rpcid}))
+
+
+class JSONCodecTests(unittest.TestCase):
+
+    def setUp(self):
+        self.codec = JSONCodec()
+
+    def test_result(self):
+        response = json.loads(self.codec.encode_result([1, "a"], 5, 2.0))
+        self.assertEqual(
+            {"jsonrpc": "2.0", "id": 5, "result": [1, "a"]}, response)
+        response = json.loads(self.codec.encode_result(None, "x", 1.0))
+        self.assertEqual({"id": "x", "result": None, "error": None}, response)
+
+    def test_fault(self):
+        fault = jsonrpclib.Fault(-32601, "Method not found")
+        response = json.loads(self.codec.encode_result(fault, 5, 2.0))
+        self.assertEqual({
+            "jsonrpc": "2.0", "id": 5,
+            "error": {"code": -32601, "message": "Method not found"}
+        }, response)
+        response = json.loads(self.codec.encode_fault(fault, None, 1.0))
+        self.assertEqual(None, response["result"])
+        self.assertEqual(-32601, response["error"]["code"])
+
+    def test_matches_jsonrpclib(self):
+        for version in (1.0, 2.0):
+            self.assertEqual(
+                json.loads(jsonrpclib.jsonrpc.dumps(
+                    {"a": [1, 2.5, None]}, rpcid=7, version=version,
+                    methodresponse=True)),
+                json.loads(self.codec.encode_result(
+                    {"a": [1, 2.5, None]}, 7, version)))
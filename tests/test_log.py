@@ -0,0 +1,148 @@
+import logging
+import Queue
+import threading
+import time
+import unittest
+from tornadorpc import config, log
+
+
+class Capture(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+        self.setFormatter(log.ErrorFormatter(short=True))
+
+    def emit(self, record):
+        self.records.append((record, self.format(record)))
+        self.thread = threading.current_thread()
+
+
+class LogTests(unittest.TestCase):
+
+    def setUp(self):
+        self.capture = Capture()
+        log.start([self.capture])
+
+    def tearDown(self):
+        log.stop()
+        for handler in log.logger.handlers[:]:
+            log.logger.removeHandler(handler)
+        log.logger.propagate = True
+        config.log_rate_limit = None
+        config.verbose = True
+        log.limiter = None
+
+    def fail(self, method_name, params=None, **kwargs):
+        try:
+            raise ValueError("Failed in %s" % method_name)
+        except ValueError:
+            log.log_error(method_name, params, **kwargs)
+
+    def test_structured_record(self):
+        self.fail("add", [1, 2], fault_code=-32603, request_id=5)
+        log.stop()
+        [(record, text)] = self.capture.records
+        self.assertEqual("add", record.rpc_method)
+        self.assertEqual(-32603, record.fault_code)
+        self.assertEqual(5, record.request_id)
+        self.assertEqual(log.params_digest([1, 2]), record.params_digest)
+        self.assertEqual(ValueError, record.exc_info[0])
+        lines = text.splitlines()
+        self.assertEqual(
+            "ERROR IN add - (FAULT: -32603, ID: 5, PARAMS: %s)" %
+            record.params_digest, lines[1])
+        self.assertEqual("ValueError: Failed in add", lines[-1])
+
+    def test_propagation(self):
+        self.assertTrue(log.logger.propagate)
+        log.start([self.capture], propagate=False)
+        self.assertFalse(log.logger.propagate)
+        log.stop()
+        self.assertTrue(log.logger.propagate)
+
+    def test_parent_handlers(self):
+        # As with logging.basicConfig() (or the IOLoop), and no
+        # handlers of our own
+        log.stop()
+        root = logging.getLogger()
+        capture = Capture()
+        root.addHandler(capture)
+        try:
+            self.fail("add", [1, 2])
+            # Through the queue, and not written twice
+            self.assertFalse(log.logger.propagate)
+            log.stop()
+        finally:
+            root.removeHandler(capture)
+        self.assertEqual(["add"], [
+            record.rpc_method for record, text in capture.records])
+        self.assertNotEqual(threading.current_thread(), capture.thread)
+        self.assertEqual([], log.logger.handlers)
+        self.assertTrue(log.logger.propagate)
+
+    def test_not_verbose(self):
+        log.stop()
+        config.verbose = False
+        root = logging.getLogger()
+        capture = Capture()
+        root.addHandler(capture)
+        try:
+            self.fail("add", [1, 2])
+        finally:
+            root.removeHandler(capture)
+        self.assertEqual(None, log.listener)
+        self.assertEqual([], capture.records)
+
+    def test_params_digest(self):
+        digest = log.params_digest
+        self.assertEqual(digest([1, {"a": "b"}]), digest([1, {"a": "b"}]))
+        self.assertNotEqual(digest([1, 2]), digest([1, 3]))
+        self.assertNotEqual(digest(["x" * 5000]), digest(["x" * 5001]))
+        # Only the start of large parameters is used
+        large = [range(1000000), "y" * 10000000]
+        start = time.time()
+        self.assertEqual(digest(large), digest([range(2000)]))
+        self.assertTrue(time.time() - start < 0.5)
+
+    def test_rate_limit(self):
+        config.log_rate_limit = (2, 60)
+        for i in range(5):
+            self.fail("add")
+        self.fail("subtract")
+        log.stop()
+        self.assertEqual(
+            ["add", "add", "subtract"],
+            [record.rpc_method for record, text in self.capture.records])
+
+
+class Clock(object):
+
+    now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class RateLimiterTests(unittest.TestCase):
+
+    def test_window(self):
+        clock = Clock()
+        limiter = log.RateLimiter(2, 10, clock)
+        self.assertEqual([0, 0, None, None],
+                         [limiter.allow("a") for i in range(4)])
+        self.assertEqual(0, limiter.allow("b"))
+        clock.now = 10
+        # Reports how many were dropped
+        self.assertEqual(2, limiter.allow("a"))
+        self.assertEqual(0, limiter.allow("a"))
+
+
+class QueueHandlerTests(unittest.TestCase):
+
+    def test_full_queue(self):
+        handler = log.QueueHandler(Queue.Queue(1))
+        record = logging.makeLogRecord({"msg": "message"})
+        handler.emit(record)
+        handler.emit(record)
+        self.assertEqual(1, handler.dropped)
@@ -0,0 +1,113 @@
+import json
+import time
+import unittest
+from tornado.ioloop import IOLoop
+from tornado.testing import AsyncHTTPTestCase
+import tornado.web
+from tornadorpc import async, config
+from tornadorpc.json import JSONRPCHandler
+from tornadorpc.stats import MemoryStats, StatsHandler, Histogram
+from tornadorpc.stats import BATCH, REQUEST, UNKNOWN
+
+
+class StatsTestHandler(JSONRPCHandler):
+
+    in_flight = 0
+
+    def add(self, x, y):
+        return x + y
+
+    def fail(self):
+        raise ValueError("Failed")
+
+    @async
+    def delayed(self, value):
+        StatsTestHandler.in_flight = config.stats.get("delayed").in_flight
+        IOLoop.current().add_timeout(
+            time.time() + 0.01, lambda: self.result(value))
+
+
+class StatsTests(AsyncHTTPTestCase):
+
+    def setUp(self):
+        config.stats = MemoryStats()
+        super(StatsTests, self).setUp()
+
+    def tearDown(self):
+        config.stats = None
+        super(StatsTests, self).tearDown()
+
+    def get_app(self):
+        return tornado.web.Application([
+            ("/", StatsTestHandler),
+            ("/stats", StatsHandler),
+        ])
+
+    def post(self, body):
+        return self.fetch("/", method="POST", body=json.dumps(body))
+
+    def test_call_stats(self):
+        self.post({"method": "add", "params": [1, 2], "id": 1})
+        self.post([
+            {"jsonrpc": "2.0", "method": "add", "params": [1, 2], "id": 1},
+            {"jsonrpc": "2.0", "method": "fail", "params": [], "id": 2},
+            {"jsonrpc": "2.0", "method": "delayed", "params": [1], "id": 3},
+            {"jsonrpc": "2.0", "method": "missing", "params": [], "id": 4},
+        ])
+        methods = config.stats.methods
+        self.assertEqual(2, methods["add"].calls)
+        self.assertEqual(2, methods["add"].execute.count)
+        self.assertEqual(1, methods["add"].parse.count)
+        self.assertEqual(1, methods["add"].encode.count)
+        self.assertEqual({-32603: 1}, methods["fail"].faults)
+        self.assertEqual({-32601: 1}, methods[UNKNOWN].faults)
+        self.assertFalse("missing" in methods)
+        self.assertEqual(1, methods[BATCH].parse.count)
+        self.assertEqual(1, methods[BATCH].encode.count)
+        self.assertTrue(methods["delayed"].execute.max >= 0.01)
+        self.assertEqual(0, config.stats.in_flight())
+
+    def test_unknown_methods(self):
+        for i in range(3):
+            self.post({"method": "missing%d" % i, "params": [], "id": 1})
+        self.post([{"jsonrpc": "2.0", "method": "missing", "params": [],
+                    "id": 1}])
+        methods = config.stats.methods
+        self.assertEqual([BATCH, UNKNOWN], sorted(methods))
+        self.assertEqual(4, methods[UNKNOWN].calls)
+        self.assertEqual(3, methods[UNKNOWN].parse.count)
+        self.assertEqual(0, config.stats.in_flight())
+
+    def test_in_flight(self):
+        self.post([
+            {"jsonrpc": "2.0", "method": "delayed", "params": [i], "id": i}
+            for i in range(3)])
+        self.assertEqual(3, StatsTestHandler.in_flight)
+
+    def test_parse_error(self):
+        self.fetch("/", method="POST", body="{")
+        stats = config.stats.methods[REQUEST]
+        self.assertEqual({-32700: 1}, stats.faults)
+        self.assertEqual(1, stats.parse.count)
+
+    def test_stats_handler(self):
+        self.post({"method": "add", "params": [1, 2], "id": 1})
+        stats = json.loads(self.fetch("/stats").body)
+        self.assertEqual(1, stats["methods"]["add"]["calls"])
+        self.assertEqual(1, stats["methods"]["add"]["execute"]["count"])
+
+
+class HistogramTests(unittest.TestCase):
+
+    def test_percentiles(self):
+        histogram = Histogram()
+        self.assertEqual(None, histogram.percentile(50))
+        for i in range(99):
+            histogram.record(0.00001)
+        histogram.record(1.5)
+        # The upper bound of the first bucket
+        self.assertEqual(0.00005, histogram.percentile(50))
+        self.assertEqual(0.00005, histogram.percentile(99))
+        self.assertEqual(1.5, histogram.percentile(100))
+        self.assertEqual(100, histogram.count)
+        self.assertEqual(1.5, histogram.snapshot()["max"])
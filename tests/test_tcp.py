@@ -0,0 +1,243 @@
+import os
+import shutil
+import socket
+import struct
+import tempfile
+import time
+import xmlrpclib
+from tornado import gen
+from tornado.httpclient import HTTPError
+from tornado.ioloop import IOLoop
+from tornado.iostream import IOStream
+from tornado.netutil import bind_unix_socket
+from tornado.testing import AsyncTestCase, bind_unused_port, gen_test
+import tornado.web
+from tornadorpc import async
+from tornadorpc.base import BaseRPCHandler
+from tornadorpc.json import JSONRPCHandler
+from tornadorpc.tcp import RPCServer, JSONRPCTCPClient, XMLRPCTCPClient
+from tornadorpc.xml import XMLRPCHandler
+
+from tests.helpers import TestHandler
+
+
+class TCPTestHandler(TestHandler):
+
+    running = 0
+    max_running = 0
+
+    def initialize(self, prefix=""):
+        self.prefix = prefix
+
+    def greet(self, name):
+        return "%s%s from %s" % (self.prefix, name, self.request.remote_ip)
+
+    @async
+    def delayed(self, value, delay):
+        TCPTestHandler.running += 1
+        TCPTestHandler.max_running = max(
+            TCPTestHandler.running, TCPTestHandler.max_running)
+        IOLoop.current().add_timeout(
+            time.time() + delay, lambda: self._finish_delayed(value))
+
+    def _finish_delayed(self, value):
+        TCPTestHandler.running -= 1
+        self.result(value)
+
+    @async
+    def hang(self):
+        pass
+
+
+class JSONTCPHandler(TCPTestHandler, JSONRPCHandler):
+    pass
+
+
+class XMLTCPHandler(TCPTestHandler, XMLRPCHandler):
+    pass
+
+
+class RefusingTCPHandler(JSONTCPHandler):
+
+    def prepare(self):
+        if self.request.body == "refuse":
+            raise tornado.web.HTTPError(415)
+        if self.request.body == "fail":
+            raise ValueError("Failed in prepare")
+
+
+class TCPTests(AsyncTestCase):
+
+    def setUp(self):
+        super(TCPTests, self).setUp()
+        TCPTestHandler.running = 0
+        TCPTestHandler.max_running = 0
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.stop()
+        super(TCPTests, self).tearDown()
+
+    def serve(self, handler_class, **kwargs):
+        server = RPCServer(handler_class, io_loop=self.io_loop, **kwargs)
+        sock, port = bind_unused_port()
+        server.add_socket(sock)
+        self.servers.append(server)
+        return server, ("127.0.0.1", port)
+
+    @gen_test
+    def test_calls(self):
+        server, address = self.serve(JSONTCPHandler, prefix="Hi ")
+        client = JSONRPCTCPClient(address)
+        result = yield client.add(5, 6)
+        self.assertEqual(11, result)
+        result = yield client.tree.power(2, 6)
+        self.assertEqual(64, result)
+        result = yield client.greet("Bob")
+        self.assertEqual("Hi Bob from 127.0.0.1", result)
+        yield client.notify("add", [1, 2])
+        batch = client.batch()
+        first = batch.add(1, 2)
+        batch.delayed("later", 0.01)
+        results = yield batch.send()
+        self.assertEqual([3, "later"], results)
+        self.assertEqual(3, first.result())
+        client.close()
+
+    @gen_test
+    def test_faults(self):
+        server, address = self.serve(XMLTCPHandler)
+        client = XMLRPCTCPClient(address)
+        for method, code in (("private", -32601), ("_private", -32601),
+                             ("missing", -32601),
+                             ("internal_error", -32603)):
+            try:
+                yield client.call(method)
+            except xmlrpclib.Fault as fault:
+                self.assertEqual(code, fault.faultCode)
+            else:
+                self.fail("No fault for %s" % method)
+        result = yield client.delayed(4, 0.01)
+        self.assertEqual(4, result)
+        client.close()
+
+    @gen_test
+    def test_multiplexed(self):
+        server, address = self.serve(JSONTCPHandler)
+        client = JSONRPCTCPClient(address, pool_size=1)
+        # Answered in completion order on the one connection
+        slow = client.delayed("slow", 0.05)
+        fast = client.delayed("fast", 0.01)
+        first = yield fast
+        self.assertEqual("fast", first)
+        self.assertFalse(slow.done())
+        self.assertEqual("slow", (yield slow))
+        self.assertEqual(2, TCPTestHandler.max_running)
+        self.assertEqual(1, len(client.http_client.connections))
+        client.close()
+
+    @gen_test
+    def test_max_in_flight(self):
+        server, address = self.serve(JSONTCPHandler)
+        server.max_in_flight = 2
+        client = JSONRPCTCPClient(address, pool_size=1)
+        results = yield [
+            client.delayed(index, 0.01) for index in range(5)]
+        self.assertEqual(range(5), results)
+        self.assertEqual(2, TCPTestHandler.max_running)
+        client.close()
+
+    @gen_test
+    def test_timeout(self):
+        server, address = self.serve(JSONTCPHandler)
+        client = JSONRPCTCPClient(address)
+        try:
+            yield client.with_timeout(0.01).delayed(1, 0.2)
+        except HTTPError as error:
+            self.assertEqual(599, error.code)
+        else:
+            self.fail("The call didn't time out.")
+        client.close()
+
+    @gen_test
+    def test_raw_frames(self):
+        server, address = self.serve(JSONTCPHandler)
+        client = JSONRPCTCPClient(address)
+        # Not JSON
+        response = yield client.fetch("{]")
+        self.assertIn("-32700", response.body)
+        response = yield client.fetch("")
+        self.assertIn("-32700", response.body)
+        client.close()
+
+    @gen_test
+    def test_closed(self):
+        sock, port = bind_unused_port()
+        sock.close()
+        client = JSONRPCTCPClient(("127.0.0.1", port))
+        try:
+            yield client.add(1, 2)
+        except HTTPError as error:
+            self.assertEqual(599, error.code)
+        else:
+            self.fail("The call didn't fail.")
+
+    @gen_test
+    def test_unix_socket(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "rpc.sock")
+            server = RPCServer(JSONTCPHandler, io_loop=self.io_loop)
+            server.add_socket(bind_unix_socket(path))
+            self.servers.append(server)
+            client = JSONRPCTCPClient(path)
+            result = yield client.add(1, 2)
+            self.assertEqual(3, result)
+            client.close()
+        finally:
+            shutil.rmtree(directory)
+
+    @gen.coroutine
+    def wait_in_flight(self, count):
+        while BaseRPCHandler._RPC_in_flight != count:
+            yield gen.Task(IOLoop.current().add_callback)
+
+    @gen_test
+    def test_client_gone(self):
+        server, address = self.serve(JSONTCPHandler)
+        in_flight = BaseRPCHandler._RPC_in_flight
+        stream = IOStream(socket.socket())
+        yield gen.Task(stream.connect, address)
+        body = '{"jsonrpc": "2.0", "method": "hang", "params": [], "id": 1}'
+        stream.write(struct.pack(">II", 1, len(body)) + body)
+        yield self.wait_in_flight(in_flight + 1)
+        stream.close()
+        # The call never answers, but it no longer counts
+        yield self.wait_in_flight(in_flight)
+
+    @gen_test
+    def test_prepare_errors(self):
+        server, address = self.serve(RefusingTCPHandler)
+        in_flight = BaseRPCHandler._RPC_in_flight
+        client = JSONRPCTCPClient(address, pool_size=1)
+        response = yield client.fetch("refuse")
+        self.assertIn("-32600", response.body)
+        response = yield client.fetch("fail")
+        self.assertIn("-32603", response.body)
+        self.assertEqual(in_flight, BaseRPCHandler._RPC_in_flight)
+        result = yield client.add(1, 2)
+        self.assertEqual(3, result)
+        client.close()
+
+    def test_frame_too_large(self):
+        server, address = self.serve(JSONTCPHandler)
+        server.max_frame_size = 10
+        sock = socket.create_connection(address)
+        sock.sendall(struct.pack(">II", 1, 11) + "x" * 11)
+        # Closed without a response
+        sock.setblocking(False)
+        self.io_loop.add_timeout(time.time() + 0.05, self.stop)
+        self.wait()
+        self.assertEqual("", sock.recv(10))
+        sock.close()
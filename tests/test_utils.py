@@ -1,5 +1,5 @@
 import unittest
-from tornadorpc.utils import getcallargs
+from tornadorpc.utils import getcallargs, CallBinder
 
 
 class TestCallArgs(unittest.TestCase):
@@ -70,3 +70,42 @@ class TestCallArgs(unittest.TestCase):
         kwargs, xtra = getcallargs(test, a=5, b=6)
         self.assertEqual(kwargs, {'a': 5, 'b': 6, 'default': None})
         self.assertEqual(xtra, [])
+
+
+class TestCallBinder(unittest.TestCase):
+    """ Checks the precompiled binder against getcallargs """
+
+    def test_reusable(self):
+        def test(a, b, c=3, d=4):
+            pass
+        binder = CallBinder(test)
+        self.assertEqual(binder.bind([1, 2]), getcallargs(test, 1, 2))
+        self.assertEqual(
+            binder.bind(named={'a': 1, 'b': 2, 'd': 5}),
+            getcallargs(test, a=1, b=2, d=5))
+        self.assertEqual(binder.bind([1, 2, 5]), getcallargs(test, 1, 2, 5))
+        # The defaults must not leak between calls
+        self.assertEqual(binder.bind([1, 2])[0]['c'], 3)
+
+    def test_skip(self):
+        def test(self, a):
+            pass
+        binder = CallBinder(test, skip=1)
+        self.assertEqual(binder.bind([5]), ({'a': 5}, []))
+        self.assertRaises(TypeError, binder.bind, [5, 6])
+
+    def test_missing_args(self):
+        def test(a, b, c=3):
+            pass
+        binder = CallBinder(test)
+        self.assertRaises(TypeError, binder.bind, [1])
+        self.assertRaises(TypeError, binder.bind, named={'a': 1, 'c': 2})
+        self.assertRaises(TypeError, binder.bind, named={'a': 1, 'x': 2})
+
+    def test_extra_args(self):
+        def test(a, *args, **kwargs):
+            pass
+        binder = CallBinder(test)
+        self.assertEqual(binder.bind([1, 2, 3]), ({'a': 1}, [2, 3]))
+        self.assertEqual(
+            binder.bind(named={'a': 1, 'b': 2}), ({'a': 1, 'b': 2}, []))
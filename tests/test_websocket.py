@@ -0,0 +1,125 @@
+import json
+import time
+from tornado import gen
+from tornado.ioloop import IOLoop
+from tornado.testing import AsyncHTTPTestCase, gen_test
+from tornado.websocket import websocket_connect
+import tornado.web
+from tornadorpc import async
+from tornadorpc.websocket import WebSocketJSONRPCHandler
+
+from tests.helpers import TestHandler
+
+
+class WebSocketTestHandler(WebSocketJSONRPCHandler, TestHandler):
+
+    max_in_flight = 2
+    running = 0
+    max_running = 0
+
+    def open(self):
+        super(WebSocketTestHandler, self).open()
+        self.notify("welcome", ["Hello"])
+
+    @async
+    def delayed(self, value, delay):
+        WebSocketTestHandler.running += 1
+        WebSocketTestHandler.max_running = max(
+            WebSocketTestHandler.running, WebSocketTestHandler.max_running)
+        IOLoop.current().add_timeout(
+            time.time() + delay, lambda: self._finish_delayed(value))
+
+    def _finish_delayed(self, value):
+        WebSocketTestHandler.running -= 1
+        self.result(value)
+
+
+class WebSocketTests(AsyncHTTPTestCase):
+
+    def get_app(self):
+        return tornado.web.Application([("/ws", WebSocketTestHandler)])
+
+    @gen.coroutine
+    def connect(self):
+        url = "ws://localhost:%d/ws" % self.get_http_port()
+        connection = yield websocket_connect(url, io_loop=self.io_loop)
+        welcome = yield connection.read_message()
+        self.assertEqual(
+            {"jsonrpc": "2.0", "method": "welcome", "params": ["Hello"]},
+            json.loads(welcome))
+        raise gen.Return(connection)
+
+    def send(self, connection, method, params, rpcid=None):
+        request = {"jsonrpc": "2.0", "method": method, "params": params}
+        if rpcid is not None:
+            request["id"] = rpcid
+        connection.write_message(json.dumps(request))
+
+    @gen_test
+    def test_calls(self):
+        connection = yield self.connect()
+        self.send(connection, "add", [1, 2], 1)
+        response = json.loads((yield connection.read_message()))
+        self.assertEqual({"jsonrpc": "2.0", "result": 3, "id": 1}, response)
+        self.send(connection, "private", [], 2)
+        response = json.loads((yield connection.read_message()))
+        self.assertEqual(-32601, response["error"]["code"])
+        connection.write_message(json.dumps([
+            {"jsonrpc": "2.0", "method": "add", "params": [1, 2], "id": 3},
+            {"jsonrpc": "2.0", "method": "tree.power", "params": [2, 6],
+             "id": 4}]))
+        response = json.loads((yield connection.read_message()))
+        self.assertEqual([3, 64], [r["result"] for r in response])
+        # Notifications have no response
+        self.send(connection, "add", [1, 2])
+        self.send(connection, "add", [2, 2], 5)
+        response = json.loads((yield connection.read_message()))
+        self.assertEqual(5, response["id"])
+
+    @gen_test
+    def test_out_of_order(self):
+        WebSocketTestHandler.max_running = 0
+        connection = yield self.connect()
+        self.send(connection, "delayed", ["slow", 0.05], 1)
+        self.send(connection, "delayed", ["fast", 0.01], 2)
+        self.send(connection, "delayed", ["queued", 0.01], 3)
+        responses = []
+        for i in range(3):
+            responses.append(json.loads((yield connection.read_message())))
+        self.assertEqual([2, 3, 1], [r["id"] for r in responses])
+        self.assertEqual(
+            ["fast", "queued", "slow"], [r["result"] for r in responses])
+        # The third waited for one of the first two
+        self.assertEqual(2, WebSocketTestHandler.max_running)
+
+    @gen_test
+    def test_batch_entries_count(self):
+        WebSocketTestHandler.max_running = 0
+        connection = yield self.connect()
+        connection.write_message(json.dumps([
+            {"jsonrpc": "2.0", "method": "delayed", "params": [i, 0.02],
+             "id": i} for i in range(2)]))
+        self.send(connection, "delayed", ["queued", 0.01], 2)
+        response = json.loads((yield connection.read_message()))
+        self.assertEqual([0, 1], [r["result"] for r in response])
+        response = json.loads((yield connection.read_message()))
+        self.assertEqual("queued", response["result"])
+        # The batch used up both slots
+        self.assertEqual(2, WebSocketTestHandler.max_running)
+
+    @gen_test
+    def test_too_many_waiting(self):
+        WebSocketTestHandler.max_waiting = 2
+        try:
+            connection = yield self.connect()
+            for i in range(5):
+                self.send(connection, "delayed", [i, 0.05], i)
+            # Closed once a fifth request had to wait
+            message = yield connection.read_message()
+        finally:
+            del WebSocketTestHandler.max_waiting
+        self.assertEqual(None, message)
+
+    def test_post_not_allowed(self):
+        response = self.fetch("/ws", method="POST", body="{}")
+        self.assertEqual(405, response.code)
@@ -1,7 +1,13 @@
+import time
 import unittest
 import xmlrpclib
 import urllib2
-from tornadorpc.xml import XMLRPCHandler
+from tornado.ioloop import IOLoop
+from tornado.testing import AsyncHTTPTestCase
+import tornado.web
+from tornadorpc import async, cached_response, Versioned
+from tornadorpc.xml import XMLRPCHandler, StreamingXMLRPCHandler
+from tornadorpc.xml import XMLRPCRequestReader
 
 from tests.helpers import TestHandler, RPCTests
 
@@ -68,3 +74,140 @@ class XMLRPCTests(RPCTests, unittest.TestCase):
         except xmlrpclib.Fault, f:
             self.assertEqual(fault_code, f.faultCode)
             self.assertEqual(fault_string, f.faultString)
+
+
+class StreamingXMLTestHandler(StreamingXMLRPCHandler, TestHandler):
+
+    max_body_size = 4096
+    max_depth = 3
+    posted = 0
+
+    def post(self):
+        StreamingXMLTestHandler.posted += 1
+        return StreamingXMLRPCHandler.post(self)
+
+    def echo(self, value):
+        return value
+
+
+class StreamingXMLRPCTests(AsyncHTTPTestCase):
+
+    def get_app(self):
+        return tornado.web.Application([("/", StreamingXMLTestHandler)])
+
+    def call(self, method, *params):
+        body = xmlrpclib.dumps(params, methodname=method)
+        response = self.fetch("/", method="POST", body=body)
+        return xmlrpclib.loads(response.body)[0][0]
+
+    def assertFault(self, code, method, *params):
+        try:
+            self.call(method, *params)
+            self.fail('xmlrpclib.Fault should have been raised')
+        except xmlrpclib.Fault, f:
+            self.assertEqual(code, f.faultCode)
+
+    def test_call(self):
+        self.assertEqual(64, self.call("tree.power", 2, 6))
+        self.assertEqual({"a": [[1]]}, self.call("echo", {"a": [[1]]}))
+        self.assertFault(-32601, "data_received", "chunk")
+
+    def test_too_deep(self):
+        self.assertFault(-32600, "echo", [[[[1]]]])
+
+    def test_too_large(self):
+        self.assertFault(-32600, "echo", "x" * 4096)
+
+    def test_too_large_length(self):
+        # Refused in prepare, from the Content-Length alone
+        StreamingXMLTestHandler.posted = 0
+        self.assertFault(-32600, "echo", "x" * 4096)
+        self.assertEqual(0, StreamingXMLTestHandler.posted)
+        self.assertEqual(64, self.call("tree.power", 2, 6))
+        self.assertEqual(1, StreamingXMLTestHandler.posted)
+
+    def test_parse_error(self):
+        response = self.fetch("/", method="POST", body="<garbage>")
+        try:
+            xmlrpclib.loads(response.body)
+            self.fail('xmlrpclib.Fault should have been raised')
+        except xmlrpclib.Fault, f:
+            self.assertEqual(-32700, f.faultCode)
+
+    def test_reader_chunks(self):
+        body = xmlrpclib.dumps(([1, {"b": "c"}],), methodname="echo")
+        reader = XMLRPCRequestReader()
+        for i in range(0, len(body), 7):
+            reader.feed(body[i:i + 7])
+        self.assertEqual((([1, {"b": "c"}],), "echo"), reader.close())
+
+
+class MultiCallHandler(XMLTestHandler):
+
+    @async
+    def delayed(self, value, delay):
+        IOLoop.current().add_timeout(
+            time.time() + delay, lambda: self.result(value))
+
+    @cached_response(versioned=True)
+    def catalog(self, revision):
+        return Versioned(revision, {"revision": revision, "items": [1, 2]})
+
+
+class MultiCallTests(AsyncHTTPTestCase):
+
+    def get_app(self):
+        return tornado.web.Application([("/", MultiCallHandler)])
+
+    def multicall(self, *calls):
+        calls = [{"methodName": method, "params": list(params)}
+                 for method, params in calls]
+        body = xmlrpclib.dumps((calls,), methodname="system.multicall")
+        response = self.fetch("/", method="POST", body=body)
+        return xmlrpclib.loads(response.body)[0][0]
+
+    def test_multicall(self):
+        start = time.time()
+        results = self.multicall(
+            ("delayed", ["slow", 0.1]),
+            ("add", [1, 2]),
+            ("delayed", ["fast", 0.1]),
+            ("private", []),
+            ("internal_error", []))
+        # The delayed calls ran side by side
+        self.assertTrue(time.time() - start < 0.19)
+        self.assertEqual([["slow"], [3], ["fast"]], results[:3])
+        self.assertEqual(-32601, results[3]["faultCode"])
+        self.assertEqual(-32603, results[4]["faultCode"])
+
+    def test_single_async_call(self):
+        self.assertEqual(
+            [["only"]], self.multicall(("delayed", ["only", 0.01])))
+
+    def test_bad_call(self):
+        calls = [{"methodName": "add"},
+                 {"methodName": "add", "params": [1, 1]}]
+        body = xmlrpclib.dumps((calls,), methodname="system.multicall")
+        response = self.fetch("/", method="POST", body=body)
+        results = xmlrpclib.loads(response.body)[0][0]
+        self.assertEqual(-32600, results[0]["faultCode"])
+        self.assertEqual([2], results[1])
+
+    def test_empty(self):
+        self.assertEqual([], self.multicall())
+
+    def test_cached_response(self):
+        cache = MultiCallHandler.catalog.response_cache
+        cache.clear()
+        for revision in (1, 1, 2):
+            body = xmlrpclib.dumps((revision,), methodname="catalog")
+            response = self.fetch("/", method="POST", body=body)
+            self.assertEqual(
+                ({"revision": revision, "items": [1, 2]},),
+                xmlrpclib.loads(response.body)[0])
+        self.assertEqual((1, 2), (cache.hits, len(cache.entries)))
+        # Results inside a multicall aren't encoded on their own
+        self.assertEqual(
+            [[{"revision": 3, "items": [1, 2]}]],
+            self.multicall(("catalog", [3])))
+        self.assertEqual(2, len(cache.entries))
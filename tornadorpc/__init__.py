@@ -13,4 +13,6 @@ See the License for the specific language governing permissions and
 limitations under the License. 
 """
 
-from base import private, async, start_server, config
+from base import private, async, cached, cached_response, Versioned
+from base import executor, register_executor, limit, deadline
+from base import start_server, config
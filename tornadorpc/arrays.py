@@ -0,0 +1,210 @@
+"""
+===========================
+NumPy Arrays as RPC Values
+===========================
+Codecs that send numpy arrays as their dtype, shape and raw buffer
+instead of nested lists, and a handler that uses them. Needs numpy.
+
+>>> from tornadorpc.arrays import ArrayRPCHandler
+>>>
+>>> class handler(ArrayRPCHandler):
+>>> ... def scale(self, values, factor):
+>>> ....... return values * factor
+>>>
+>>> start_server(handler, port=8484)
+
+Arrays in the parameters reach the methods as numpy arrays, and
+arrays (or numpy scalars) in the results are encoded the same way.
+Like the binary handlers, ArrayRPCHandler picks the encoding from the
+request's Content-Type:
+
+* application/json -- {"__ndarray__": <base64 data>, "dtype": "<f8",
+  "shape": [2, 3]}; the default without a known Content-Type
+* application/msgpack -- an ext value (code 78) holding the dtype,
+  the shape and the data
+* application/cbor -- a tag (0x4e4441) on [dtype, shape, data]
+
+Decoded arrays are views of the received data (numpy.frombuffer),
+so they're read-only -- copy one before changing it in place. The
+clients can use the same codecs, e.g.
+
+>>> codec = ArrayJSONCodec()
+>>> client = JSONRPCClient(url, dumps=codec.dumps, loads=codec.loads)
+"""
+
+from __future__ import absolute_import
+import base64
+import collections
+import json
+import struct
+from tornadorpc.binary import BinaryRPCParser, CBORCodec, MsgPackCodec
+from tornadorpc.binary import MsgPackRPCHandler, binary_value, cbor2, msgpack
+from tornadorpc.json import JSONRPCParser, JSONCodec
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# The msgpack ext type code and CBOR tag of an array
+ARRAY_EXT = 78
+ARRAY_TAG = 0x4e4441
+
+
+def array_parts(array):
+    """
+    Returns the dtype string, the shape and a buffer with the data
+    of array, in C order. Only copies arrays that aren't contiguous.
+    """
+    if array.dtype.hasobject:
+        raise TypeError('Arrays of Python objects are not serializable.')
+    # ascontiguousarray makes 0-d arrays 1-d, so keep the shape
+    shape = list(array.shape)
+    array = numpy.ascontiguousarray(array)
+    return array.dtype.str, shape, array.data
+
+
+def make_array(dtype, shape, data, offset=0):
+    """
+    Returns a read-only array over data (from offset), raising
+    ValueError if it doesn't hold an array of that dtype and shape.
+    """
+    try:
+        dtype = numpy.dtype(str(dtype))
+    except TypeError as error:
+        raise ValueError(str(error))
+    if dtype.hasobject:
+        raise ValueError('Arrays of Python objects are not supported.')
+    return numpy.frombuffer(data, dtype, offset=offset).reshape(
+        tuple(shape))
+
+
+def plain_value(value):
+    """ Returns numpy scalars as the matching Python value. """
+    if numpy is not None and isinstance(value, numpy.generic):
+        return value.item()
+    return binary_value(value)
+
+
+class ArrayJSONCodec(JSONCodec):
+    """ A JSONCodec that encodes arrays with base64. """
+    key = '__ndarray__'
+
+    def __init__(self):
+        if numpy is None:
+            raise ImportError('ArrayJSONCodec needs the numpy package.')
+        encoder = json.JSONEncoder(
+            separators=(',', ':'), default=self.default)
+        JSONCodec.__init__(self, encoder.encode, self.loads)
+
+    def default(self, value):
+        if isinstance(value, numpy.ndarray):
+            dtype, shape, data = array_parts(value)
+            return {self.key: base64.b64encode(data), 'dtype': dtype,
+                    'shape': shape}
+        return plain_value(value)
+
+    def object_hook(self, value):
+        if self.key in value:
+            data = base64.b64decode(value[self.key])
+            return make_array(value['dtype'], value['shape'], data)
+        return value
+
+    def loads(self, data):
+        return json.loads(data, object_hook=self.object_hook)
+
+
+class ArrayMsgPackCodec(MsgPackCodec):
+    """
+    A MsgPackCodec that encodes arrays as ext values: the dtype
+    string and the number of dimensions (one byte each), each
+    dimension (a 64 bit unsigned integer) and then the data, all big
+    endian.
+    """
+
+    def __init__(self):
+        if numpy is None:
+            raise ImportError('ArrayMsgPackCodec needs the numpy package.')
+        MsgPackCodec.__init__(self)
+
+    @staticmethod
+    def default(value):
+        if isinstance(value, numpy.ndarray):
+            dtype, shape, data = array_parts(value)
+            header = struct.pack('>B%dsB%dQ' % (len(dtype), len(shape)),
+                                 len(dtype), dtype, len(shape), *shape)
+            return msgpack.ExtType(ARRAY_EXT, header + str(data))
+        return plain_value(value)
+
+    @staticmethod
+    def ext_hook(code, data):
+        if code != ARRAY_EXT:
+            return msgpack.ExtType(code, data)
+        try:
+            size = ord(data[0])
+            dtype = data[1:1 + size]
+            ndim = ord(data[1 + size])
+            offset = 2 + size + 8 * ndim
+            shape = struct.unpack_from('>%dQ' % ndim, data, 2 + size)
+        except (IndexError, struct.error):
+            raise ValueError('Bad array header.')
+        return make_array(dtype, shape, data, offset)
+
+    def loads(self, data):
+        return msgpack.unpackb(data, raw=False, ext_hook=self.ext_hook)
+
+
+class ArrayCBORCodec(CBORCodec):
+    """ A CBORCodec that encodes arrays as tagged [dtype, shape, data]. """
+
+    def __init__(self):
+        if numpy is None:
+            raise ImportError('ArrayCBORCodec needs the numpy package.')
+        CBORCodec.__init__(self)
+
+    @staticmethod
+    def default(encoder, value):
+        if isinstance(value, numpy.ndarray):
+            dtype, shape, data = array_parts(value)
+            value = cbor2.CBORTag(
+                ARRAY_TAG, [unicode(dtype), shape, str(data)])
+        else:
+            value = plain_value(value)
+        encoder.encode(value)
+
+    @staticmethod
+    def tag_hook(decoder, tag, shareable_index=None):
+        if tag.tag != ARRAY_TAG:
+            return tag
+        try:
+            dtype, shape, data = tag.value
+        except (TypeError, ValueError):
+            raise ValueError('Bad array value.')
+        return make_array(dtype, shape, data)
+
+    def loads(self, data):
+        return cbor2.loads(data, tag_hook=self.tag_hook)
+
+
+# The parser for each content type, for the installed libraries
+parsers = collections.OrderedDict()
+json_parser = None
+if numpy is not None:
+    if msgpack is not None:
+        msgpack_parser = BinaryRPCParser(ArrayMsgPackCodec())
+        parsers['application/msgpack'] = msgpack_parser
+        parsers['application/x-msgpack'] = msgpack_parser
+    if cbor2 is not None:
+        parsers['application/cbor'] = BinaryRPCParser(ArrayCBORCodec())
+    json_parser = JSONRPCParser(ArrayJSONCodec())
+    parsers['application/json'] = json_parser
+    parsers['application/json-rpc'] = json_parser
+
+
+class ArrayRPCHandler(MsgPackRPCHandler):
+    """
+    Subclass this to add methods that take and return numpy arrays.
+    Requests without a known Content-Type are taken as JSON.
+    """
+    _RPC_ = json_parser
+    _RPC_parsers_ = parsers
@@ -8,33 +8,260 @@ directly, but rather though the XML or JSON RPC implementations.
 You can use the utility functions like 'private' and 'start_server'.
 """
 
+from tornado.concurrent import Future
 from tornado.web import RequestHandler
 import tornado.web
 import tornado.ioloop
 import tornado.httpserver
+import tornado.netutil
+import tornado.process
+import functools
+import math
+import os
+import signal
+import time
 import types
-import traceback
-from tornadorpc.utils import getcallargs
+from tornadorpc.cache import ResultCache, EncodedCache, MISSING
+from tornadorpc.utils import CallBinder
+from tornadorpc import compression, log, stats
+
+try:
+    from tornado.concurrent import is_future
+except ImportError:
+    # Tornado < 4.0
+    def is_future(value):
+        return isinstance(value, Future)
+
+try:
+    from tornado.gen import convert_yielded
+except ImportError:
+    # Tornado < 4.3, no native coroutines
+    convert_yielded = None
+
+try:
+    from concurrent import futures
+except ImportError:
+    # Python 2 without the 'futures' backport
+    futures = None
 
 
 # Configuration element
 class Config(object):
     verbose = True
     short_errors = True
+    # Maximum number of entries of a single batch that may be running
+    # at once, or None to start them all together.
+    batch_concurrency = None
+    # Thread count and queue limit of the 'default' executor pool
+    executor_workers = 4
+    executor_max_pending = None
+    # Sink for call statistics (see tornadorpc.stats), or None
+    stats = None
+    # (count, seconds) -- log at most count identical errors every
+    # 'seconds' seconds, or None to log every error.
+    log_rate_limit = None
+    # Admission control -- requests (or calls) past these limits get
+    # a 'server_busy' fault instead of being run. max_in_flight is the
+    # number of requests this process handles at once, max_queue_time
+    # the seconds a request may wait between arriving (its headers
+    # being read) and its first call starting.
+    max_in_flight = None
+    max_queue_time = None
+    # The share of max_in_flight that calls to methods of each
+    # @limit(priority=...) class may use ('normal' if not decorated.)
+    priorities = {'high': 1.0, 'normal': 0.9, 'low': 0.5}
+    # Compress responses of at least compress_min_size bytes with the
+    # first of compress_encodings the client accepts (zstd and br
+    # need the zstandard and brotli packages.) compress_level is the
+    # zlib level (1-9), zstd level or brotli quality.
+    compress = False
+    compress_min_size = 1024
+    compress_level = 6
+    compress_encodings = ('zstd', 'br', 'gzip', 'deflate')
+    # Largest request body accepted once decompressed
+    max_decompressed_size = 100 * 1024 * 1024
 
 config = Config()
 
 
+# Marks a result slot that hasn't been filled yet
+PENDING = object()
+
+
+class RPCContext(object):
+    """
+    The state of a single RPC request -- the handler, the protocol
+    specific request data kept by parse_request, and the results
+    collected so far. The parser itself is shared by every request
+    to a handler class, so anything request specific lives here and
+    is passed through dispatch, response and parse_responses.
+
+    Results are stored by index in a preallocated list of slots, so
+    the entries of a batch can finish in any order. When a batch is
+    streamed, 'flushed' is the number of slots already sent in order
+    and 'written' the number of encoded responses sent so far.
+
+    If callback is set, it is called with the list of results once
+    they are all in, instead of encoding them and responding to the
+    client (for calls made within a call, like a multicall.) Unless
+    versioned is set, Versioned results are unwrapped as they come in.
+
+    If stats (a tornadorpc.stats sink) is set, 'timings' holds the
+    time each call was started. 'received' is the time the request
+    arrived (if the handler knows it), until its first call
+    is admitted, and 'admitted' holds the CallLimit each call was
+    counted against, if any.
+
+    'deadline' is the time the whole request times out at (with
+    'timer' its IOLoop timeout), 'watches' maps the index of each
+    call still running under a deadline to its (timeout, Future),
+    and 'expired' is the set of indexes answered with a timeout
+    fault, whose late results are dropped.
+    """
+    __slots__ = ('handler', 'parser', 'requests', 'batch', 'calls',
+                 'results', 'pending', 'started', 'running', 'limit',
+                 'dispatching', 'stream', 'flushed', 'written', 'callback',
+                 'versioned', 'stats', 'timings', 'finished', 'received',
+                 'admitted', 'deadline', 'timer', 'watches', 'expired')
+
+    def __init__(self, handler, parser):
+        self.handler = handler
+        self.parser = parser
+        self.requests = None
+        self.batch = False
+        self.calls = ()
+        self.results = []
+        self.pending = 0
+        self.started = 0
+        self.running = 0
+        self.limit = config.batch_concurrency
+        self.dispatching = False
+        self.stream = None
+        self.flushed = 0
+        self.written = 0
+        self.callback = None
+        self.versioned = False
+        self.stats = config.stats
+        self.timings = None
+        self.finished = False
+        self.received = handler._RPC_received
+        self.admitted = None
+        self.deadline = None
+        self.timer = None
+        self.watches = None
+        self.expired = None
+
+    def prepare(self, count):
+        """ Allocates a result slot for each of count calls. """
+        self.results = [PENDING] * count
+        self.pending = count
+        if self.stats is not None:
+            self.timings = [0.0] * count
+
+    def stats_name(self):
+        """ The name request-wide statistics are recorded under. """
+        if self.batch:
+            return stats.BATCH
+        if self.calls:
+            method_name = self.calls[0][0]
+            handler = self.handler
+            if self.parser.registry(handler).lookup(
+                    handler, method_name) is None:
+                return stats.UNKNOWN
+            return method_name
+        return stats.REQUEST
+
+    def next_pending(self):
+        """ Returns the index of the first slot without a result. """
+        return self.results.index(PENDING)
+
+
+class RPCCall(object):
+    """
+    Stands in for the handler as 'self' in an @async method that is
+    one entry of a batch, so that self.result (including when it is
+    called from another of the handler's methods, like a callback)
+    fills the slot for that entry. Everything else is passed through
+    to the handler.
+    """
+    __slots__ = ('_handler', '_context', '_index')
+
+    def __init__(self, handler, context, index):
+        object.__setattr__(self, '_handler', handler)
+        object.__setattr__(self, '_context', context)
+        object.__setattr__(self, '_index', index)
+
+    def result(self, result, *results):
+        """ Use this to return a result. """
+        if results:
+            result = [result] + list(results)
+        context = self._context
+        context.parser.add_result(context, self._index, result)
+
+    def __getattr__(self, attr_name):
+        attr = getattr(self._handler, attr_name)
+        if isinstance(attr, types.MethodType) and \
+                attr.im_self is self._handler:
+            # Rebind the handler's own methods to this call
+            return types.MethodType(attr.im_func, self, attr.im_class)
+        return attr
+
+    def __setattr__(self, attr_name, value):
+        setattr(self._handler, attr_name, value)
+
+
+class Versioned(object):
+    """
+    Return this from a @cached_response(versioned=True) method to
+    tag the result with a version (any hashable value, like a
+    revision number or a hash of the source data.) The encoded
+    result is reused for as long as the version stays the same.
+    """
+    __slots__ = ('version', 'value')
+
+    def __init__(self, version, value):
+        self.version = version
+        self.value = value
+
+
+class Encoded(object):
+    """
+    A result that has already been encoded by the parser's
+    encode_fragment, so only the response around it is built.
+    """
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+
+class CachedRun(object):
+    """
+    Kept in the leading call's RPCContext.watches in place of a
+    Future while a @cached method runs for it and the calls waiting
+    on it. Cancelling it (when the leading call times out, or its
+    client goes away) hands the run over to the calls still waiting.
+    """
+    __slots__ = ('cancel',)
+
+    def __init__(self, cancel):
+        self.cancel = cancel
+
+
 class BaseRPCParser(object):
     """
     This class is responsible for managing the request, dispatch,
     and response formatting of the system. It is tied into the
     _RPC_ attribute of the BaseRPCHandler (or subclasses) and
-    populated as necessary throughout the request. Use the
-    .faults attribute to take advantage of the built-in error
-    codes.
+    is shared by every request, so per-request state is kept in
+    an RPCContext. Use the .faults attribute to take advantage
+    of the built-in error codes.
     """
     content_type = 'text/plain'
+    # Framing of a streamed batch response, see encode_response
+    stream_open = ''
+    stream_separator = ''
+    stream_close = ''
 
     def __init__(self, library, encode=None, decode=None):
         # Attaches the RPC library and encode / decode functions.
@@ -45,8 +272,6 @@ class BaseRPCParser(object):
             decode = getattr(library, 'loads')
         self.encode = encode
         self.decode = decode
-        self.requests_in_progress = 0
-        self.responses = []
 
     @property
     def faults(self):
@@ -62,62 +287,105 @@ class BaseRPCParser(object):
         into text and returns it to the parent Handler to send back
         to the client.
         """
-        self.handler = handler
+        context = RPCContext(handler, self)
+        handler._RPC_context = context
+        if context.stats is not None:
+            parse_start = time.time()
         try:
-            requests = self.parse_request(request_body)
+            requests = self.parse_request(context, request_body)
         except:
-            self.traceback()
-            return self.handler.result(self.faults.parse_error())
+            self.traceback(fault='parse_error')
+            context.prepare(1)
+            return self.add_result(context, 0, self.faults.parse_error())
+        if context.stats is not None:
+            elapsed = time.time() - parse_start
+            if isinstance(requests, types.TupleType):
+                context.calls = requests
+            else:
+                # A fault for the whole request
+                context.stats.start(stats.REQUEST)
+                context.stats.finish(stats.REQUEST, elapsed, getattr(
+                    requests, 'faultCode', None))
+            context.stats.phase(context.stats_name(), 'parse', elapsed)
         if not isinstance(requests, types.TupleType):
             # SHOULD be the result of a fault call,
             # according tothe parse_request spec below.
             if isinstance(requests, basestring):
                 # Should be the response text of a fault
                 # This will break in Python 3.x
-                return requests
+                return handler.on_result(requests)
             elif hasattr(requests, 'response'):
                 # Fault types should have a 'response' method
-                return requests.response()
+                return handler.on_result(requests.response())
             elif hasattr(requests, 'faultCode'):
                 # XML-RPC fault types need to be properly dispatched. This
                 # should only happen if there was an error parsing the
                 # request above.
-                return self.handler.result(requests)
+                context.prepare(1)
+                return self.add_result(context, 0, requests)
             else:
                 # No idea, hopefully the handler knows what it
                 # is doing.
                 return requests
-        self.handler._requests = len(requests)
-        for request in requests:
-            self.dispatch(request[0], request[1])
+        context.calls = requests
+        context.prepare(len(requests))
+        if context.batch:
+            context.stream = getattr(handler, 'stream_batches', None)
+        if not requests:
+            return self.response(context)
+        timeout = handler._RPC_timeout()
+        if timeout is not None:
+            context.deadline = time.time() + timeout
+            context.timer = tornado.ioloop.IOLoop.current().add_timeout(
+                context.deadline,
+                functools.partial(self.expire, context, None, timeout))
+        self.advance(context)
 
-    def dispatch(self, method_name, params):
+    def advance(self, context):
         """
-        This method walks the attribute tree in the method
-        and passes the parameters, either in positional or
+        Dispatches the calls that haven't been started yet, as far as
+        the context's concurrency limit allows. Asynchronous calls are
+        left running, and the next calls are started as they finish.
+        """
+        if context.dispatching:
+            # Already in the loop below, further up the stack.
+            return
+        context.dispatching = True
+        try:
+            calls = context.calls
+            while context.started < len(calls) and (
+                    not context.limit or context.running < context.limit):
+                index = context.started
+                context.started += 1
+                if context.results[index] is not PENDING:
+                    # Answered without being dispatched (a bad call)
+                    continue
+                context.running += 1
+                method_name, params = calls[index]
+                self.dispatch(context, index, method_name, params)
+        finally:
+            context.dispatching = False
+
+    def dispatch(self, context, index, method_name, params):
+        """
+        This method looks up the method in the handler's method
+        registry and passes the parameters, either in positional or
         keyword form, into the appropriate method on the
         Handler class. Currently supports only positional
-        or keyword arguments, not mixed.
-        """
-        if hasattr(RequestHandler, method_name):
-            # Pre-existing, not an implemented attribute
-            return self.handler.result(self.faults.method_not_found())
-        method = self.handler
-        method_list = dir(method)
-        method_list.sort()
-        attr_tree = method_name.split('.')
-        try:
-            for attr_name in attr_tree:
-                method = self.check_method(attr_name, method)
-        except AttributeError:
-            return self.handler.result(self.faults.method_not_found())
-        if not callable(method):
-            # Not callable, so not a method
-            return self.handler.result(self.faults.method_not_found())
-        if method_name.startswith('_') or \
-                getattr(method, 'private', False) is True:
-            # No, no. That's private.
-            return self.handler.result(self.faults.method_not_found())
+        or keyword arguments, not mixed. The result is stored
+        in the context's result slot at index.
+        """
+        handler = context.handler
+        rpc_method = self.registry(handler).lookup(handler, method_name)
+        if rpc_method is None:
+            fault = self.faults.method_not_found()
+            if context.stats is not None:
+                context.stats.start(stats.UNKNOWN)
+                context.stats.finish(stats.UNKNOWN, 0.0, fault.faultCode)
+            return self.add_result(context, index, fault)
+        if context.stats is not None:
+            context.stats.start(method_name)
+            context.timings[index] = time.time()
         args = []
         kwargs = {}
         if isinstance(params, dict):
@@ -128,71 +396,491 @@ class BaseRPCParser(object):
             args = params
         else:
             # Bad argument formatting?
-            return self.handler.result(self.faults.invalid_params())
+            return self.add_result(
+                context, index, self.faults.invalid_params())
         # Validating call arguments
+        if rpc_method.binder is None:
+            return self.add_result(
+                context, index, self.faults.invalid_params())
         try:
-            final_kwargs, extra_args = getcallargs(method, *args, **kwargs)
+            final_kwargs, extra_args = rpc_method.binder.bind(args, kwargs)
         except TypeError:
-            return self.handler.result(self.faults.invalid_params())
+            return self.add_result(
+                context, index, self.faults.invalid_params())
+        if rpc_method.limit is not None or \
+                config.max_in_flight is not None or \
+                config.max_queue_time is not None:
+            fault = self.admit(context, index, rpc_method)
+            if fault is not None:
+                return self.add_result(context, index, fault)
+        if rpc_method.response_cache is not None and \
+                context.callback is None:
+            # The response is sent straight to the client
+            return self.cached_response_call(
+                context, index, rpc_method, params, final_kwargs, extra_args)
+        if rpc_method.cache is not None:
+            return self.cached_call(
+                context, index, rpc_method, params, final_kwargs, extra_args)
+        self.call(context, index, rpc_method, params, final_kwargs, extra_args)
+
+    def admit(self, context, index, rpc_method):
+        """
+        Returns a 'server_busy' fault if the call should be shed --
+        because the server is past the share of max_in_flight that
+        its priority may use, the request waited longer than
+        max_queue_time before its first call was started, or the
+        method is at its own limit. Otherwise
+        the call is counted against its method's limit, and None is
+        returned.
+        """
+        limit = rpc_method.limit
+        priority = 'normal'
+        if limit is not None:
+            priority = limit.priority
+        if config.max_in_flight is not None and \
+                BaseRPCHandler._RPC_in_flight > math.ceil(
+                    config.max_in_flight * config.priorities[priority]):
+            return self.faults.server_busy('Too many requests.')
+        if config.max_queue_time is not None and \
+                context.received is not None and \
+                time.time() - context.received > config.max_queue_time:
+            return self.faults.server_busy('Queued for too long.')
+        # Only the wait before a request's first call counts, not
+        # batch entries waiting on batch_concurrency (or calls made
+        # within a call.)
+        context.received = None
+        context.handler._RPC_received = None
+        if limit is not None and limit.max_in_flight is not None:
+            if limit.running >= limit.max_in_flight:
+                limit.rejected += 1
+                return self.faults.server_busy(
+                    'Too many calls to %s.' % rpc_method.name)
+            limit.running += 1
+            if context.admitted is None:
+                context.admitted = [None] * len(context.results)
+            context.admitted[index] = limit
+        return None
+
+    def release(self, context, index):
+        """ Frees the @limit slot the call at index was counted in. """
+        if context.admitted is not None and \
+                context.admitted[index] is not None:
+            context.admitted[index].running -= 1
+            context.admitted[index] = None
+
+    def reject(self, handler, message=None, fault='server_busy'):
+        """
+        Answers a request with a fault ('server_busy' unless another
+        is named), without parsing it, for requests that are shed or
+        refused as they arrive.
+        """
+        context = RPCContext(handler, self)
+        handler._RPC_context = context
+        context.prepare(1)
+        fault = getattr(self.faults, fault)(message)
+        if context.stats is not None:
+            context.stats.start(stats.REQUEST)
+            context.stats.finish(stats.REQUEST, 0.0, fault.faultCode)
+        return self.add_result(context, 0, fault)
+
+    def call(self, context, index, rpc_method, params, kwargs, extra_args):
+        """
+        Calls the method with the bound arguments and stores the
+        result -- now, or when it is ready if the method is
+        asynchronous or returns a Future.
+        """
+        handler = context.handler
+        if rpc_method.async and (len(context.results) > 1 or
+                                 context is not handler._RPC_context):
+            # Several results are outstanding (or this is a call
+            # within a call), so self.result has to know which one
+            # it is for.
+            method = rpc_method.get(RPCCall(handler, context, index))
+        else:
+            method = rpc_method.get(handler)
         try:
-            response = method(*extra_args, **final_kwargs)
+            if rpc_method.executor is not None:
+                # Runs in a thread / process pool, returning a Future
+                pool = get_executor(rpc_method.executor)
+                response = pool.submit(method, extra_args, kwargs)
+                if response is None:
+                    return self.add_result(
+                        context, index, self.faults.executor_busy())
+            else:
+                response = method(*extra_args, **kwargs)
         except Exception:
-            self.traceback(method_name, params)
-            return self.handler.result(self.faults.internal_error())
+            self.traceback(rpc_method.name, params, context, index)
+            return self.add_result(
+                context, index, self.faults.internal_error())
 
-        if getattr(method, 'async', False):
+        if convert_yielded is not None and hasattr(response, '__await__'):
+            # Native coroutine (async def)
+            response = convert_yielded(response)
+        if is_future(response):
+            # Coroutine or Future -- the result is sent when it resolves.
+            callback = functools.partial(
+                self.future_result, context, index, rpc_method.name, params)
+            tornado.ioloop.IOLoop.current().add_future(response, callback)
+            return self.watch(context, index, rpc_method, response)
+        if rpc_method.async:
             # Asynchronous response -- the method should have called
             # self.result(RESULT_VALUE)
             if response is not None:
                 # This should be deprecated to use self.result
-                return self.handler.result(self.faults.internal_error())
+                return self.add_result(
+                    context, index, self.faults.internal_error())
+            self.watch(context, index, rpc_method)
         else:
             # Synchronous result -- we call result manually.
-            return self.handler.result(response)
+            return self.add_result(context, index, response)
+
+    def watch(self, context, index, rpc_method, future=None):
+        """
+        Puts a call that is still running under its deadline -- the
+        method's @deadline or the call's own timeout, whichever is
+        sooner -- and keeps its Future to cancel if the call (or the
+        whole request) times out.
+        """
+        if context.results[index] is not PENDING:
+            # Already answered
+            return
+        timeout = rpc_method.deadline
+        requested = self.call_timeout(context, index)
+        if requested is not None and (timeout is None or requested < timeout):
+            timeout = requested
+        if timeout is None and context.deadline is None:
+            return
+        handle = None
+        if timeout is not None:
+            handle = tornado.ioloop.IOLoop.current().add_timeout(
+                time.time() + timeout,
+                functools.partial(self.expire, context, index, timeout))
+        if context.watches is None:
+            context.watches = {}
+        context.watches[index] = (handle, future)
+
+    def expire(self, context, index=None, timeout=None):
+        """
+        Answers the call at index (or every call of the request that
+        hasn't finished, if index is None) with a 'timeout' fault,
+        cancelling its Future. Results that arrive later are dropped.
+        A call keeps its @limit slot until its method finishes, but
+        for no more than timeout seconds longer, so a method that
+        never answers can't hold it for good.
+        """
+        if context.finished:
+            return
+        if index is None:
+            context.timer = None
+            # Calls that haven't been started never will be
+            context.started = len(context.calls)
+            indexes = [i for i, result in enumerate(context.results)
+                       if result is PENDING]
+        else:
+            indexes = [index]
+        if context.expired is None:
+            context.expired = set()
+        for index in indexes:
+            context.expired.add(index)
+            watch = None
+            if context.watches is not None:
+                watch = context.watches.get(index)
+            if watch is not None and watch[1] is not None:
+                cancel = getattr(watch[1], 'cancel', None)
+                if cancel is not None:
+                    cancel()
+            self.add_result(context, index, self.faults.timeout())
+            if timeout is not None and context.admitted is not None and \
+                    context.admitted[index] is not None:
+                tornado.ioloop.IOLoop.current().add_timeout(
+                    time.time() + timeout,
+                    functools.partial(self.release, context, index))
+
+    def call_timeout(self, context, index):
+        """
+        Extend this on protocols that let a call set its own timeout,
+        to return it in seconds (or None.)
+        """
+        return None
+
+    def cached_call(self, context, index, rpc_method, params, kwargs,
+                    extra_args):
+        """
+        Answers a call to a @cached method from its cache, by waiting
+        for an identical call that is already running, or by running
+        it (in its own context, so the result can be cached and
+        shared before it is stored.)
+        """
+        cache = rpc_method.cache
+        key = cache.make_key(rpc_method.name, kwargs, extra_args)
+        if key is None:
+            # Unhashable arguments
+            return self.call(
+                context, index, rpc_method, params, kwargs, extra_args)
+        result = cache.get(key)
+        if result is not MISSING:
+            return self.add_result(context, index, result)
+        if cache.join(key, (context, index)):
+            return
+        self.cached_run(cache, key, [(context, index)], rpc_method, params,
+                        kwargs, extra_args)
+
+    def cached_run(self, cache, key, waiters, rpc_method, params, kwargs,
+                   extra_args):
+        """
+        Runs a @cached method for waiters, led by the first of them.
+        If the leader times out or its client goes away before the
+        result is in, the run is dropped (the method's result, if it
+        ever comes, isn't used) and started again for the calls still
+        waiting, so they don't hang on a run nobody is waiting for.
+        """
+        context, index = waiters[0]
+        cache.start(key, *waiters)
+        call_context = RPCContext(context.handler, self)
+        call_context.prepare(1)
+        call_context.callback = functools.partial(
+            self.cache_result, cache, key)
 
-    def response(self, handler):
+        def abandon(gone=False):
+            # gone is True if the leader's client has gone away, so
+            # none of its request's calls are waiting any more
+            if call_context.finished:
+                return
+            # Nothing left to answer, so its result is dropped
+            call_context.callback = lambda results: None
+            self.expire(call_context, 0)
+            self.release(call_context, 0)
+            remaining = []
+            for waiting, at in cache.finish(key):
+                if waiting.results[at] is not PENDING or \
+                        waiting is context and (gone or at == index):
+                    continue
+                remaining.append((waiting, at))
+            if remaining:
+                self.cached_run(cache, key, remaining, rpc_method, params,
+                                kwargs, extra_args)
+
+        if context.watches is None:
+            context.watches = {}
+        context.watches[index] = (None, CachedRun(abandon))
+        self.call(call_context, 0, rpc_method, params, kwargs, extra_args)
+
+    def abandon(self, context):
         """
-        This is the callback for a single finished dispatch.
-        Once all the dispatches have been run, it calls the
-        parser library to parse responses and then calls the
-        handler's async method.
+        Hands over the @cached runs the calls of context lead, when
+        its client has gone away.
         """
-        handler._requests -= 1
-        if handler._requests > 0:
+        if context.watches is None:
             return
-        # We are finished with requests, send response
-        if handler._RPC_finished:
+        for handle, watched in context.watches.values():
+            if isinstance(watched, CachedRun):
+                watched.cancel(gone=True)
+
+    def cache_result(self, cache, key, results):
+        """ Caches the result (unless it is a fault) and sends it. """
+        result = results[0]
+        if not hasattr(result, 'faultCode'):
+            cache.set(key, result)
+        for context, index in cache.finish(key):
+            self.add_result(context, index, result)
+
+    def cached_response_call(self, context, index, rpc_method, params,
+                             kwargs, extra_args):
+        """
+        Answers a call to a @cached_response method with its
+        encoded result from the cache if possible, otherwise runs it
+        (in its own context) and encodes and caches the result. The
+        keys include the parser, since a method can be served in more
+        than one encoding.
+        """
+        cache = rpc_method.response_cache
+        key = None
+        if not cache.versioned:
+            key = cache.make_key(rpc_method.name, kwargs, extra_args)
+            if key is None:
+                # Unhashable arguments
+                return self.call(
+                    context, index, rpc_method, params, kwargs, extra_args)
+            key = (self, key)
+            data = cache.get(key)
+            if data is not MISSING:
+                return self.add_result(context, index, Encoded(data))
+        call_context = RPCContext(context.handler, self)
+        call_context.prepare(1)
+        call_context.callback = functools.partial(
+            self.cache_response, context, index, rpc_method.name, cache, key)
+        call_context.versioned = cache.versioned
+        self.call(call_context, 0, rpc_method, params, kwargs, extra_args)
+
+    def cache_response(self, context, index, method_name, cache, key,
+                       results):
+        """ Encodes and caches the result of a @cached_response call. """
+        result = results[0]
+        if isinstance(result, Versioned):
+            key = (self, method_name, result.version)
+            result = result.value
+            data = cache.get(key)
+            if data is not MISSING:
+                return self.add_result(context, index, Encoded(data))
+        if key is None or hasattr(result, 'faultCode'):
+            return self.add_result(context, index, result)
+        try:
+            data = self.encode_fragment(result)
+        except Exception:
+            # Not serializable -- left to the usual encoding
+            data = None
+        if data is None:
+            return self.add_result(context, index, result)
+        cache.set(key, data)
+        self.add_result(context, index, Encoded(data))
+
+    def future_result(self, context, index, method_name, params, future):
+        """ Stores the result of a Future returned by a method. """
+        if context.expired is not None and index in context.expired:
+            # Timed out (and possibly cancelled), but done now
+            self.release(context, index)
+            return
+        try:
+            result = future.result()
+        except Exception:
+            self.traceback(method_name, params, context, index)
+            result = self.faults.internal_error()
+        self.add_result(context, index, result)
+
+    def add_result(self, context, index, result):
+        """
+        Stores the result of the call at index, sending the
+        response if it was the last one outstanding and otherwise
+        starting any calls still waiting on the concurrency limit.
+        """
+        expired = context.expired is not None and index in context.expired
+        if context.results[index] is not PENDING:
+            if expired:
+                # Finished after its deadline
+                self.release(context, index)
+                return
+            raise Exception("Error trying to set a result twice.")
+        if context.watches is not None and index in context.watches:
+            handle = context.watches.pop(index)[0]
+            if handle is not None:
+                tornado.ioloop.IOLoop.current().remove_timeout(handle)
+        if isinstance(result, Versioned) and not context.versioned:
+            result = result.value
+        if not expired:
+            # A call that timed out keeps its slot until its method
+            # is really done
+            self.release(context, index)
+        if context.timings is not None and context.timings[index]:
+            context.stats.finish(
+                context.calls[index][0],
+                time.time() - context.timings[index],
+                getattr(result, 'faultCode', None))
+        context.results[index] = result
+        context.running -= 1
+        context.pending -= 1
+        if context.stream:
+            self.stream_results(context, index)
+        if context.pending == 0:
+            if context.timer is not None:
+                tornado.ioloop.IOLoop.current().remove_timeout(context.timer)
+                context.timer = None
+            return self.response(context)
+        if context.started < len(context.calls):
+            self.advance(context)
+
+    def stream_results(self, context, index):
+        """
+        Sends the encoded responses that are ready for a streamed
+        batch -- the result at index if the batch is streamed in
+        'completed' order, or every result that is next in line if
+        it is streamed in 'ordered' order. Sent results are dropped
+        from the context so they can be freed.
+        """
+        results = context.results
+        if context.stream == 'completed':
+            indexes = [index]
+        else:
+            indexes = []
+            while context.flushed < len(results) and \
+                    results[context.flushed] is not PENDING:
+                indexes.append(context.flushed)
+                context.flushed += 1
+        chunks = []
+        if context.stats is not None:
+            encode_start = time.time()
+        for ready in indexes:
+            encoded = self.encode_response(context, ready, results[ready])
+            results[ready] = None
+            if encoded is None:
+                # No response (a notification, etc.)
+                continue
+            if context.written:
+                chunks.append(self.stream_separator)
+            else:
+                chunks.append(self.stream_open)
+            chunks.append(encoded)
+            context.written += 1
+        if context.stats is not None:
+            context.stats.phase(
+                context.stats_name(), 'encode', time.time() - encode_start)
+        if chunks:
+            context.handler.on_result_chunk(''.join(chunks))
+
+    def response(self, context):
+        """
+        This is called once every call in the request has a
+        result. It calls the parser library to parse responses
+        and then calls the handler's async method.
+        """
+        if context.finished:
             # We've already sent the response
             raise Exception("Error trying to send response twice.")
-        handler._RPC_finished = True
-        responses = tuple(handler._results)
-        response_text = self.parse_responses(responses)
+        context.finished = True
+        if context.callback is not None:
+            return context.callback(context.results)
+        if context.stream:
+            # Everything else has been sent by stream_results
+            if not context.written:
+                return context.handler.on_result(
+                    self.stream_open + self.stream_close)
+            return context.handler.on_result(self.stream_close)
+        if context.stats is not None:
+            encode_start = time.time()
+        responses = tuple(context.results)
+        response_text = self.parse_responses(context, responses)
         if type(response_text) not in types.StringTypes:
             # Likely a fault, or something messed up
             response_text = self.encode(response_text)
+        if context.stats is not None:
+            context.stats.phase(
+                context.stats_name(), 'encode', time.time() - encode_start)
         # Calling the async callback
-        handler.on_result(response_text)
-
-    def traceback(self, method_name='REQUEST', params=[]):
-        err_lines = traceback.format_exc().splitlines()
-        err_title = "ERROR IN %s" % method_name
-        if len(params) > 0:
-            err_title = '%s - (PARAMS: %s)' % (err_title, repr(params))
-        err_sep = ('-'*len(err_title))[:79]
-        err_lines = [err_sep, err_title, err_sep]+err_lines
-        if config.verbose:
-            if len(err_lines) >= 7 and config.short_errors:
-                # Minimum number of lines to see what happened
-                # Plus title and separators
-                print '\n'.join(err_lines[0:4]+err_lines[-3:])
-            else:
-                print '\n'.join(err_lines)
-        # Log here
-        return
+        context.handler.on_result(response_text)
+
+    def traceback(self, method_name='REQUEST', params=[], context=None,
+                  index=None, fault='internal_error'):
+        """
+        Logs the exception being handled, raised by method_name (or
+        while parsing the REQUEST.) See tornadorpc.log.
+        """
+        request_id = None
+        if context is not None and index is not None:
+            request_id = self.request_id(context, index)
+        log.log_error(
+            method_name, params, Faults.codes.get(fault), request_id)
 
-    def parse_request(self, request_body):
+    def request_id(self, context, index):
         """
-        Extend this on the implementing protocol. If it
+        Extend this on protocols with request ids, to return the id
+        of the call at index for the error log.
+        """
+        return None
+
+    def parse_request(self, context, request_body):
+        """
+        Extend this on the implementing protocol. Any request
+        data needed to format the responses should be kept on
+        the context (an RPCContext), not the parser. If it
         should error out, return the output of the
         'self.faults.fault_name' response. Otherwise,
         it MUST return a TUPLE of TUPLE. Each entry
@@ -206,7 +894,7 @@ class BaseRPCParser(object):
         """
         return ([], [])
 
-    def parse_responses(self, responses):
+    def parse_responses(self, context, responses):
         """
         Extend this on the implementing protocol. It must
         return a response that can be returned as output to
@@ -214,19 +902,208 @@ class BaseRPCParser(object):
         """
         return self.encode(responses, methodresponse=True)
 
+    def encode_response(self, context, index, response):
+        """
+        Extend this on protocols that support streaming batches
+        (along with stream_open, stream_separator and stream_close.)
+        It must return the encoded response for the batch entry at
+        index, or None if that entry has no response.
+        """
+        raise NotImplementedError("Streaming is not supported.")
+
+    def encode_fragment(self, result):
+        """
+        Extend this on protocols that support @cached_response. It
+        must return the encoded result on its own, which
+        parse_responses and encode_response should then wrap
+        (when they are given it as an Encoded) rather than encoding
+        it again. Returning None disables the cache.
+        """
+        return None
+
+    def registry(self, handler):
+        """
+        Returns the MethodRegistry for the handler's class, building
+        it on the first request that class receives.
+        """
+        handler_class = type(handler)
+        registry = handler_class.__dict__.get('_RPC_registry_')
+        if registry is None:
+            registry = MethodRegistry(handler_class)
+            handler_class._RPC_registry_ = registry
+        return registry
+
     def check_method(self, attr_name, obj):
         """
         Just checks to see whether an attribute is private
         (by the decorator or by a leading underscore) and
         returns boolean result.
         """
-        if attr_name.startswith('_'):
-            raise AttributeError('Private object or method.')
-        attr = getattr(obj, attr_name)
+        return check_method(attr_name, obj)
 
-        if getattr(attr, 'private', False):
-            raise AttributeError('Private object or method.')
-        return attr
+
+def check_method(attr_name, obj):
+    """
+    Returns the attribute from obj, raising an AttributeError
+    if it is private (by the decorator or by a leading underscore).
+    """
+    if attr_name.startswith('_'):
+        raise AttributeError('Private object or method.')
+    attr = getattr(obj, attr_name)
+
+    if getattr(attr, 'private', False):
+        raise AttributeError('Private object or method.')
+    return attr
+
+
+class RPCMethod(object):
+    """
+    A resolved entry in a MethodRegistry. Handler methods are stored
+    as plain functions and bound to the handler on each call, while
+    methods on method trees are already bound to the tree object.
+    The binder validates and binds the call arguments, and is None
+    if the arguments can't be inspected (callable objects, etc.)
+    """
+    __slots__ = ('name', 'func', 'bound', 'private', 'async', 'executor',
+                 'cache', 'response_cache', 'limit', 'deadline', 'binder')
+
+    def __init__(self, name, func, bound=False):
+        self.name = name
+        self.func = func
+        self.bound = bound
+        self.private = bool(getattr(func, 'private', False))
+        self.async = getattr(func, 'async', False)
+        self.executor = getattr(func, 'executor', None)
+        self.cache = getattr(func, 'cache', None)
+        self.response_cache = getattr(func, 'response_cache', None)
+        self.limit = getattr(func, 'limit', None)
+        self.deadline = getattr(func, 'deadline', None)
+        try:
+            self.binder = CallBinder(func, skip=None if bound else 1)
+        except TypeError:
+            self.binder = None
+
+    def get(self, handler):
+        """ Returns the callable for this request's handler. """
+        if self.bound:
+            return self.func
+        return types.MethodType(self.func, handler, type(handler))
+
+
+class MethodRegistry(object):
+    """
+    Maps every public dotted method name on a handler class (including
+    method tree names like 'tree.power') to an RPCMethod. It is built
+    once per handler class, so dispatching is a single dict lookup.
+
+    Attributes that can only be resolved on the handler instance --
+    properties like XMLRPCHandler.system, or attributes set in
+    initialize() -- are not in the table and are looked up by walking
+    the attribute tree on each call, just as before. So are names the
+    instance sets over a class level attribute.
+    """
+    max_depth = 8
+    leaf_types = (
+        types.NoneType, types.BooleanType, types.IntType, types.LongType,
+        types.FloatType, types.ComplexType, types.StringTypes,
+        types.ListType, types.TupleType, types.DictType, types.ModuleType,
+        set, frozenset
+    )
+
+    def __init__(self, handler_class):
+        self.handler_class = handler_class
+        # Extra framework attributes a handler class doesn't expose
+        self.reserved = frozenset(
+            getattr(handler_class, '_RPC_reserved_', ()))
+        self.methods = {}
+        # Names defined at class level, whether or not they are methods.
+        # Anything else might be an instance attribute.
+        self.static = set()
+        # Dotted names of properties inside method trees.
+        self.dynamic = set()
+        attributes = {}
+        for klass in reversed(handler_class.__mro__):
+            attributes.update(vars(klass))
+        for attr_name, value in attributes.iteritems():
+            if self.is_reserved(attr_name):
+                # Pre-existing, not an implemented attribute
+                continue
+            if isinstance(value, types.FunctionType):
+                self.static.add(attr_name)
+                if not attr_name.startswith('_'):
+                    self.methods[attr_name] = RPCMethod(attr_name, value)
+            elif isinstance(value, (staticmethod, classmethod)):
+                self.static.add(attr_name)
+                if not attr_name.startswith('_'):
+                    self.methods[attr_name] = RPCMethod(
+                        attr_name, getattr(handler_class, attr_name),
+                        bound=True)
+            elif not hasattr(type(value), '__get__'):
+                # Plain objects are method trees, everything else
+                # (properties, etc.) has to be resolved per request.
+                self.static.add(attr_name)
+                if not attr_name.startswith('_'):
+                    self.add_tree(attr_name, value, set())
+
+    def is_reserved(self, attr_name):
+        return hasattr(BaseRPCHandler, attr_name) or \
+            attr_name in self.reserved
+
+    def add_tree(self, name, obj, seen):
+        """ Registers obj (and its public attributes) under name. """
+        if getattr(obj, 'private', False) or isinstance(obj, self.leaf_types):
+            return
+        if callable(obj):
+            self.methods[name] = RPCMethod(name, obj, bound=True)
+            return
+        if id(obj) in seen or name.count('.') >= self.max_depth:
+            return
+        seen = seen | set([id(obj)])
+        for attr_name in dir(obj):
+            if attr_name.startswith('_'):
+                continue
+            if isinstance(getattr(type(obj), attr_name, None), property):
+                self.dynamic.add('%s.%s' % (name, attr_name))
+                continue
+            try:
+                attr = getattr(obj, attr_name)
+            except AttributeError:
+                continue
+            self.add_tree('%s.%s' % (name, attr_name), attr, seen)
+
+    def lookup(self, handler, method_name):
+        """
+        Returns the RPCMethod for method_name on the handler, or None
+        if there is no public method by that name.
+        """
+        attr_tree = method_name.split('.')
+        # Set on the instance (e.g. in initialize()), over any class
+        # level attribute of the same name
+        shadowed = attr_tree[0] in getattr(handler, '__dict__', ())
+        method = None if shadowed else self.methods.get(method_name)
+        if method is not None:
+            if method.private:
+                return None
+            return method
+        if self.is_reserved(attr_tree[0]):
+            return None
+        if attr_tree[0] in self.static and not shadowed:
+            for i in range(2, len(attr_tree)):
+                if '.'.join(attr_tree[:i]) in self.dynamic:
+                    break
+            else:
+                return None
+        # Not resolvable from the class, so walk the instance.
+        method = handler
+        try:
+            for attr_name in attr_tree:
+                method = check_method(attr_name, method)
+        except AttributeError:
+            return None
+        if not callable(method):
+            # Not callable, so not a method
+            return None
+        return RPCMethod(method_name, method, bound=True)
 
 
 class BaseRPCHandler(RequestHandler):
@@ -235,31 +1112,160 @@ class BaseRPCHandler(RequestHandler):
     implementations and by the end user.
     """
     _RPC_ = None
-    _results = None
-    _requests = 0
-    _RPC_finished = False
+    _RPC_context = None
+    # RPC requests being handled by this process, for shutdown
+    _RPC_in_flight = 0
+    # When the request arrived, for config.max_queue_time
+    _RPC_received = None
+    # Request header with the seconds the client will wait
+    timeout_header = 'X-RPC-Timeout'
+    # Bytes of a response compressed at a time
+    compress_chunk_size = 64 * 1024
+    # Set to 'ordered' or 'completed' to send each batch response
+    # as soon as it is ready (in request or in completion order.)
+    stream_batches = None
 
     @tornado.web.asynchronous
     def post(self):
         # Very simple -- dispatches request body to the parser
         # and returns the output
-        self._results = []
-        request_body = self.request.body
+        BaseRPCHandler._RPC_in_flight += 1
+        self._RPC_counted = True
+        # Set as the headers are read, so time spent waiting on the
+        # IOLoop (and receiving the body) counts
+        self._RPC_received = getattr(
+            self.request, '_start_time', None) or time.time()
+        if config.max_in_flight is not None:
+            # Shed before the body is decoded
+            reason = self._RPC_overloaded()
+            if reason is not None:
+                return self._RPC_.reject(self, reason)
+        request_body = self._RPC_request_body()
         self._RPC_.run(self, request_body)
 
+    def _RPC_overloaded(self):
+        # Why the request can't be taken on, or None if it can
+        if config.max_in_flight is not None and \
+                BaseRPCHandler._RPC_in_flight > config.max_in_flight:
+            return 'Too many requests.'
+        return None
+
+    def _RPC_timeout(self):
+        # The request's timeout from the client, or None
+        value = self.request.headers.get(self.timeout_header)
+        if value is None:
+            return None
+        try:
+            timeout = float(value)
+        except ValueError:
+            return None
+        if timeout != timeout or timeout < 0:
+            # NaN or negative
+            return None
+        return timeout
+
+    def _RPC_request_body(self):
+        # Returns what the parser's parse_request is given
+        return self._RPC_decoded_body(self.request.body)
+
+    def _RPC_decoded_body(self, body):
+        # Decompresses the body if it has a Content-Encoding
+        encoding = self.request.headers.get('Content-Encoding')
+        if not encoding or encoding.lower() == 'identity':
+            return body
+        try:
+            decoder = compression.decompressor(
+                encoding, config.max_decompressed_size)
+        except ValueError:
+            raise tornado.web.HTTPError(415)
+        try:
+            return decoder.decompress(body)
+        except ValueError:
+            raise tornado.web.HTTPError(400)
+
+    def on_finish(self):
+        self._RPC_uncount()
+
+    def on_connection_close(self):
+        # An @async call may never answer a client that has gone
+        self._RPC_uncount()
+        context = self._RPC_context
+        if context is not None and not context.finished:
+            self._RPC_.abandon(context)
+
+    def _RPC_uncount(self):
+        if getattr(self, '_RPC_counted', False):
+            BaseRPCHandler._RPC_in_flight -= 1
+            self._RPC_counted = False
+
     def result(self, result, *results):
         """ Use this to return a result. """
         if results:
-            results = [result] + results
-        else:
-            results = result
-        self._results.append(results)
-        self._RPC_.response(self)
+            result = [result] + list(results)
+        context = self._RPC_context
+        if context.expired is not None and PENDING not in context.results:
+            # Finished after its deadline
+            if len(context.results) == 1:
+                context.parser.release(context, 0)
+            return
+        context.parser.add_result(context, context.next_pending(), result)
 
     def on_result(self, response_text):
         """ Asynchronous callback. """
         self.set_header('Content-Type', self._RPC_.content_type)
-        self.finish(response_text)
+        compressor = getattr(self, '_RPC_compressor', None)
+        if compressor is None and config.compress and \
+                len(response_text) >= config.compress_min_size:
+            compressor = self._RPC_start_compression()
+        if compressor is None:
+            return self.finish(response_text)
+        self._RPC_write_compressed(response_text, 0)
+
+    def on_result_chunk(self, response_text):
+        """ Sends part of a streamed response. """
+        self.set_header('Content-Type', self._RPC_.content_type)
+        if not hasattr(self, '_RPC_compressor'):
+            # The first chunk -- the size of the rest isn't known
+            self._RPC_compressor = None
+            if config.compress:
+                self._RPC_start_compression()
+        compressor = self._RPC_compressor
+        if compressor is not None:
+            response_text = compressor.compress(response_text) + \
+                compressor.sync()
+        self.write(response_text)
+        self.flush()
+
+    def _RPC_start_compression(self):
+        # Picks the encoding for the response, returning its
+        # compressor (or None to send it as it is)
+        self.add_header('Vary', 'Accept-Encoding')
+        encoding = compression.negotiate(
+            self.request.headers.get('Accept-Encoding'),
+            config.compress_encodings)
+        self._RPC_compressor = None
+        if encoding is not None:
+            self.set_header('Content-Encoding', encoding)
+            self._RPC_compressor = compression.compressor(
+                encoding, config.compress_level)
+        return self._RPC_compressor
+
+    def _RPC_write_compressed(self, response_text, offset):
+        # Compresses and sends the response a chunk at a time,
+        # waiting for each chunk to be sent before compressing the
+        # next, so the compressed copy is never held in full
+        compressor = self._RPC_compressor
+        size = self.compress_chunk_size
+        while True:
+            end = offset + size
+            data = compressor.compress(response_text[offset:end])
+            if end >= len(response_text):
+                return self.finish(data + compressor.flush())
+            offset = end
+            if data:
+                self.write(data)
+                return self.flush(callback=functools.partial(
+                    self._RPC_write_compressed, response_text, offset))
 
 
 class FaultMethod(object):
@@ -299,7 +1305,10 @@ class Faults(object):
         'method_not_found': -32601,
         'invalid_request': -32600,
         'invalid_params': -32602,
-        'internal_error': -32603
+        'internal_error': -32603,
+        'executor_busy': -32001,
+        'timeout': -32002,
+        'server_busy': -32003
     }
 
     messages = {}
@@ -349,13 +1358,242 @@ def async(func):
     return func
 
 
-def start_server(handlers, route=r'/', port=8080):
+def cached(func=None, maxsize=1024, ttl=None):
+    """
+    Use this to cache the results of a method that always returns
+    the same result for the same arguments. It is intended to be
+    used as a decorator, either bare or with options:
+
+        @cached
+        def lookup(self, key): ...
+
+        @cached(maxsize=10000, ttl=60)
+        def lookup(self, key): ...
+
+    Results are cached by method name and arguments (after defaults
+    are filled in) for ttl seconds (forever if None), keeping the
+    maxsize most recently used. Faults are not cached. While a call
+    is running, identical calls wait for its result instead of
+    running the method again. The ResultCache, with its hit, miss
+    and eviction counts, is the method's 'cache' attribute.
+    """
+    if func is None:
+        return functools.partial(cached, maxsize=maxsize, ttl=ttl)
+    func.cache = ResultCache(maxsize, ttl)
+    return func
+
+
+def cached_response(func=None, maxbytes=16 * 1024 * 1024, ttl=None,
+                    versioned=False):
+    """
+    Use this to cache the encoded response of a method that returns
+    a large result, so that it isn't encoded again for every call.
+    Like @cached, it is used bare or with options:
+
+        @cached_response(maxbytes=64 * 1024 * 1024, ttl=300)
+        def catalog(self, section): ...
+
+    By default the encoded results are cached by the method's
+    arguments, and the method isn't called while its result is
+    cached. With versioned=True, the method is always called and
+    returns a Versioned(version, result) -- the result is only
+    encoded the first time each version is returned. The least
+    recently used results are dropped to keep the total size of the
+    cache under maxbytes. Faults are not cached.
+    """
+    if func is None:
+        return functools.partial(
+            cached_response, maxbytes=maxbytes, ttl=ttl, versioned=versioned)
+    func.response_cache = EncodedCache(maxbytes, ttl, versioned)
+    return func
+
+
+def deadline(seconds):
+    """
+    Use this to give up on an @async (or Future returning) method
+    that takes too long. It is intended to be used as a decorator:
+
+        @deadline(5)
+        @async
+        def fetch(self, url): ...
+
+    If the method hasn't returned a result seconds after it was
+    called, the client gets a 'timeout' fault, and its Future (if
+    it returned one) is cancelled. A result sent later is dropped.
+    """
+    def decorator(func):
+        func.deadline = seconds
+        return func
+    return decorator
+
+
+def limit(func=None, max_in_flight=None, priority='normal'):
+    """
+    Use this to set how a method is treated under load. It is
+    intended to be used as a decorator with options:
+
+        @limit(max_in_flight=10)
+        def report(self, month): ...
+
+        @limit(priority='low')
+        def export(self): ...
+
+    Calls beyond max_in_flight running at once get a 'server_busy'
+    fault. The priority ('high', 'normal' or 'low', or any other
+    key of config.priorities) sets how much of config.max_in_flight
+    calls to the method may use, so that low priority calls are shed
+    first. The CallLimit, with its running and rejected counts, is
+    the method's 'limit' attribute.
+    """
+    if priority not in config.priorities:
+        raise ValueError('Unknown priority %r.' % priority)
+    if func is None:
+        return functools.partial(
+            limit, max_in_flight=max_in_flight, priority=priority)
+    func.limit = CallLimit(max_in_flight, priority)
+    return func
+
+
+class CallLimit(object):
+    """ The in-flight limit and priority of a @limit method. """
+    __slots__ = ('max_in_flight', 'priority', 'running', 'rejected')
+
+    def __init__(self, max_in_flight=None, priority='normal'):
+        self.max_in_flight = max_in_flight
+        self.priority = priority
+        self.running = 0
+        self.rejected = 0
+
+
+def executor(func=None, pool='default'):
+    """
+    Use this to run a CPU-bound (or blocking) method in an executor
+    pool instead of on the IOLoop. It is intended to be used as a
+    decorator, either bare for the 'default' thread pool or with
+    the name of a pool added with register_executor:
+
+        @executor
+        def score(self, data): ...
+
+        @executor(pool='scoring')
+        def score(self, data): ...
+
+    The return value is sent just like a synchronous method's. If
+    the pool is full, the client gets an 'executor_busy' fault.
+    Methods run in a process pool are called with None for self,
+    since the handler can't be sent to another process.
+    """
+    if func is None or isinstance(func, basestring):
+        if func is not None:
+            pool = func
+        return functools.partial(executor, pool=pool)
+    func.executor = pool
+    func.executor_key = '%s.%s:%d' % (
+        func.__module__, func.__name__, func.func_code.co_firstlineno)
+    _process_functions[func.executor_key] = func
+    return func
+
+
+# Functions available to process pools, by executor_key
+_process_functions = {}
+
+
+def _call_in_process(key, args, kwargs):
+    # Runs in the pool process, which has the same functions
+    # registered since it was forked from (or imported) this one.
+    return _process_functions[key](None, *args, **kwargs)
+
+
+class ExecutorPool(object):
+    """
+    Wraps a ThreadPoolExecutor or ProcessPoolExecutor for @executor
+    methods, optionally limiting the number of calls that may be
+    queued or running in it at once.
+    """
+
+    def __init__(self, executor, max_pending=None):
+        self.executor = executor
+        self.max_pending = max_pending
+        self.pending = 0
+        self.processes = isinstance(executor, futures.ProcessPoolExecutor)
+
+    def submit(self, method, args, kwargs):
+        """
+        Returns a Future for the method call, or None if the pool is
+        full or refuses the call (because it was shut down, etc.)
+        """
+        if self.max_pending is not None and \
+                self.pending >= self.max_pending:
+            return None
+        try:
+            if self.processes:
+                key = getattr(method, 'im_func', method).executor_key
+                future = self.executor.submit(
+                    _call_in_process, key, args, kwargs)
+            else:
+                future = self.executor.submit(method, *args, **kwargs)
+        except RuntimeError:
+            return None
+        self.pending += 1
+        # Released on the IOLoop so that pending is only ever
+        # changed from the IOLoop thread.
+        tornado.ioloop.IOLoop.current().add_future(future, self._release)
+        return future
+
+    def _release(self, future):
+        self.pending -= 1
+
+
+executors = {}
+
+
+def register_executor(name, executor, max_pending=None):
+    """
+    Adds a ThreadPoolExecutor or ProcessPoolExecutor that @executor
+    methods can use by name. If max_pending is set, calls beyond that
+    many queued or running calls are rejected with an 'executor_busy'
+    fault. Registering 'default' replaces the built-in thread pool.
+    """
+    if futures is None:
+        raise ImportError(
+            "Executors require concurrent.futures ('futures' on Python 2)")
+    executors[name] = ExecutorPool(executor, max_pending)
+    return executors[name]
+
+
+def get_executor(name):
+    """ Returns the named ExecutorPool, creating 'default' on demand. """
+    pool = executors.get(name)
+    if pool is None:
+        if name != 'default':
+            raise KeyError("No executor pool named '%s'." % name)
+        pool = register_executor(
+            name, futures.ThreadPoolExecutor(config.executor_workers),
+            config.executor_max_pending)
+    return pool
+
+
+def start_server(handlers, route=r'/', port=8080, processes=1,
+                 max_restarts=100, shutdown_timeout=10, max_body_size=None):
     """
     This is just a friendly wrapper around the default
     Tornado instantiation calls. It simplifies the imports
     and setup calls you'd make otherwise.
     USAGE:
         start_server(handler_class, route=r'/', port=8181)
+
+    Set processes to fork that many worker processes (0 for one per
+    CPU) sharing the listening sockets, which are bound once before
+    forking. Workers that crash are restarted, up to max_restarts
+    times in total. On SIGTERM each process stops accepting
+    connections and waits up to shutdown_timeout seconds for the
+    RPC calls in progress before stopping its IOLoop. Workers also
+    shut down this way if the parent process goes away.
+
+    Set max_body_size to close connections whose Content-Length is
+    larger, before the body is read. (Before Tornado 4.0 the body is
+    always read before the handler runs, so this is the only bound
+    that applies then.)
     """
     if type(handlers) not in (types.ListType, types.TupleType):
         handler = handlers
@@ -364,8 +1602,15 @@ def start_server(handlers, route=r'/', port=8080):
             # friendly addition for /RPC2 if it's the only one
             handlers.append(('/RPC2', handler))
     application = tornado.web.Application(handlers)
-    http_server = tornado.httpserver.HTTPServer(application)
-    http_server.listen(port)
+    sockets = tornado.netutil.bind_sockets(port)
+    if processes != 1:
+        parent_pid = os.getpid()
+        tornado.process.fork_processes(processes, max_restarts)
+    options = {}
+    if max_body_size is not None:
+        options['max_buffer_size'] = max_body_size
+    http_server = tornado.httpserver.HTTPServer(application, **options)
+    http_server.add_sockets(sockets)
     loop_instance = tornado.ioloop.IOLoop.instance()
     """ Setting the '_server' attribute if not set """
     for (route, handler) in handlers:
@@ -373,10 +1618,53 @@ def start_server(handlers, route=r'/', port=8080):
             setattr(handler, '_server', loop_instance)
         except AttributeError:
             handler._server = loop_instance
+    shutdown = GracefulShutdown(http_server, loop_instance, shutdown_timeout)
+    try:
+        signal.signal(
+            signal.SIGTERM,
+            lambda signum, frame: loop_instance.add_callback_from_signal(
+                shutdown))
+    except ValueError:
+        # Signals can only be handled in the main thread
+        pass
+    if processes != 1:
+        def check_parent():
+            if os.getppid() != parent_pid:
+                shutdown()
+        tornado.ioloop.PeriodicCallback(
+            check_parent, 1000, io_loop=loop_instance).start()
     loop_instance.start()
     return loop_instance
 
 
+class GracefulShutdown(object):
+    """
+    Stops an HTTPServer from accepting connections, then calls
+    callback (the IOLoop's stop method by default) once there are
+    no RPC requests left in progress, or after timeout seconds.
+    Calling it again while it is waiting does nothing.
+    """
+
+    def __init__(self, http_server, io_loop, timeout, callback=None):
+        self.http_server = http_server
+        self.io_loop = io_loop
+        self.timeout = timeout
+        self.callback = callback or io_loop.stop
+        self.deadline = None
+
+    def __call__(self):
+        if self.deadline is not None:
+            return
+        self.deadline = self.io_loop.time() + self.timeout
+        self.http_server.stop()
+        self.check()
+
+    def check(self):
+        if BaseRPCHandler._RPC_in_flight <= 0 or \
+                self.io_loop.time() >= self.deadline:
+            return self.callback()
+        self.io_loop.add_timeout(self.io_loop.time() + 0.05, self.check)
+
 """
 The following is a test implementation which should work
 for both the XMLRPC and the JSONRPC clients.
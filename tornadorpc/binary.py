@@ -0,0 +1,232 @@
+"""
+=============================================
+MessagePack-RPC / CBOR-RPC Handlers for Tornado
+=============================================
+JSON-RPC 2.0 (ids, batches, notifications and fault codes) with the
+requests and responses encoded as MessagePack or CBOR instead of
+JSON, which is smaller and faster for numbers and binary data. Needs
+the msgpack and / or cbor2 packages.
+
+>>> from tornadorpc.binary import MsgPackRPCHandler
+>>>
+>>> class handler(MsgPackRPCHandler):
+>>> ... def add(self, x, y):
+>>> ....... return x+y
+>>>
+>>> start_server(handler, port=8484)
+
+Every handler here serves all the installed encodings on one
+endpoint, picking the one to use from the request's Content-Type
+(application/msgpack, application/cbor or application/json); the
+handler's own encoding is used if there is no Content-Type or it is
+unknown. Byte strings (str) are sent as binary values as they are,
+without base64, and unicode strings as text.
+"""
+
+from __future__ import absolute_import
+import collections
+import struct
+import xmlrpclib
+import tornado.web
+from jsonrpclib.jsonrpc import Fault
+from tornadorpc.base import BaseRPCHandler
+from tornadorpc.json import JSONRPCParser, JSONCodec
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+
+def binary_value(value):
+    # xmlrpclib.Binary (as used with XML-RPC) is sent as bytes
+    if isinstance(value, xmlrpclib.Binary):
+        return value.data
+    raise TypeError('%r is not serializable' % (value,))
+
+
+def fault_message(fault):
+    message = fault.faultString
+    if isinstance(message, str):
+        message = message.decode('utf-8', 'replace')
+    return message
+
+
+class BinaryCodec(object):
+    """
+    The base of the binary codecs. Like JSONCodec, they write the
+    response envelopes directly, around the encoded result.
+    Subclasses provide dumps, loads and the map and array headers.
+    """
+    Fault = Fault
+    content_type = None
+    # The start and end of a streamed batch, or None if the format
+    # can't have arrays of unknown length
+    stream_open = None
+    stream_separator = ''
+    stream_close = None
+
+    def __init__(self):
+        dumps = self.dumps
+        # The start of every result envelope, up to the id
+        self.head = self.map_header(3) + dumps(u'jsonrpc') + \
+            dumps(u'2.0') + dumps(u'id')
+        self.result_key = dumps(u'result')
+
+    def encode_result(self, result, rpcid, version):
+        if isinstance(result, Fault):
+            return self.encode_fault(result, rpcid, version)
+        return self.wrap_result(self.dumps(result), rpcid, version)
+
+    def encode_fragment(self, result):
+        return self.dumps(result)
+
+    def wrap_result(self, encoded_result, rpcid, version):
+        """ Builds a response around an already encoded result. """
+        return '%s%s%s%s' % (
+            self.head, self.dumps(rpcid), self.result_key, encoded_result)
+
+    def encode_fault(self, fault, rpcid, version):
+        return self.dumps({
+            u'jsonrpc': u'2.0', u'id': rpcid,
+            u'error': {u'code': fault.faultCode,
+                       u'message': fault_message(fault)}})
+
+    def encode_array(self, encoded_items):
+        """ Builds an array from already encoded items. """
+        return self.array_header(len(encoded_items)) + ''.join(encoded_items)
+
+
+class MsgPackCodec(BinaryCodec):
+    content_type = 'application/msgpack'
+    default = staticmethod(binary_value)
+
+    def __init__(self):
+        if msgpack is None:
+            raise ImportError('MsgPackCodec needs the msgpack package.')
+        BinaryCodec.__init__(self)
+
+    def dumps(self, value):
+        return msgpack.packb(value, use_bin_type=True, default=self.default)
+
+    def loads(self, data):
+        return msgpack.unpackb(data, raw=False)
+
+    def map_header(self, size):
+        return chr(0x80 | size)
+
+    def array_header(self, size):
+        if size < 16:
+            return chr(0x90 | size)
+        if size < 0x10000:
+            return '\xdc' + struct.pack('>H', size)
+        return '\xdd' + struct.pack('>I', size)
+
+
+class CBORCodec(BinaryCodec):
+    content_type = 'application/cbor'
+    # Indefinite length array
+    stream_open = '\x9f'
+    stream_close = '\xff'
+
+    def __init__(self):
+        if cbor2 is None:
+            raise ImportError('CBORCodec needs the cbor2 package.')
+        BinaryCodec.__init__(self)
+
+    def dumps(self, value):
+        return cbor2.dumps(value, default=self.default)
+
+    def loads(self, data):
+        return cbor2.loads(data)
+
+    @staticmethod
+    def default(encoder, value):
+        encoder.encode(binary_value(value))
+
+    def map_header(self, size):
+        return self.header(0xa0, size)
+
+    def array_header(self, size):
+        return self.header(0x80, size)
+
+    def header(self, major, size):
+        if size < 24:
+            return chr(major | size)
+        if size < 0x100:
+            return chr(major | 24) + chr(size)
+        if size < 0x10000:
+            return chr(major | 25) + struct.pack('>H', size)
+        return chr(major | 26) + struct.pack('>I', size)
+
+
+class BinaryRPCParser(JSONRPCParser):
+    """ A JSONRPCParser for a binary codec. """
+
+    def __init__(self, library, encode=None, decode=None):
+        JSONRPCParser.__init__(self, library, encode, decode)
+        self.content_type = library.content_type
+        self.stream_open = library.stream_open
+        self.stream_separator = library.stream_separator
+        self.stream_close = library.stream_close
+
+    def parse_request(self, context, request_body):
+        requests = JSONRPCParser.parse_request(self, context, request_body)
+        if isinstance(requests, Fault):
+            # A jsonrpclib Fault's response() would be JSON
+            return self.library.encode_fault(requests, None, 2.0)
+        return requests
+
+    def join_responses(self, response_list):
+        return self.library.encode_array(response_list)
+
+
+# The parser for each content type, for the installed libraries
+parsers = collections.OrderedDict()
+msgpack_parser = None
+cbor_parser = None
+if msgpack is not None:
+    msgpack_parser = BinaryRPCParser(MsgPackCodec())
+    parsers['application/msgpack'] = msgpack_parser
+    parsers['application/x-msgpack'] = msgpack_parser
+if cbor2 is not None:
+    cbor_parser = BinaryRPCParser(CBORCodec())
+    parsers['application/cbor'] = cbor_parser
+json_parser = JSONRPCParser(JSONCodec())
+parsers['application/json'] = json_parser
+parsers['application/json-rpc'] = json_parser
+
+
+class MsgPackRPCHandler(BaseRPCHandler):
+    """
+    Subclass this to add methods, like a JSONRPCHandler. Requests
+    without a known Content-Type are taken as MessagePack.
+    """
+    _RPC_ = msgpack_parser
+    _RPC_parsers_ = parsers
+
+    def post(self):
+        content_type = self.request.headers.get('Content-Type', '')
+        content_type = content_type.split(';')[0].strip().lower()
+        parser = self._RPC_parsers_.get(content_type, type(self)._RPC_)
+        if parser is None:
+            # The handler's own library isn't installed
+            raise tornado.web.HTTPError(415)
+        # Used for the rest of the request
+        self._RPC_ = parser
+        if parser.stream_open is None:
+            self.stream_batches = None
+        return BaseRPCHandler.post(self)
+
+
+class CBORRPCHandler(MsgPackRPCHandler):
+    """
+    Like MsgPackRPCHandler, but requests without a known
+    Content-Type are taken as CBOR.
+    """
+    _RPC_ = cbor_parser
@@ -0,0 +1,160 @@
+"""
+Result caching for the TornadoRPC library. Use the 'cached'
+decorator in tornadorpc.base rather than these classes directly.
+"""
+
+from collections import OrderedDict
+import time
+
+# Returned by ResultCache.get when there is no (fresh) entry
+MISSING = object()
+
+
+def freeze(value):
+    """
+    Returns a hashable version of an RPC value -- lists become tuples
+    and dicts become tagged, sorted tuples of their items. Numbers
+    are tagged with their type, since 1, 1.0 and True are equal (and
+    hash the same) in Python but are different RPC values.
+    """
+    if isinstance(value, bool):
+        return (bool, value)
+    if isinstance(value, float):
+        return (float, value)
+    if isinstance(value, (int, long)):
+        return (int, value)
+    if isinstance(value, dict):
+        return (dict, tuple(sorted(
+            (key, freeze(item)) for key, item in value.iteritems())))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class ResultCache(object):
+    """
+    A least-recently-used cache of method results, holding up to
+    maxsize entries for ttl seconds each (or until evicted, if ttl is
+    None). If maxbytes is set, the values must be strings, and the
+    least recently used are also evicted to keep their total length
+    under maxbytes. It also keeps track of calls in flight, so that
+    identical calls made while the first one is still running can
+    wait for its result instead of running the method again.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, maxbytes=None,
+                 clock=time.time):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.in_flight = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+    def make_key(self, method_name, kwargs, extra_args):
+        """
+        Returns the cache key for a call with the bound arguments,
+        or None if the arguments can't be used as a key.
+        """
+        key = (method_name, freeze(kwargs), freeze(extra_args))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def get(self, key):
+        """ Returns the cached result for key, or MISSING. """
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            self.misses += 1
+            return MISSING
+        expires, value, size = entry
+        if expires is not None and expires <= self.clock():
+            self.bytes -= size
+            self.misses += 1
+            return MISSING
+        # Re-inserting moves it to the most recently used end
+        self.entries[key] = entry
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        expires = None
+        if self.ttl is not None:
+            expires = self.clock() + self.ttl
+        size = 0
+        if self.maxbytes is not None:
+            size = len(value)
+            if size > self.maxbytes:
+                # It would push everything else out
+                return
+        self.discard(key)
+        self.entries[key] = (expires, value, size)
+        self.bytes += size
+        while self.maxsize is not None and \
+                len(self.entries) > self.maxsize or \
+                self.maxbytes is not None and self.bytes > self.maxbytes:
+            self.bytes -= self.entries.popitem(last=False)[1][2]
+            self.evictions += 1
+
+    def discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def join(self, key, waiter):
+        """
+        Adds waiter to the call in flight for key and returns True,
+        or returns False if there isn't one.
+        """
+        waiters = self.in_flight.get(key)
+        if waiters is None:
+            return False
+        waiters.append(waiter)
+        self.coalesced += 1
+        return True
+
+    def start(self, key, *waiters):
+        """ Records that the call for key is running for waiters. """
+        self.in_flight[key] = list(waiters)
+
+    def finish(self, key):
+        """ Returns the waiters for key, which is no longer in flight. """
+        return self.in_flight.pop(key, [])
+
+    def clear(self):
+        """ Empties the cache and resets the counters. """
+        self.entries.clear()
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = self.coalesced = 0
+
+    def stats(self):
+        return {
+            'size': len(self.entries),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'coalesced': self.coalesced,
+            'in_flight': len(self.in_flight),
+        }
+
+
+class EncodedCache(ResultCache):
+    """
+    A cache of encoded results, limited by their total length.
+    If versioned is True, the results are cached by the version
+    tag the method returns (in a Versioned) rather than by the
+    call arguments.
+    """
+
+    def __init__(self, maxbytes, ttl=None, versioned=False,
+                 clock=time.time):
+        ResultCache.__init__(self, None, ttl, maxbytes, clock)
+        self.versioned = versioned
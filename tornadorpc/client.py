@@ -0,0 +1,444 @@
+"""
+=====================================
+Asynchronous JSON-RPC / XML-RPC Client
+=====================================
+Clients for calling RPC servers from within the IOLoop, without
+blocking it like jsonrpclib's and xmlrpclib's clients. Every call
+returns a Future, so they are used from coroutines:
+
+>>> from tornadorpc.client import JSONRPCClient
+>>>
+>>> client = JSONRPCClient('http://localhost:8080/')
+>>>
+>>> @gen.coroutine
+>>> def power():
+>>> ... result = yield client.tree.power(2, 6)
+>>> ... raise gen.Return(result)
+
+Attribute access builds the (dotted) method name, so methods that
+share a name with the client's own (call, batch, close...) are
+called with client.call('close', params). Faults are raised as
+xmlrpclib.Fault for both protocols (jsonrpclib's Fault isn't an
+exception), and HTTP errors (including timeouts, code 599) as
+tornado's HTTPError.
+
+Calls made while others are in flight are sent straight away on
+their own connections, up to max_clients at once, and queued after
+that. If pycurl is installed, connections are kept alive and reused.
+"""
+
+from __future__ import absolute_import
+import functools
+import itertools
+import time
+import xmlrpclib
+from tornado import gen
+from tornado.concurrent import Future
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+from tornado.ioloop import IOLoop
+from tornadorpc.json import json_functions
+
+Fault = xmlrpclib.Fault
+
+try:
+    import pycurl
+except ImportError:
+    pycurl = None
+
+
+def pooled_http_client(max_clients=10):
+    """
+    Returns a new AsyncHTTPClient for up to max_clients requests at
+    once -- a CurlAsyncHTTPClient (which keeps connections alive) if
+    pycurl is installed.
+    """
+    if pycurl is not None:
+        from tornado.curl_httpclient import CurlAsyncHTTPClient
+        return CurlAsyncHTTPClient(
+            force_instance=True, max_clients=max_clients)
+    return AsyncHTTPClient(force_instance=True, max_clients=max_clients)
+
+
+class Method(object):
+    """
+    A remote method -- calling it sends the call (with either
+    positional or keyword arguments), and getting an attribute
+    returns the method of that name in its namespace.
+    """
+    __slots__ = ('_send', '_name')
+
+    def __init__(self, send, name):
+        self._send = send
+        self._name = name
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return Method(self._send, '%s.%s' % (self._name, name))
+
+    def __call__(self, *args, **kwargs):
+        if args and kwargs:
+            raise TypeError("Can't mix positional and keyword arguments.")
+        return self._send(self._name, kwargs or args)
+
+
+class Proxy(object):
+    """ Returns a Method, sent with send, for any attribute. """
+    __slots__ = ('_send',)
+
+    def __init__(self, send):
+        self._send = send
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return Method(self._send, name)
+
+
+class RPCClient(object):
+    """
+    The base of the clients. Subclasses implement send(method,
+    params, timeout) to send a call on its own and return a Future
+    for the result, and batch() to return a batch of calls.
+
+    If coalesce is True, calls made within window seconds of each
+    other (by default, during the same IOLoop iteration) are sent
+    together as one batch, of up to max_calls calls or max_bytes
+    bytes. Calls with their own timeout are sent on their own.
+    """
+    content_type = 'text/plain'
+
+    def __init__(self, url, timeout=20, http_client=None, max_clients=10,
+                 headers=None, coalesce=False, window=0, max_calls=100,
+                 max_bytes=None):
+        self.url = url
+        self.timeout = timeout
+        self.http_client = http_client or pooled_http_client(max_clients)
+        self.headers = {'Content-Type': self.content_type}
+        self.headers.update(headers or {})
+        self.coalescer = None
+        if coalesce:
+            self.coalescer = Coalescer(self, window, max_calls, max_bytes)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return Method(self.call, name)
+
+    def with_timeout(self, timeout):
+        """
+        Returns a proxy for calls with a different timeout:
+        client.with_timeout(0.5).tree.power(2, 6)
+        """
+        return Proxy(functools.partial(self.call, timeout=timeout))
+
+    def call(self, method, params=(), timeout=None):
+        """ Calls method, returning a Future for the result. """
+        if self.coalescer is not None and timeout is None:
+            return self.coalescer.call(method, params)
+        return self.send(method, params, timeout)
+
+    def send(self, method, params=(), timeout=None):
+        raise NotImplementedError()
+
+    def batch(self):
+        raise NotImplementedError()
+
+    def fetch(self, body, timeout=None):
+        """ POSTs body, returning a Future for the response. """
+        if timeout is None:
+            timeout = self.timeout
+        request = HTTPRequest(
+            self.url, method='POST', body=body, headers=self.headers,
+            request_timeout=timeout)
+        return self.http_client.fetch(request)
+
+    def close(self):
+        self.http_client.close()
+
+
+class JSONRPCClient(RPCClient):
+    """
+    A JSON-RPC client. Use batch() to send several calls (and
+    notifications) in a single request.
+    """
+    content_type = 'application/json-rpc'
+
+    def __init__(self, url, version=2.0, dumps=None, loads=None, **kwargs):
+        RPCClient.__init__(self, url, **kwargs)
+        self.version = version
+        default_dumps, default_loads = json_functions()
+        self.dumps = dumps or default_dumps
+        self.loads = loads or default_loads
+        self.ids = itertools.count(1)
+
+    def request(self, method, params, rpcid=None):
+        """ Returns a request (or a notification, without rpcid.) """
+        if isinstance(params, tuple):
+            params = list(params)
+        request = {'method': method, 'params': params}
+        if self.version >= 2:
+            request['jsonrpc'] = '2.0'
+            if rpcid is not None:
+                request['id'] = rpcid
+        else:
+            request['id'] = rpcid
+        return request
+
+    def result(self, response):
+        """ Returns the result of a response, or raises its Fault. """
+        error = response.get('error')
+        if error is not None:
+            raise Fault(error.get('code'), error.get('message'))
+        return response.get('result')
+
+    @gen.coroutine
+    def send(self, method, params=(), timeout=None):
+        rpcid = next(self.ids)
+        response = yield self.fetch(
+            self.dumps(self.request(method, params, rpcid)), timeout)
+        raise gen.Return(self.result(self.loads(response.body)))
+
+    @gen.coroutine
+    def notify(self, method, params=(), timeout=None):
+        """ Sends a notification, resolving when it has been sent. """
+        yield self.fetch(self.dumps(self.request(method, params)), timeout)
+
+    def batch(self):
+        return JSONRPCBatch(self)
+
+
+class JSONRPCBatch(object):
+    """
+    Collects calls to send in one JSON-RPC batch. Each call returns
+    a Future for its result, resolved when the batch is sent:
+
+    >>> batch = client.batch()
+    >>> first = batch.add(1, 2)
+    >>> second = batch.tree.power(2, 6)
+    >>> batch.notify('log', ['Sent a batch'])
+    >>> results = yield batch.send()   # [3, 64]
+    """
+
+    def __init__(self, client):
+        self._client = client
+        # Encoded requests
+        self._requests = []
+        self._futures = []
+        self.size = 0
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return Method(self.call, name)
+
+    def __len__(self):
+        return len(self._requests)
+
+    def _add(self, request):
+        request = self._client.dumps(request)
+        self._requests.append(request)
+        self.size += len(request) + 1
+
+    def call(self, method, params=()):
+        rpcid = next(self._client.ids)
+        self._add(self._client.request(method, params, rpcid))
+        future = Future()
+        self._futures.append((rpcid, future))
+        return future
+
+    def notify(self, method, params=()):
+        self._add(self._client.request(method, params))
+
+    @gen.coroutine
+    def send(self, timeout=None):
+        """
+        Sends the batch, and returns the results (or Faults) of its
+        calls in order. The batch is emptied, so it can be reused.
+        """
+        client = self._client
+        requests, futures = self._requests, self._futures
+        self._requests, self._futures, self.size = [], [], 0
+        try:
+            response = yield client.fetch(
+                '[%s]' % ','.join(requests), timeout)
+            responses = response.body and client.loads(response.body) or []
+        except Exception as error:
+            for rpcid, future in futures:
+                future.set_exception(error)
+            raise
+        if isinstance(responses, dict):
+            # A fault for the whole request
+            responses = [responses]
+        by_id = {}
+        for entry in responses:
+            by_id[entry.get('id')] = entry
+        results = []
+        for rpcid, future in futures:
+            entry = by_id.get(rpcid, by_id.get(None))
+            try:
+                if entry is None:
+                    raise Fault(-32603, 'No response for this call.')
+                result = client.result(entry)
+            except Fault as fault:
+                future.set_exception(fault)
+                results.append(fault)
+            else:
+                future.set_result(result)
+                results.append(result)
+        raise gen.Return(results)
+
+
+class XMLRPCClient(RPCClient):
+    """
+    An XML-RPC client. XML-RPC only has positional arguments. Use
+    multicall() (or batch()) to send several calls in a single
+    request.
+    """
+    content_type = 'text/xml'
+
+    def __init__(self, url, allow_none=False, **kwargs):
+        RPCClient.__init__(self, url, **kwargs)
+        self.allow_none = allow_none
+
+    @gen.coroutine
+    def send(self, method, params=(), timeout=None):
+        if isinstance(params, dict):
+            raise TypeError('XML-RPC only has positional arguments.')
+        body = xmlrpclib.dumps(
+            tuple(params), methodname=method, allow_none=self.allow_none)
+        response = yield self.fetch(body, timeout)
+        # Raises the Fault if there was one
+        result, _ = xmlrpclib.loads(response.body)
+        raise gen.Return(result[0])
+
+    def multicall(self):
+        return XMLRPCMultiCall(self)
+
+    batch = multicall
+
+
+class XMLRPCMultiCall(object):
+    """
+    Collects calls to send in one system.multicall, like a
+    JSONRPCBatch:
+
+    >>> multicall = client.multicall()
+    >>> first = multicall.add(1, 2)
+    >>> results = yield multicall.send()   # [3]
+    """
+
+    # The body is built around the encoded calls
+    head = ("<?xml version='1.0'?>\n<methodCall>\n"
+            "<methodName>system.multicall</methodName>\n"
+            "<params>\n<param>\n<value><array><data>\n")
+    tail = "</data></array></value>\n</param>\n</params>\n</methodCall>\n"
+
+    def __init__(self, client):
+        self._client = client
+        # Encoded calls
+        self._calls = []
+        self._futures = []
+        self.size = len(self.head) + len(self.tail)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return Method(self.call, name)
+
+    def __len__(self):
+        return len(self._calls)
+
+    def call(self, method, params=()):
+        if isinstance(params, dict):
+            raise TypeError('XML-RPC only has positional arguments.')
+        marshaller = xmlrpclib.Marshaller(allow_none=self._client.allow_none)
+        # '<params>\n<param>\n<value>...</value>\n</param>\n</params>\n'
+        encoded = marshaller.dumps(
+            ({'methodName': method, 'params': list(params)},))[17:-19]
+        self._calls.append(encoded)
+        self.size += len(encoded)
+        future = Future()
+        self._futures.append(future)
+        return future
+
+    @gen.coroutine
+    def send(self, timeout=None):
+        """
+        Sends the calls, and returns their results (or Faults) in
+        order. The multicall is emptied, so it can be reused.
+        """
+        calls, futures = self._calls, self._futures
+        self._calls, self._futures = [], []
+        self.size = len(self.head) + len(self.tail)
+        try:
+            response = yield self._client.fetch(
+                self.head + ''.join(calls) + self.tail, timeout)
+            entries = xmlrpclib.loads(response.body)[0][0]
+        except Exception as error:
+            for future in futures:
+                future.set_exception(error)
+            raise
+        results = []
+        for index, future in enumerate(futures):
+            entry = None
+            if index < len(entries):
+                entry = entries[index]
+            if entry is None:
+                entry = {'faultCode': -32603,
+                         'faultString': 'No response for this call.'}
+            if isinstance(entry, dict):
+                fault = xmlrpclib.Fault(
+                    entry.get('faultCode'), entry.get('faultString'))
+                future.set_exception(fault)
+                results.append(fault)
+            else:
+                future.set_result(entry[0])
+                results.append(entry[0])
+        raise gen.Return(results)
+
+
+class Coalescer(object):
+    """
+    Gathers the calls made through a client into batches. A batch
+    is sent window seconds after its first call, or as soon as it
+    has max_calls calls or max_bytes bytes of requests.
+    """
+
+    def __init__(self, client, window=0, max_calls=100, max_bytes=None):
+        self.client = client
+        self.window = window
+        self.max_calls = max_calls
+        self.max_bytes = max_bytes
+        self.pending = None
+        self.timeout = None
+        self.batches = 0
+
+    def call(self, method, params=()):
+        if self.pending is None:
+            self.pending = self.client.batch()
+            io_loop = IOLoop.current()
+            if self.window:
+                self.timeout = io_loop.add_timeout(
+                    time.time() + self.window, self.flush)
+            else:
+                io_loop.add_callback(self.flush)
+        batch = self.pending
+        future = batch.call(method, params)
+        if len(batch) >= self.max_calls or (
+                self.max_bytes is not None and batch.size >= self.max_bytes):
+            self.flush()
+        return future
+
+    def flush(self):
+        """ Sends the calls gathered so far. """
+        batch, self.pending = self.pending, None
+        if self.timeout is not None:
+            IOLoop.current().remove_timeout(self.timeout)
+            self.timeout = None
+        if not batch:
+            return
+        self.batches += 1
+        # Errors are passed on to each call's Future
+        IOLoop.current().add_future(
+            batch.send(), lambda future: future.exception())
@@ -0,0 +1,196 @@
+"""
+Content encodings for RPC responses and request bodies -- gzip and
+deflate from zlib, plus zstd and br if the zstandard and brotli
+packages are installed. Each encoding has a streaming compressor
+and decompressor, so large bodies are handled a chunk at a time.
+"""
+
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# The encodings whose decompressed output can be limited as it is
+# produced. zstd and br decompress a whole chunk at once, so a small
+# body could expand to gigabytes before its size could be checked.
+BOUNDED = ('gzip', 'deflate')
+
+
+class ZlibCompressor(object):
+
+    def __init__(self, level, wbits):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, wbits)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def sync(self):
+        """ Returns the data needed to decode everything so far. """
+        return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def flush(self):
+        """ Ends the stream. """
+        return self.compressor.flush()
+
+
+class ZstdCompressor(object):
+
+    def __init__(self, level):
+        self.compressor = zstandard.ZstdCompressor(
+            level=level).compressobj()
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def sync(self):
+        return self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def flush(self):
+        return self.compressor.flush()
+
+
+class BrotliCompressor(object):
+
+    def __init__(self, level):
+        self.compressor = brotli.Compressor(quality=min(level, 11))
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def sync(self):
+        return self.compressor.flush()
+
+    def flush(self):
+        return self.compressor.finish()
+
+
+class Decompressor(object):
+    """
+    Decompresses a body a chunk at a time, raising ValueError if it
+    is corrupt or decompresses to more than max_size bytes.
+    """
+
+    def __init__(self, encoding, max_size=None):
+        self.encoding = encoding
+        self.max_size = max_size
+        self.size = 0
+        if encoding == 'gzip':
+            self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == 'deflate':
+            # Usually zlib wrapped, but some clients send raw deflate
+            self.decompressor = None
+        elif encoding == 'zstd':
+            self.decompressor = zstandard.ZstdDecompressor().decompressobj()
+        else:
+            self.decompressor = brotli.Decompressor()
+
+    def decompress(self, data):
+        if self.decompressor is None:
+            wbits = -zlib.MAX_WBITS
+            if len(data) >= 2 and ord(data[0]) & 0x0f == zlib.DEFLATED \
+                    and (ord(data[0]) * 256 + ord(data[1])) % 31 == 0:
+                # Has a zlib header
+                wbits = zlib.MAX_WBITS
+            self.decompressor = zlib.decompressobj(wbits)
+        try:
+            if self.encoding in ('gzip', 'deflate'):
+                limit = 0
+                if self.max_size is not None:
+                    # One byte over the limit is enough to know
+                    limit = self.max_size - self.size + 1
+                output = self.decompressor.decompress(data, limit)
+            elif self.encoding == 'zstd':
+                output = self.decompressor.decompress(data)
+            else:
+                output = self.decompressor.process(data)
+        except Exception as error:
+            raise ValueError('Bad %s data: %s' % (self.encoding, error))
+        self.size += len(output)
+        if self.max_size is not None and self.size > self.max_size:
+            raise ValueError('Body is larger than %d bytes.' % self.max_size)
+        return output
+
+
+def available():
+    """ The supported encodings, in order of preference. """
+    encodings = []
+    if zstandard is not None:
+        encodings.append('zstd')
+    if brotli is not None:
+        encodings.append('br')
+    encodings.extend(['gzip', 'deflate'])
+    return encodings
+
+
+def compressor(encoding, level=6):
+    """ Returns a streaming compressor for encoding. """
+    if encoding == 'gzip':
+        return ZlibCompressor(level, 16 + zlib.MAX_WBITS)
+    if encoding == 'deflate':
+        return ZlibCompressor(level, zlib.MAX_WBITS)
+    if encoding == 'zstd' and zstandard is not None:
+        return ZstdCompressor(level)
+    if encoding == 'br' and brotli is not None:
+        return BrotliCompressor(level)
+    raise ValueError('Unsupported encoding %r.' % encoding)
+
+
+def decompressor(encoding, max_size=None):
+    """
+    Returns a Decompressor for encoding, or raises ValueError if it
+    isn't supported (or max_size is set and it isn't in BOUNDED.)
+    """
+    encoding = encoding.strip().lower()
+    if encoding == 'x-gzip':
+        encoding = 'gzip'
+    if encoding not in available():
+        raise ValueError('Unsupported encoding %r.' % encoding)
+    if max_size is not None and encoding not in BOUNDED:
+        raise ValueError('%r output can\'t be limited.' % encoding)
+    return Decompressor(encoding, max_size)
+
+
+def decompress(encoding, data, max_size=None):
+    """ Decompresses a whole body. """
+    return decompressor(encoding, max_size).decompress(data)
+
+
+def negotiate(accept_encoding, encodings):
+    """
+    Returns the encoding the Accept-Encoding header gives the highest
+    quality, taking the earliest of encodings on a tie, or None if
+    none of them is acceptable.
+    """
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for entry in accept_encoding.split(','):
+        parts = entry.split(';')
+        name = parts[0].strip().lower()
+        quality = 1.0
+        for param in parts[1:]:
+            key, _, value = param.strip().partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    supported = available()
+    best = None
+    for encoding in encodings:
+        if encoding not in supported:
+            continue
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > 0 and (best is None or quality > best[0]):
+            best = (quality, encoding)
+    if best is None:
+        return None
+    return best[1]
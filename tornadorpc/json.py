@@ -24,69 +24,79 @@ Also, you will need one of the following JSON modules:
 
 From Python 2.6 on, simplejson is included in the standard
 distribution as the "json" module.
+
+For faster encoding, use the JSONCodec in place of jsonrpclib's
+functions. It uses orjson or ujson if either is installed:
+
+>>> class handler(JSONRPCHandler):
+>>> ... _RPC_ = JSONRPCParser(JSONCodec())
 """
 
-from tornadorpc.base import BaseRPCParser, BaseRPCHandler
+from __future__ import absolute_import
+from tornadorpc.base import BaseRPCParser, BaseRPCHandler, Encoded
+import json
 import jsonrpclib
+from jsonrpclib import jsonclass
 from jsonrpclib.jsonrpc import isbatch, isnotification, Fault
-from jsonrpclib.jsonrpc import dumps, loads
+from jsonrpclib.jsonrpc import dumps, loads, jdumps
 
 
 class JSONRPCParser(BaseRPCParser):
 
     content_type = 'application/json-rpc'
+    stream_open = '[ '
+    stream_separator = ', '
+    stream_close = ' ]'
+    # What a library needs to encode the responses itself
+    codec_hooks = ('encode_result', 'encode_fault', 'encode_fragment',
+                   'wrap_result')
+
+    def __init__(self, library, encode=None, decode=None):
+        BaseRPCParser.__init__(self, library, encode, decode)
+        self.codec = library
+        if not all(hasattr(library, name) for name in self.codec_hooks):
+            # A library with just dumps, loads and Fault, so the
+            # responses are encoded with jsonrpclib as before
+            self.codec = JSONRPCLibraryWrapper
 
-    def parse_request(self, request_body):
+    def parse_request(self, context, request_body):
         try:
-            request = loads(request_body)
+            request = self.decode(request_body)
         except:
             # Bad request formatting
-            self.traceback()
+            self.traceback(fault='parse_error')
             return self.faults.parse_error()
-        self._requests = request
-        self._batch = False
         request_list = []
         if isbatch(request):
-            self._batch = True
             for req in request:
                 req_tuple = (req['method'], req.get('params', []))
                 request_list.append(req_tuple)
+            context.batch = True
+            context.requests = request
         else:
-            self._requests = [request]
             request_list.append(
                 (request['method'], request.get('params', []))
             )
+            context.requests = [request]
         return tuple(request_list)
 
-    def parse_responses(self, responses):
+    def parse_responses(self, context, responses):
+        version = jsonrpclib.config.version
         if isinstance(responses, Fault):
-            return dumps(responses)
-        if len(responses) != len(self._requests):
-            return dumps(self.faults.internal_error())
+            return self.codec.encode_fault(responses, None, version)
+        if context.requests is None:
+            # The request couldn't be parsed, so the only
+            # response is the fault.
+            return self.codec.encode_fault(responses[0], None, version)
+        if len(responses) != len(context.requests):
+            return self.codec.encode_fault(
+                self.faults.internal_error(), None, version)
         response_list = []
-        for i in range(0, len(responses)):
-            request = self._requests[i]
-            response = responses[i]
-            if isnotification(request):
-                # Even in batches, notifications have no
-                # response entry
-                continue
-            rpcid = request['id']
-            version = jsonrpclib.config.version
-            if 'jsonrpc' not in request.keys():
-                version = 1.0
-            try:
-                response_json = dumps(
-                    response, version=version,
-                    rpcid=rpcid, methodresponse=True
-                )
-            except TypeError:
-                return dumps(
-                    self.faults.server_error(),
-                    rpcid=rpcid, version=version
-                )
-            response_list.append(response_json)
-        if not self._batch:
+        for index, response in enumerate(responses):
+            response_json = self.encode_response(context, index, response)
+            if response_json is not None:
+                response_list.append(response_json)
+        if not context.batch:
             # Ensure it wasn't a batch to begin with, then
             # return 1 or 0 responses depending on if it was
             # a notification.
@@ -94,15 +104,150 @@ class JSONRPCParser(BaseRPCParser):
                 return ''
             return response_list[0]
         # Batch, return list
-        return '[ %s ]' % ', '.join(response_list)
+        return self.join_responses(response_list)
+
+    def join_responses(self, response_list):
+        """ Builds a batch response from the encoded responses. """
+        return '%s%s%s' % (
+            self.stream_open, self.stream_separator.join(response_list),
+            self.stream_close)
+
+    def encode_response(self, context, index, response):
+        request = context.requests[index]
+        if isnotification(request):
+            # Even in batches, notifications have no
+            # response entry
+            return None
+        rpcid = request['id']
+        version = jsonrpclib.config.version
+        if 'jsonrpc' not in request.keys():
+            version = 1.0
+        if isinstance(response, Encoded):
+            return self.codec.wrap_result(response.data, rpcid, version)
+        try:
+            return self.codec.encode_result(response, rpcid, version)
+        except (TypeError, ValueError, OverflowError):
+            # Not serializable
+            return self.codec.encode_fault(
+                self.faults.internal_error(), rpcid, version)
+
+    def encode_fragment(self, result):
+        return self.codec.encode_fragment(result)
+
+    def call_timeout(self, context, index):
+        # A "timeout" member (in seconds) of the request object
+        if context.requests is None or index >= len(context.requests):
+            return None
+        request = context.requests[index]
+        if not isinstance(request, dict):
+            return None
+        timeout = request.get('timeout')
+        if isinstance(timeout, (int, long, float)) and \
+                not isinstance(timeout, bool) and timeout >= 0:
+            return timeout
+        return None
+
+    def request_id(self, context, index):
+        if context.requests is None or index >= len(context.requests):
+            return None
+        request = context.requests[index]
+        if isinstance(request, dict):
+            return request.get('id')
+        return None
 
 
 class JSONRPCLibraryWrapper(object):
+    """
+    The default JSON codec, using jsonrpclib to build and encode
+    the response envelopes. A codec provides dumps, loads and Fault
+    like the RPC libraries, plus encode_result and encode_fault to
+    encode a complete response entry, and encode_fragment and
+    wrap_result to encode a result on its own and build a response
+    around it later. (Libraries without those four get these.)
+    """
 
-    dumps = dumps
-    loads = loads
+    dumps = staticmethod(dumps)
+    loads = staticmethod(loads)
     Fault = Fault
 
+    @staticmethod
+    def encode_result(result, rpcid, version):
+        return dumps(
+            result, version=version, rpcid=rpcid, methodresponse=True)
+
+    @staticmethod
+    def encode_fault(fault, rpcid, version):
+        return dumps(fault, version=version, rpcid=rpcid)
+
+    @staticmethod
+    def encode_fragment(result):
+        if jsonrpclib.config.use_jsonclass:
+            result = jsonclass.dump(result)
+        return jdumps(result)
+
+    @staticmethod
+    def wrap_result(encoded_result, rpcid, version):
+        if version >= 2:
+            return '{"jsonrpc": "%s", "id": %s, "result": %s}' % (
+                version, jdumps(rpcid), encoded_result)
+        return '{"id": %s, "result": %s, "error": null}' % (
+            jdumps(rpcid), encoded_result)
+
+
+def json_functions():
+    """
+    Returns the fastest available (dumps, loads) pair -- orjson,
+    then ujson, then the standard library's json module.
+    """
+    for name in ('orjson', 'ujson'):
+        try:
+            module = __import__(name)
+        except ImportError:
+            continue
+        return module.dumps, module.loads
+    encoder = json.JSONEncoder(separators=(',', ':'))
+    return encoder.encode, json.loads
+
+
+class JSONCodec(object):
+    """
+    A faster JSON codec that writes the response envelopes directly
+    instead of building jsonrpclib Payload dicts, encoding the result
+    straight to a byte string. Unlike jsonrpclib, it doesn't support
+    jsonclass type hints.
+    """
+    Fault = Fault
+
+    def __init__(self, dumps=None, loads=None):
+        default_dumps, default_loads = json_functions()
+        self.dumps = dumps or default_dumps
+        self.loads = loads or default_loads
+
+    def encode_result(self, result, rpcid, version):
+        if isinstance(result, Fault):
+            return self.encode_fault(result, rpcid, version)
+        return self.wrap_result(self.dumps(result), rpcid, version)
+
+    def encode_fragment(self, result):
+        return self.dumps(result)
+
+    def wrap_result(self, encoded_result, rpcid, version):
+        """ Builds a response around an already encoded result. """
+        if float(version) >= 2:
+            return '{"jsonrpc":"%s","id":%s,"result":%s}' % (
+                float(version), self.dumps(rpcid), encoded_result)
+        return '{"id":%s,"result":%s,"error":null}' % (
+            self.dumps(rpcid), encoded_result)
+
+    def encode_fault(self, fault, rpcid, version):
+        error = self.dumps(
+            {'code': fault.faultCode, 'message': fault.faultString})
+        if float(version) >= 2:
+            return '{"jsonrpc":"%s","id":%s,"error":%s}' % (
+                float(version), self.dumps(rpcid), error)
+        return '{"id":%s,"result":null,"error":%s}' % (
+            self.dumps(rpcid), error)
+
 
 class JSONRPCHandler(BaseRPCHandler):
     """
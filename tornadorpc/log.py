@@ -0,0 +1,298 @@
+"""
+Error logging for the TornadoRPC library. Errors raised by methods
+are logged to the 'tornadorpc' logger with these extra attributes:
+
+* rpc_method -- the method name ('REQUEST' for a bad request)
+* params_digest -- a short checksum of (the start of) the parameters,
+  to tell repeated calls apart without logging the parameters
+* fault_code -- the code of the fault sent back, or None
+* request_id -- the request's id (JSON-RPC), or None
+* suppressed -- how many identical errors were dropped by the
+  rate limit before this one
+
+Records are passed through a queue to a background thread, which
+formats them (including the traceback) and writes them out, so a
+burst of errors doesn't hold up the IOLoop. Nothing is logged unless
+config.verbose is set. When the first error is logged, the handlers
+the records would have reached (the logger's own and its parents',
+e.g. the root logger's as set up by basicConfig or the IOLoop) are
+moved behind the queue, or if there are none the records are written
+to stdout, in short form if config.short_errors is set. To send them
+elsewhere, call start() with your own handlers.
+"""
+
+import atexit
+import logging
+import Queue
+import sys
+import threading
+import time
+import zlib
+
+logger = logging.getLogger('tornadorpc')
+
+
+class QueueHandler(logging.Handler):
+    """
+    Puts records on a queue without formatting them. If the queue
+    is full, the record is dropped and counted in 'dropped'.
+    """
+
+    def __init__(self, queue):
+        logging.Handler.__init__(self)
+        self.queue = queue
+        self.dropped = 0
+
+    def emit(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except Queue.Full:
+            self.dropped += 1
+
+
+class QueueListener(object):
+    """ Passes the records put on a queue to handlers, in a thread. """
+    _stop = object()
+
+    def __init__(self, queue, *handlers):
+        self.queue = queue
+        self.handlers = handlers
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.monitor)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def monitor(self):
+        while True:
+            record = self.queue.get()
+            if record is self._stop:
+                break
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+
+    def stop(self):
+        """ Handles the records still queued, then stops the thread. """
+        if self.thread is not None:
+            self.queue.put(self._stop)
+            self.thread.join()
+            self.thread = None
+
+
+class ErrorFormatter(logging.Formatter):
+    """
+    Formats error records with a title and the traceback (only the
+    last few lines of it if short is True.)
+    """
+
+    def __init__(self, short=True):
+        logging.Formatter.__init__(self)
+        self.short = short
+
+    def format(self, record):
+        title = 'ERROR IN %s' % getattr(record, 'rpc_method', 'REQUEST')
+        details = []
+        for label, attr in (('FAULT', 'fault_code'), ('ID', 'request_id'),
+                            ('PARAMS', 'params_digest')):
+            value = getattr(record, attr, None)
+            if value is not None:
+                details.append('%s: %s' % (label, value))
+        if details:
+            title = '%s - (%s)' % (title, ', '.join(details))
+        separator = ('-' * len(title))[:79]
+        lines = [separator, title, separator]
+        if record.exc_info:
+            lines.extend(self.formatException(record.exc_info).splitlines())
+        else:
+            lines.append(record.getMessage())
+        if self.short and len(lines) >= 7:
+            # Minimum number of lines to see what happened
+            # Plus title and separators
+            lines = lines[0:4] + lines[-3:]
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            lines.append('(%d more like this were not logged)' % suppressed)
+        return '\n'.join(lines)
+
+
+class RateLimiter(object):
+    """
+    Allows up to 'burst' errors with the same key (method, fault
+    code and exception type) every 'interval' seconds.
+    """
+
+    def __init__(self, burst, interval, clock=time.time):
+        self.burst = burst
+        self.interval = interval
+        self.clock = clock
+        # key -> [window start, errors allowed, errors suppressed]
+        self.windows = {}
+
+    def allow(self, key):
+        """
+        Returns the number of errors suppressed since the last one
+        that was allowed, or None if this one should be suppressed.
+        """
+        now = self.clock()
+        window = self.windows.get(key)
+        if window is None or now - window[0] >= self.interval:
+            suppressed = window[2] if window is not None else 0
+            self.windows[key] = [now, 1, 0]
+            return suppressed
+        if window[1] < self.burst:
+            window[1] += 1
+            return 0
+        window[2] += 1
+        return None
+
+
+def params_digest(params, limit=4096):
+    """
+    Returns a short checksum of about the first limit characters of
+    the parameters, so large parameters don't cost more to log than
+    small ones. Strings are cut to limit characters (their lengths
+    are included.)
+    """
+    parts = []
+    size = [0]
+
+    def add(text):
+        parts.append(text)
+        size[0] += len(text)
+
+    def walk(value):
+        if isinstance(value, dict):
+            add('{')
+            for key in sorted(value):
+                if size[0] >= limit:
+                    break
+                walk(key)
+                add(':')
+                walk(value[key])
+            add('}')
+        elif isinstance(value, (list, tuple)):
+            add('[')
+            for item in value:
+                if size[0] >= limit:
+                    break
+                walk(item)
+                add(',')
+            add(']')
+        elif isinstance(value, basestring):
+            add('%d%r' % (len(value), value[:limit]))
+        else:
+            add(repr(value)[:limit])
+
+    try:
+        walk(params)
+        return '%08x' % (zlib.crc32(''.join(parts)) & 0xffffffff)
+    except Exception:
+        return None
+
+
+def chain_handlers():
+    """
+    Returns the handlers the records of the 'tornadorpc' logger would
+    reach, on it or on the parents it propagates to, other than the
+    queue's.
+    """
+    handlers = []
+    current = logger
+    while current is not None:
+        handlers.extend(handler for handler in current.handlers
+                        if not isinstance(handler, QueueHandler))
+        if not current.propagate:
+            break
+        current = current.parent
+    return handlers
+
+
+listener = None
+limiter = None
+# The logger's own handlers and propagate setting before start()
+saved = None
+
+
+def start(handlers=None, maxsize=10000, propagate=True):
+    """
+    Starts sending the errors logged to the 'tornadorpc' logger
+    through a queue of up to maxsize records to handlers. It is called
+    when the first error is logged. By default the handlers are the
+    ones the records would have reached without the queue (they no
+    longer go to the parent loggers, so they aren't written twice),
+    or a stream handler writing to stdout if there are none. With
+    your own handlers, the records still go to the parent loggers'
+    handlers too, unless propagate is False.
+    """
+    global listener, saved
+    from tornadorpc.base import config
+    stop()
+    saved = (logger.handlers[:], logger.propagate)
+    if handlers is None:
+        handlers = chain_handlers()
+        propagate = False
+        for handler in logger.handlers[:]:
+            logger.removeHandler(handler)
+    if not handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(ErrorFormatter(config.short_errors))
+        handlers = [handler]
+    queue = Queue.Queue(maxsize)
+    logger.addHandler(QueueHandler(queue))
+    if not propagate:
+        logger.propagate = False
+    listener = QueueListener(queue, *handlers)
+    listener.start()
+
+
+def stop():
+    """
+    Writes out the records still queued, stops the thread and puts
+    back the logger's handlers and propagate setting.
+    """
+    global listener, saved
+    if listener is not None:
+        listener.stop()
+        listener = None
+    if saved is not None:
+        handlers, logger.propagate = saved
+        saved = None
+        for handler in logger.handlers[:]:
+            logger.removeHandler(handler)
+        for handler in handlers:
+            logger.addHandler(handler)
+
+atexit.register(stop)
+
+
+def log_error(method_name='REQUEST', params=None, fault_code=None,
+              request_id=None, exc_info=None):
+    """
+    Logs the exception being handled (or exc_info) as an error in
+    method_name, subject to config.log_rate_limit.
+    """
+    global limiter
+    from tornadorpc.base import config
+    if not config.verbose:
+        return
+    if listener is None:
+        start()
+    exc_info = exc_info or sys.exc_info()
+    suppressed = 0
+    if config.log_rate_limit:
+        if limiter is None or \
+                (limiter.burst, limiter.interval) != config.log_rate_limit:
+            limiter = RateLimiter(*config.log_rate_limit)
+        suppressed = limiter.allow((method_name, fault_code, exc_info[0]))
+        if suppressed is None:
+            return
+    logger.error(
+        'Error in %s', method_name, exc_info=exc_info, extra={
+            'rpc_method': method_name,
+            'params_digest': params_digest(params) if params else None,
+            'fault_code': fault_code,
+            'request_id': request_id,
+            'suppressed': suppressed,
+        })
@@ -0,0 +1,216 @@
+"""
+Per-method call statistics for the TornadoRPC library. To record
+them, set config.stats to a sink -- a MemoryStats, or any object
+with the StatsSink methods:
+
+>>> from tornadorpc import config
+>>> from tornadorpc.stats import MemoryStats, StatsHandler
+>>>
+>>> config.stats = MemoryStats()
+>>> # Optionally, serve them as JSON:
+>>> app = tornado.web.Application([
+>>> ... ('/RPC2', handler),
+>>> ... ('/stats', StatsHandler),
+>>> ])
+
+Calls are recorded by method name. The time to parse a request and
+to encode its response is recorded by method name as well for single
+calls, and under BATCH for batches (and REQUEST if the request
+couldn't be parsed.) Calls to methods that don't exist are all
+recorded under UNKNOWN, so clients can't add names without limit.
+"""
+
+from __future__ import absolute_import
+from bisect import bisect_left
+import json
+import tornado.web
+
+BATCH = '<batch>'
+REQUEST = '<request>'
+UNKNOWN = '<unknown>'
+
+# Histogram bucket upper bounds, in seconds -- 50us doubling up to
+# about 52s, plus a last bucket for anything slower.
+BOUNDS = tuple(0.00005 * 2 ** i for i in range(21))
+
+
+class StatsSink(object):
+    """
+    The interface of a stats sink. Every call is on the IOLoop
+    thread, so the methods must return quickly and never block.
+    """
+
+    def start(self, method_name):
+        """ A call to method_name has started. """
+        pass
+
+    def finish(self, method_name, seconds, fault_code):
+        """
+        A call to method_name has finished after seconds, with a
+        fault (fault_code) or a result (fault_code is None.)
+        """
+        pass
+
+    def phase(self, method_name, phase, seconds):
+        """ Parsing ('parse') or encoding ('encode') took seconds. """
+        pass
+
+
+class Histogram(object):
+    """
+    Counts durations in fixed, exponentially sized buckets (see
+    BOUNDS), so that recording one is a bisect and an increment.
+    """
+    __slots__ = ('counts', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BOUNDS) + 1)
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        # MemoryStats.finish does the same, inline
+        self.counts[bisect_left(BOUNDS, seconds)] += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def percentile(self, percent):
+        """
+        Returns the upper bound of the bucket holding the given
+        percentile (or the maximum, if that is lower), or None if
+        nothing has been recorded.
+        """
+        total = self.count
+        if not total:
+            return None
+        wanted = total * percent / 100.0
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= wanted and count:
+                if bucket < len(BOUNDS):
+                    return min(BOUNDS[bucket], self.max)
+                break
+        return self.max
+
+    def snapshot(self):
+        count = self.count
+        return {
+            'count': count,
+            'mean': count and self.total / count,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'buckets': list(self.counts),
+        }
+
+
+class MethodStats(object):
+    """ The counters and histograms for one method name. """
+    __slots__ = ('calls', 'in_flight', 'faults', 'parse', 'execute',
+                 'encode')
+
+    def __init__(self):
+        self.calls = 0
+        self.in_flight = 0
+        # Number of faults by fault code
+        self.faults = {}
+        self.parse = Histogram()
+        self.execute = Histogram()
+        self.encode = Histogram()
+
+    def snapshot(self):
+        return {
+            'calls': self.calls,
+            'in_flight': self.in_flight,
+            'faults': dict(self.faults),
+            'parse': self.parse.snapshot(),
+            'execute': self.execute.snapshot(),
+            'encode': self.encode.snapshot(),
+        }
+
+
+class MemoryStats(StatsSink):
+    """
+    The default sink, which keeps the statistics in memory. Each
+    process has its own, and they are only updated from the IOLoop
+    thread, so no locking is needed.
+    """
+
+    def __init__(self):
+        self.methods = {}
+
+    def get(self, method_name):
+        """ Returns the MethodStats for method_name. """
+        stats = self.methods.get(method_name)
+        if stats is None:
+            stats = self.methods[method_name] = MethodStats()
+        return stats
+
+    # start and finish are called for every call, so they avoid
+    # any method calls they can.
+
+    def start(self, method_name):
+        try:
+            stats = self.methods[method_name]
+        except KeyError:
+            stats = self.get(method_name)
+        stats.calls += 1
+        stats.in_flight += 1
+
+    def finish(self, method_name, seconds, fault_code):
+        try:
+            stats = self.methods[method_name]
+        except KeyError:
+            stats = self.get(method_name)
+        stats.in_flight -= 1
+        execute = stats.execute
+        execute.counts[bisect_left(BOUNDS, seconds)] += 1
+        execute.total += seconds
+        if seconds > execute.max:
+            execute.max = seconds
+        if fault_code is not None:
+            stats.faults[fault_code] = stats.faults.get(fault_code, 0) + 1
+
+    def phase(self, method_name, phase, seconds):
+        getattr(self.get(method_name), phase).record(seconds)
+
+    def in_flight(self):
+        """ Returns the number of calls in flight, for every method. """
+        return sum(stats.in_flight for stats in self.methods.values())
+
+    def snapshot(self):
+        """ Returns the statistics as a JSON serializable dict. """
+        return {
+            'in_flight': self.in_flight(),
+            'methods': dict(
+                (name, stats.snapshot())
+                for name, stats in self.methods.iteritems()),
+        }
+
+    def reset(self):
+        self.methods.clear()
+
+
+class StatsHandler(tornado.web.RequestHandler):
+    """
+    Serves a snapshot of a MemoryStats (config.stats by default,
+    or the 'stats' keyword given in the URL spec) as JSON.
+    """
+
+    def initialize(self, stats=None):
+        self.stats = stats
+
+    def get(self):
+        from tornadorpc.base import config
+        stats = self.stats or config.stats
+        if stats is None:
+            raise tornado.web.HTTPError(404)
+        self.set_header('Content-Type', 'application/json')
+        self.finish(json.dumps(stats.snapshot()))
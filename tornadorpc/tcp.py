@@ -0,0 +1,340 @@
+"""
+=======================================
+JSON-RPC / XML-RPC over TCP for Tornado
+=======================================
+Serves the methods of an existing JSONRPCHandler or XMLRPCHandler
+subclass over plain TCP (or a Unix domain socket), without any HTTP
+framing:
+
+>>> from tornadorpc.tcp import RPCServer
+>>>
+>>> server = RPCServer(handler)
+>>> server.listen(9090)
+>>> # or server.add_socket(bind_unix_socket('/tmp/rpc.sock'))
+
+Each request is sent as one frame -- an 8 byte header (the frame
+id and the length of the body, both big endian unsigned 32 bit
+integers) followed by the request body, exactly as it would be
+POSTed. Every request frame gets one response frame with the same
+id, which is empty for notifications. Requests on a connection run
+side by side and responses are sent as soon as they are ready, so
+they can arrive in any order. At most max_in_flight requests per
+connection run at once; the connection isn't read again until one
+of them finishes.
+
+Methods are looked up, called and faulted just like over HTTP. Each
+request gets its own handler, but they share the connection's
+self.request, which only has remote_ip (and body, while the request
+is being parsed.)
+
+The clients (JSONRPCTCPClient and XMLRPCTCPClient) work like the
+HTTP ones, but keep up to pool_size connections open and send each
+call on the least busy one:
+
+>>> client = JSONRPCTCPClient(('localhost', 9090))
+>>> result = yield client.tree.power(2, 6)
+"""
+
+from __future__ import absolute_import
+import itertools
+import socket
+import struct
+import time
+from tornado.concurrent import Future
+from tornado.httpclient import HTTPError
+from tornado.httpserver import HTTPRequest
+from tornado.ioloop import IOLoop
+from tornado.iostream import IOStream
+from tornado.tcpserver import TCPServer
+import tornado.web
+from tornadorpc.base import BaseRPCHandler, RPCContext, config
+from tornadorpc.client import JSONRPCClient, XMLRPCClient
+
+# Frame id, body length
+HEADER = struct.Struct('>II')
+
+
+class TCPHandlerMixin(object):
+    """
+    Mixed into the handler class, so that its responses are sent as
+    frames on the connection instead of as HTTP responses.
+    """
+    # Batch responses are sent as one frame
+    stream_batches = None
+
+    def on_result(self, response_text):
+        self._RPC_connection.on_result(self._RPC_frame, response_text)
+
+
+class RPCServer(TCPServer):
+    """
+    Serves handler_class's methods on the sockets it is given
+    (with listen, bind or add_socket.) Keyword arguments are passed
+    to the handler's initialize, as with Application routes.
+    """
+    max_in_flight = 100
+    max_frame_size = 64 * 1024 * 1024
+
+    def __init__(self, handler_class, io_loop=None, **kwargs):
+        TCPServer.__init__(self, io_loop=io_loop)
+        self.handler_class = type(
+            handler_class.__name__, (TCPHandlerMixin, handler_class), {})
+        self.handler_kwargs = kwargs
+        self.application = tornado.web.Application()
+
+    def handle_stream(self, stream, address):
+        if isinstance(address, tuple):
+            stream.set_nodelay(True)
+        RPCConnection(self, stream, address)
+
+
+class RPCConnection(object):
+    """ Reads the request frames on one connection. """
+
+    def __init__(self, server, stream, address):
+        self.server = server
+        self.stream = stream
+        self.running = 0
+        self.paused = False
+        if isinstance(address, tuple):
+            remote_ip = address[0]
+        else:
+            # Unix domain sockets don't have an address
+            remote_ip = '127.0.0.1'
+        request = HTTPRequest('POST', '/', remote_ip=remote_ip)
+        # Every request's handler starts as a copy of this one
+        self.handler = server.handler_class(
+            server.application, request, **server.handler_kwargs)
+        stream.set_close_callback(self.on_close)
+        self.read_header()
+
+    def read_header(self):
+        if not self.stream.closed():
+            self.stream.read_bytes(HEADER.size, self.on_header)
+
+    def on_header(self, data):
+        frame, length = HEADER.unpack(data)
+        if length > self.server.max_frame_size:
+            # Can't skip the body without reading it, so give up
+            self.stream.close()
+            return
+        if not length:
+            return self.on_request(frame, '')
+        self.stream.read_bytes(
+            length, lambda body: self.on_request(frame, body))
+
+    def on_request(self, frame, body):
+        handler_class = self.server.handler_class
+        handler = handler_class.__new__(handler_class)
+        handler.__dict__.update(self.handler.__dict__)
+        handler._RPC_frame = frame
+        handler._RPC_connection = self
+        handler.request.body = body
+        handler._RPC_received = time.time()
+        self.running += 1
+        BaseRPCHandler._RPC_in_flight += 1
+        reason = None
+        if config.max_in_flight is not None:
+            reason = handler._RPC_overloaded()
+        if reason is None:
+            try:
+                handler.prepare()
+                request_body = handler._RPC_request_body()
+            except Exception as error:
+                self.refuse(handler, error)
+            else:
+                handler._RPC_.run(handler, request_body)
+        else:
+            handler._RPC_.reject(handler, reason)
+        if self.running < self.server.max_in_flight:
+            self.read_header()
+        else:
+            self.paused = True
+
+    def refuse(self, handler, error):
+        """
+        Answers a request that failed before it could be run (in the
+        handler's prepare, or while its body was read) with a fault
+        -- 'invalid_request' for the HTTP errors a handler raises to
+        refuse a request, 'internal_error' for anything else.
+        """
+        parser = handler._RPC_
+        fault = 'invalid_request'
+        if not isinstance(error, tornado.web.HTTPError):
+            fault = 'internal_error'
+            parser.traceback(fault=fault)
+        context = RPCContext(handler, parser)
+        handler._RPC_context = context
+        context.prepare(1)
+        parser.add_result(context, 0, getattr(parser.faults, fault)())
+
+    def on_result(self, frame, response_text):
+        """ Sends the response to the request in frame. """
+        if self.stream.closed():
+            # Already counted off by on_close
+            return
+        self.running -= 1
+        BaseRPCHandler._RPC_in_flight -= 1
+        response_text = response_text or ''
+        if isinstance(response_text, unicode):
+            response_text = response_text.encode('utf-8')
+        self.stream.write(
+            HEADER.pack(frame, len(response_text)) + response_text)
+        if self.paused:
+            self.paused = False
+            self.read_header()
+
+    def on_close(self):
+        # Responses still to come are dropped, so the requests
+        # still running no longer count
+        BaseRPCHandler._RPC_in_flight -= self.running
+        self.running = 0
+        self.paused = False
+
+
+class Frame(object):
+    """ A response, with a body like an HTTPResponse's. """
+    __slots__ = ('body',)
+
+    def __init__(self, body):
+        self.body = body
+
+
+class TCPConnection(object):
+    """
+    A client connection, sending request frames and resolving their
+    Futures as the responses arrive. Errors are raised as HTTPError
+    599, like the HTTP client's connection errors and timeouts.
+    """
+
+    def __init__(self, address, io_loop=None):
+        self.io_loop = io_loop or IOLoop.current()
+        if isinstance(address, tuple):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        else:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.tcp = isinstance(address, tuple)
+        self.frames = itertools.count(1)
+        # Frame id: (Future, timeout)
+        self.pending = {}
+        self.stream = IOStream(sock, io_loop=self.io_loop)
+        self.stream.set_close_callback(self.on_close)
+        self.stream.connect(address, self.on_connect)
+
+    def on_connect(self):
+        if self.tcp:
+            self.stream.set_nodelay(True)
+        self.read_header()
+
+    def closed(self):
+        return self.stream.closed()
+
+    def fetch(self, body, timeout=None):
+        future = Future()
+        if self.stream.closed():
+            future.set_exception(HTTPError(599, 'Connection closed'))
+            return future
+        frame = next(self.frames) & 0xffffffff
+        handle = None
+        if timeout:
+            handle = self.io_loop.add_timeout(
+                time.time() + timeout, lambda: self.on_timeout(frame))
+        self.pending[frame] = (future, handle)
+        self.stream.write(HEADER.pack(frame, len(body)) + body)
+        return future
+
+    def read_header(self):
+        if not self.stream.closed():
+            self.stream.read_bytes(HEADER.size, self.on_header)
+
+    def on_header(self, data):
+        frame, length = HEADER.unpack(data)
+        if not length:
+            return self.on_response(frame, '')
+        self.stream.read_bytes(
+            length, lambda body: self.on_response(frame, body))
+
+    def on_response(self, frame, body):
+        future, handle = self.pending.pop(frame, (None, None))
+        if handle is not None:
+            self.io_loop.remove_timeout(handle)
+        if future is not None:
+            future.set_result(Frame(body))
+        self.read_header()
+
+    def on_timeout(self, frame):
+        # The response is ignored if it arrives later
+        future, handle = self.pending.pop(frame, (None, None))
+        if future is not None:
+            future.set_exception(HTTPError(599, 'Timeout'))
+
+    def on_close(self):
+        pending, self.pending = self.pending, {}
+        for future, handle in pending.values():
+            if handle is not None:
+                self.io_loop.remove_timeout(handle)
+            future.set_exception(HTTPError(599, 'Connection closed'))
+
+    def close(self):
+        self.stream.close()
+
+
+class TCPConnectionPool(object):
+    """
+    Up to size connections to address, opened as they are needed.
+    Each request is sent on the connection with the fewest requests
+    in flight.
+    """
+
+    def __init__(self, address, size=4, io_loop=None):
+        self.address = address
+        self.size = size
+        self.io_loop = io_loop
+        self.connections = []
+
+    def connection(self):
+        connections = [c for c in self.connections if not c.closed()]
+        self.connections = connections
+        if connections:
+            connection = min(connections, key=lambda c: len(c.pending))
+            if not connection.pending or len(connections) >= self.size:
+                return connection
+        connection = TCPConnection(self.address, self.io_loop)
+        connections.append(connection)
+        return connection
+
+    def fetch(self, body, timeout=None):
+        return self.connection().fetch(body, timeout)
+
+    def close(self):
+        for connection in self.connections:
+            connection.close()
+        self.connections = []
+
+
+class TCPClientMixin(object):
+    """ Sends a client's requests as frames instead of HTTP POSTs. """
+
+    def fetch(self, body, timeout=None):
+        if timeout is None:
+            timeout = self.timeout
+        return self.http_client.fetch(body, timeout)
+
+
+class JSONRPCTCPClient(TCPClientMixin, JSONRPCClient):
+    """
+    A JSONRPCClient for an RPCServer. address is a (host, port)
+    tuple, or the path of a Unix domain socket.
+    """
+
+    def __init__(self, address, pool_size=4, **kwargs):
+        kwargs['http_client'] = TCPConnectionPool(address, pool_size)
+        JSONRPCClient.__init__(self, address, **kwargs)
+
+
+class XMLRPCTCPClient(TCPClientMixin, XMLRPCClient):
+    """ An XMLRPCClient for an RPCServer, like JSONRPCTCPClient. """
+
+    def __init__(self, address, pool_size=4, **kwargs):
+        kwargs['http_client'] = TCPConnectionPool(address, pool_size)
+        XMLRPCClient.__init__(self, address, **kwargs)
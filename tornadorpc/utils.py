@@ -5,6 +5,74 @@ Various utilities for the TornadoRPC library.
 import inspect
 
 
+class CallBinder(object):
+    """
+    A precompiled version of getcallargs for a single function.
+
+    The argument spec is read once, so binding a call is a couple
+    of dict / set operations instead of inspecting the function
+    and scanning the argument list on every request. The bind
+    method takes the same positional OR named arguments, raises
+    the same TypeErrors, and returns the same (kwargs, extra_args)
+    tuple as getcallargs.
+    """
+    __slots__ = (
+        'args', 'nargs', 'positions', 'required', 'defaults',
+        'varargs', 'varkw'
+    )
+
+    def __init__(self, func, skip=None):
+        args, varargs, varkw, defaults = inspect.getargspec(func)
+        if skip is None:
+            skip = int(inspect.ismethod(func) and func.im_self is not None)
+        self.args = tuple(args[skip:])
+        self.nargs = len(self.args)
+        self.positions = dict((arg, i) for i, arg in enumerate(self.args))
+        self.defaults = {}
+        if defaults:
+            self.defaults = dict(zip(self.args[-len(defaults):], defaults))
+        self.required = frozenset(
+            arg for arg in self.args if arg not in self.defaults)
+        self.varargs = varargs is not None
+        self.varkw = varkw is not None
+
+    def bind(self, positional=(), named=None):
+        """
+        Returns a dictionary with the appropriate named arguments
+        and a list of extra positional arguments. Raises a
+        TypeError if invalid arguments are passed.
+        """
+        # (Since our RPC supports only positional OR named.)
+        if named:
+            if not self.varkw:
+                for key in named:
+                    if key not in self.positions:
+                        raise TypeError(
+                            "Keyword argument '%s' not valid" % key)
+            final_kwargs = self.defaults.copy()
+            final_kwargs.update(named)
+            if not self.required.issubset(final_kwargs):
+                missing = sorted(self.required.difference(final_kwargs))
+                raise TypeError(
+                    "Not all arguments supplied. (%s)" % missing[0])
+            return final_kwargs, []
+        count = len(positional)
+        if count > self.nargs:
+            if not self.varargs:
+                raise TypeError("Too many positional arguments")
+            return dict(zip(self.args, positional)), \
+                list(positional[self.nargs:])
+        final_kwargs = dict(zip(self.args, positional))
+        if count < self.nargs:
+            defaults = self.defaults
+            for arg in self.args[count:]:
+                try:
+                    final_kwargs[arg] = defaults[arg]
+                except KeyError:
+                    raise TypeError("Not all arguments supplied. (%s)" % arg)
+        return final_kwargs, []
+
+
 def getcallargs(func, *positional, **named):
     """
     Simple implementation of inspect.getcallargs function in
@@ -13,45 +81,8 @@ def getcallargs(func, *positional, **named):
     Takes a function and the position and keyword arguments and
     returns a dictionary with the appropriate named arguments.
     Raises an exception if invalid arguments are passed.
+
+    This compiles a new CallBinder on each call -- keep a CallBinder
+    around instead if the same function is called repeatedly.
     """
-    args, varargs, varkw, defaults = inspect.getargspec(func)
-
-    final_kwargs = {}
-    extra_args = []
-    has_self = inspect.ismethod(func) and func.im_self is not None
-    if has_self:
-        args.pop(0)
-
-    # (Since our RPC supports only positional OR named.)
-    if named:
-        for key, value in named.iteritems():
-            arg_key = None
-            try:
-                arg_key = args[args.index(key)]
-            except ValueError:
-                if not varkw:
-                    raise TypeError("Keyword argument '%s' not valid" % key)
-            if key in final_kwargs.keys():
-                message = "Keyword argument '%s' used more than once" % key
-                raise TypeError(message)
-            final_kwargs[key] = value
-    else:
-        for i in range(len(positional)):
-            value = positional[i]
-            arg_key = None
-            try:
-                arg_key = args[i]
-            except IndexError:
-                if not varargs:
-                    raise TypeError("Too many positional arguments")
-            if arg_key:
-                final_kwargs[arg_key] = value
-            else:
-                extra_args.append(value)
-    if defaults:
-        for kwarg, default in zip(args[-len(defaults):], defaults):
-            final_kwargs.setdefault(kwarg, default)
-    for arg in args:
-        if arg not in final_kwargs:
-            raise TypeError("Not all arguments supplied. (%s)", arg)
-    return final_kwargs, extra_args
+    return CallBinder(func).bind(positional, named)
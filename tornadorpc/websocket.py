@@ -0,0 +1,119 @@
+"""
+=======================================
+JSON-RPC over WebSocket for Tornado
+=======================================
+A JSON-RPC handler that keeps a WebSocket connection open and takes
+each message as a request (or batch), instead of one HTTP POST per
+request. Methods are written just like for the JSONRPCHandler:
+
+>>> from tornadorpc.websocket import WebSocketJSONRPCHandler
+>>>
+>>> class handler(WebSocketJSONRPCHandler):
+>>> ... def add(self, x, y):
+>>> ....... return x+y
+>>>
+>>> app = tornado.web.Application([('/ws', handler)])
+
+Requests on a connection run side by side and each response is sent
+as soon as it is ready, so they can arrive in any order -- clients
+match them to their requests by id. At most max_in_flight calls
+(counting each entry of a batch) per connection run at once; later
+requests wait for a free slot, and the connection is closed if more
+than max_waiting are waiting. Use notify() to send the client a
+notification at any time.
+"""
+
+from __future__ import absolute_import
+import collections
+import tornado.web
+from tornado.websocket import WebSocketHandler
+from tornadorpc.base import BaseRPCHandler
+from tornadorpc.json import JSONRPCParser, JSONRPCLibraryWrapper
+
+
+class WebSocketJSONRPCParser(JSONRPCParser):
+    """
+    Counts the calls of each request against its connection's
+    max_in_flight while they run.
+    """
+
+    def parse_request(self, context, request_body):
+        requests = JSONRPCParser.parse_request(self, context, request_body)
+        if isinstance(requests, tuple):
+            context.handler._RPC_running += len(requests)
+        return requests
+
+    def response(self, context):
+        if context.calls:
+            context.handler._RPC_running -= len(context.calls)
+        return JSONRPCParser.response(self, context)
+
+
+class WebSocketJSONRPCHandler(WebSocketHandler, BaseRPCHandler):
+    """
+    Subclass this to add methods, like a JSONRPCHandler. Override
+    open and on_close (calling this class's versions) to keep track
+    of connections.
+    """
+    _RPC_ = WebSocketJSONRPCParser(JSONRPCLibraryWrapper)
+    # WebSocketHandler's methods aren't RPC methods
+    _RPC_reserved_ = tuple(dir(WebSocketHandler)) + ('notify',)
+    # Calls running at once on one connection
+    max_in_flight = 100
+    # Requests waiting for room to run before the connection is closed
+    max_waiting = 1000
+
+    # Several requests can be running at once on a connection, so
+    # there is no current one -- @async methods always get an RPCCall
+    # as self, which keeps track of its own request.
+    _RPC_context = property(lambda self: None, lambda self, context: None)
+
+    def open(self):
+        self._RPC_running = 0
+        self._RPC_waiting = collections.deque()
+        self._RPC_starting = False
+        self._RPC_closed = False
+
+    def on_message(self, message):
+        if len(self._RPC_waiting) >= self.max_waiting:
+            # The client isn't waiting for its responses
+            self._RPC_waiting.clear()
+            self.close()
+            return
+        self._RPC_waiting.append(message)
+        self._RPC_start()
+
+    def _RPC_start(self):
+        # Runs waiting requests while there is room
+        if self._RPC_starting:
+            # Already in the loop below, further up the stack
+            return
+        self._RPC_starting = True
+        try:
+            while self._RPC_waiting and not self._RPC_closed and \
+                    self._RPC_running < self.max_in_flight:
+                self._RPC_.run(self, self._RPC_waiting.popleft())
+        finally:
+            self._RPC_starting = False
+
+    def on_result(self, response_text):
+        """ Sends the response to one request (message.) """
+        if response_text and not self._RPC_closed:
+            self.write_message(response_text)
+        self._RPC_start()
+
+    def notify(self, method_name, params=()):
+        """ Sends the client a notification. """
+        if isinstance(params, tuple):
+            params = list(params)
+        notification = {
+            'jsonrpc': '2.0', 'method': method_name, 'params': params}
+        self.write_message(self._RPC_.encode_fragment(notification))
+
+    def on_close(self):
+        # Responses still to come are dropped
+        self._RPC_closed = True
+        self._RPC_waiting.clear()
+
+    def post(self):
+        raise tornado.web.HTTPError(405)
@@ -17,9 +17,16 @@ Tornado framework. Usage is pretty simple:
 It requires the xmlrpclib, which is built-in to Python distributions
 from version 2.3 on.
 
+For large requests, subclass StreamingXMLRPCHandler instead. It parses
+the body as it arrives and limits its size and nesting depth.
+
 """
 
-from tornadorpc.base import BaseRPCParser, BaseRPCHandler
+from tornado.concurrent import Future
+from tornadorpc.base import BaseRPCParser, BaseRPCHandler, RPCContext
+from tornadorpc.base import Encoded, config
+from tornadorpc import compression
+import tornado.web
 import xmlrpclib
 
 
@@ -27,20 +34,51 @@ class XMLRPCSystem(object):
     # Multicall functions and, eventually, introspection
 
     def __init__(self, handler):
-        self._dispatch = handler._RPC_.dispatch
+        self._handler = handler
+        self._parser = handler._RPC_
 
     def multicall(self, calls):
-        for call in calls:
-            method_name = call['methodName']
-            params = call['params']
-            self._dispatch(method_name, params)
+        """
+        Runs each call (concurrently, if they are asynchronous) and
+        returns a Future for the list of results -- [result] for a
+        successful call or a fault struct for a failed one, in the
+        same order as the calls.
+        """
+        future = Future()
+        context = RPCContext(self._handler, self._parser)
+        context.prepare(len(calls))
+        call_list = []
+        for index, call in enumerate(calls):
+            try:
+                call_list.append((call['methodName'], call['params']))
+            except (KeyError, TypeError):
+                # Filled in right away, so never dispatched
+                call_list.append(None)
+                context.results[index] = self._parser.faults.invalid_request()
+                context.pending -= 1
+        context.calls = tuple(call_list)
+        context.callback = lambda results: future.set_result(
+            [multicall_result(result) for result in results])
+        if context.pending == 0:
+            self._parser.response(context)
+        else:
+            self._parser.advance(context)
+        return future
+
+
+def multicall_result(result):
+    """ Formats a result as a system.multicall entry. """
+    if isinstance(result, xmlrpclib.Fault):
+        return {'faultCode': result.faultCode,
+                'faultString': result.faultString}
+    return [result]
 
 
 class XMLRPCParser(BaseRPCParser):
 
     content_type = 'text/xml'
 
-    def parse_request(self, request_body):
+    def parse_request(self, context, request_body):
         try:
             params, method_name = xmlrpclib.loads(request_body)
         except:
@@ -48,10 +86,13 @@ class XMLRPCParser(BaseRPCParser):
             return self.faults.parse_error()
         return ((method_name, params),)
 
-    def parse_responses(self, responses):
+    def parse_responses(self, context, responses):
         try:
             if isinstance(responses[0], xmlrpclib.Fault):
                 return xmlrpclib.dumps(responses[0])
+            if isinstance(responses[0], Encoded):
+                return "<?xml version='1.0'?>\n<methodResponse>\n%s" \
+                    "</methodResponse>\n" % responses[0].data
         except IndexError:
             pass
         try:
@@ -60,6 +101,10 @@ class XMLRPCParser(BaseRPCParser):
             return self.faults.internal_error()
         return response_xml
 
+    def encode_fragment(self, result):
+        # The <params> of the methodResponse, encoded as dumps does
+        return xmlrpclib.Marshaller('utf-8').dumps((result,))
+
 
 class XMLRPCHandler(BaseRPCHandler):
     """
@@ -73,6 +118,157 @@ class XMLRPCHandler(BaseRPCHandler):
         return XMLRPCSystem(self)
 
 
+class RequestLimitError(ValueError):
+    """ Raised when a request is too large or too deeply nested. """
+    pass
+
+
+class LimitedUnmarshaller(xmlrpclib.Unmarshaller):
+    """ An Unmarshaller that limits how deeply values are nested. """
+
+    def __init__(self, max_depth=None):
+        xmlrpclib.Unmarshaller.__init__(self)
+        self.max_depth = max_depth
+
+    def start(self, tag, attrs):
+        xmlrpclib.Unmarshaller.start(self, tag, attrs)
+        if self.max_depth is not None and len(self._marks) > self.max_depth:
+            raise RequestLimitError(
+                "Values nested more than %d deep." % self.max_depth)
+
+
+class XMLRPCRequestReader(object):
+    """
+    Unmarshals an XML-RPC request incrementally with expat as the
+    body is fed to it, so the raw body never has to be buffered.
+    The first error (including a RequestLimitError once more than
+    max_body_size bytes have been fed) is kept in 'error', and
+    anything fed after that is dropped.
+    """
+
+    def __init__(self, max_body_size=None, max_depth=None):
+        self.max_body_size = max_body_size
+        self.unmarshaller = LimitedUnmarshaller(max_depth)
+        self.parser = xmlrpclib.ExpatParser(self.unmarshaller)
+        self.size = 0
+        self.error = None
+
+    def check_size(self, size):
+        if self.max_body_size is not None and size > self.max_body_size:
+            self.fail(RequestLimitError(
+                "Request body larger than %d bytes." % self.max_body_size))
+
+    def fail(self, error):
+        if self.error is None:
+            self.error = error
+            # Free whatever has been unmarshalled so far
+            self.unmarshaller = self.parser = None
+
+    def feed(self, chunk):
+        if self.error is not None:
+            return
+        self.size += len(chunk)
+        self.check_size(self.size)
+        if self.error is not None:
+            return
+        try:
+            self.parser.feed(chunk)
+        except Exception, error:
+            self.fail(error)
+
+    def close(self):
+        """ Returns (params, method_name) or raises the first error. """
+        if self.error is None:
+            try:
+                self.parser.close()
+                return (self.unmarshaller.close(),
+                        self.unmarshaller.getmethodname())
+            except Exception, error:
+                self.fail(error)
+        raise self.error
+
+
+class StreamingXMLRPCParser(XMLRPCParser):
+    """
+    Parses requests from an XMLRPCRequestReader that has been fed
+    the body, instead of from the body itself.
+    """
+
+    def parse_request(self, context, request_reader):
+        try:
+            params, method_name = request_reader.close()
+        except RequestLimitError, error:
+            return self.faults.invalid_request(str(error))
+        except:
+            # Bad request formatting, bad.
+            return self.faults.parse_error()
+        return ((method_name, params),)
+
+
+def stream_request_body(cls):
+    # tornado.web.stream_request_body is only in Tornado 4.0+
+    stream = getattr(tornado.web, 'stream_request_body', None)
+    if stream is None:
+        return cls
+    return stream(cls)
+
+
+@stream_request_body
+class StreamingXMLRPCHandler(XMLRPCHandler):
+    """
+    An XMLRPCHandler that unmarshals the request body as it is
+    received, so that large requests aren't held in memory both as
+    text and as values. Requests larger than max_body_size bytes or
+    with arrays / structs nested more than max_depth deep are
+    rejected with an 'invalid_request' fault as soon as that is
+    known -- before any of the body is read if its Content-Length
+    is too large. (Before Tornado 4.0, the body is always buffered
+    by Tornado first, so pass max_body_size to start_server too.)
+    """
+    _RPC_ = StreamingXMLRPCParser(xmlrpclib)
+    _RPC_reserved_ = ('data_received',)
+    max_body_size = 100 * 1024 * 1024
+    max_depth = 100
+
+    def prepare(self):
+        self._RPC_reader = XMLRPCRequestReader(
+            self.max_body_size, self.max_depth)
+        self._RPC_decoder = None
+        length = self.request.headers.get('Content-Length')
+        if length is not None and length.isdigit():
+            self._RPC_reader.check_size(int(length))
+            if self._RPC_reader.error is not None:
+                # Answered now, so the body is never read
+                self._RPC_.reject(
+                    self, str(self._RPC_reader.error), 'invalid_request')
+                return
+        encoding = self.request.headers.get('Content-Encoding')
+        if encoding and encoding.lower() != 'identity':
+            try:
+                self._RPC_decoder = compression.decompressor(
+                    encoding, config.max_decompressed_size)
+            except ValueError:
+                raise tornado.web.HTTPError(415)
+
+    def data_received(self, chunk):
+        self._RPC_reader.feed(self._RPC_decode(chunk))
+
+    def _RPC_request_body(self):
+        if self.request.body:
+            # Not streamed (Tornado < 4.0), so feed the whole body
+            self._RPC_reader.feed(self._RPC_decode(self.request.body))
+        return self._RPC_reader
+
+    def _RPC_decode(self, chunk):
+        # Decompresses a chunk of a compressed body
+        if self._RPC_decoder is None:
+            return chunk
+        try:
+            return self._RPC_decoder.decompress(chunk)
+        except ValueError:
+            raise tornado.web.HTTPError(400)
+
+
 if __name__ == '__main__':
     # Test implementation
     from tornadorpc.base import TestRPCHandler, start_server